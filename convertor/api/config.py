@@ -17,6 +17,7 @@ app = {
     'modules': ['convertor.api'],
     'hooks': [
         hooks.ContextHook(),
+        hooks.MetricsHook(),
     ],
     'static_root': '%(confdir)s/public',
     'enable_acl': True,
@@ -8,7 +8,6 @@ import wsmeext.pecan as wsme_pecan
 
 from convertor.api.controllers import link
 from convertor.api.controllers.v1 import task
-from convertor.api.controllers.v1 import versions
 
 
 class APIBase(wtypes.Base):
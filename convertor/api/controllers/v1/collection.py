@@ -1,3 +1,5 @@
+from urllib import parse
+
 import pecan
 from wsme import types as wtypes
 
@@ -18,16 +20,36 @@ class Collection(base.APIBase):
         """Return whether collection has more items."""
         return len(self.collection) and len(self.collection) == limit
 
-    def get_next(self, limit, url=None, marker_field="uuid", **kwargs):
-        """Return a link to the next subset of the collection."""
+    def get_next(self, limit, url=None, marker_field="uuid", cursor=None,
+                 **kwargs):
+        """Return a link to the next subset of the collection.
+
+        :param cursor: an opaque keyset cursor pointing after the last item,
+                       used instead of a marker when given.
+        """
         if not self.has_next(limit):
             return wtypes.Unset
-
-        resource_url = url or self._type
-        q_args = ''.join(['%s=%s&' % (key, kwargs[key]) for key in kwargs])
-        next_args = '?%(args)slimit=%(limit)d&marker=%(marker)s' % {
-            'args': q_args, 'limit': limit,
-            'marker': getattr(self.collection[-1], marker_field)}
+        return self.next_href(
+            self._type, limit, getattr(self.collection[-1], marker_field),
+            url=url, cursor=cursor, **kwargs)
+
+    @staticmethod
+    def next_href(resource, limit, marker, url=None, cursor=None, **kwargs):
+        """Build the link to the page following ``marker``.
+
+        :param resource: the type of the items of the collection.
+        :param marker: the value the last item has for the marker field.
+        """
+        resource_url = url or resource
+        q_args = ''.join(['%s=%s&' % (key, parse.quote(str(kwargs[key]),
+                                                      safe=':,'))
+                          for key in kwargs])
+        if cursor is not None:
+            next_args = '?%(args)slimit=%(limit)d&cursor=%(cursor)s' % {
+                'args': q_args, 'limit': limit, 'cursor': cursor}
+        else:
+            next_args = '?%(args)slimit=%(limit)d&marker=%(marker)s' % {
+                'args': q_args, 'limit': limit, 'marker': marker}
 
         return link.Link.make_link('next', pecan.request.host_url,
                                    resource_url, next_args).href
@@ -1,3 +1,4 @@
+import datetime
 from http import HTTPStatus
 import pecan
 from pecan import rest
@@ -5,14 +6,47 @@ import wsme
 from wsme import types as wtypes
 import wsmeext.pecan as wsme_pecan
 
+from convertor._i18n import _
 from convertor.api.controllers import base
 from convertor.api.controllers import link
 from convertor.api.controllers.v1 import collection
 from convertor.api.controllers.v1 import types
 from convertor.api.controllers.v1 import utils as api_utils
+from convertor.api import watch
 from convertor.common import exception
+from convertor.common import utils
+from convertor import conf
+from convertor.notifications import task as task_notifications
+from convertor.worker import profiles
 from convertor.worker import rpcapi
 from convertor import objects
+from convertor.objects import fields as wfields
+
+CONF = conf.CONF
+
+BRIEF_FIELDS = ('uuid', 'image_id', 'bucket_id', 'new_format', 'status',
+                'leader_uuid', 'new_image_id')
+"""Fields of the tasks of a collection, in the order they are rendered"""
+
+
+def _value_renderer(field_name):
+    """Return how to render a column the way wsme renders its field.
+
+    The columns of string fields are rendered as they are, None is
+    returned for them.
+    """
+    field = objects.Task.fields[field_name]
+    if isinstance(field, (wfields.StringField, wfields.UUIDField)):
+        return None
+
+    def render(value):
+        # NOTE: the field coerces the value as the Task objects see it,
+        # e.g. to an aware datetime or to its default.
+        value = field.coerce(None, field_name, value)
+        if isinstance(value, datetime.datetime):
+            return value.isoformat()
+        return value
+    return render
 
 
 def hide_fields_in_newer_versions(obj):
@@ -24,6 +58,13 @@ def hide_fields_in_newer_versions(obj):
     pass
 
 
+def _not_modified(etag):
+    """The response telling the client its copy is up to date."""
+    pecan.response.etag = etag
+    return wsme.api.Response(None, status_code=HTTPStatus.NOT_MODIFIED,
+                             return_type=None)
+
+
 class TaskPatchType(types.JsonPatchType):
 
     @staticmethod
@@ -48,6 +89,49 @@ class Task(base.APIBase):
 
     status = wtypes.text
 
+    profile = wtypes.text
+    """Name of the qemu-img performance profile used for the conversion"""
+
+    priority = int
+    """Order of the task among the tasks of its project, highest first"""
+
+    project_id = wtypes.wsattr(wtypes.text, readonly=True)
+    """Project which created the task"""
+
+    leader_uuid = wtypes.wsattr(types.uuid, readonly=True)
+    """UUID of the task this task is attached to, if it was coalesced"""
+
+    new_image_id = wtypes.wsattr(wtypes.text, readonly=True)
+    """ID of the Glance image holding the converted image"""
+
+    virtual_size = wtypes.wsattr(int, readonly=True)
+    """Size, in bytes, of the disk held by the converted image"""
+
+    allocated_size = wtypes.wsattr(int, readonly=True)
+    """Bytes of data actually allocated in the converted image"""
+
+    phase = wtypes.wsattr(wtypes.text, readonly=True)
+    """What a task in progress is doing: DOWNLOADING, CONVERTING or
+    UPLOADING"""
+
+    bytes_downloaded = wtypes.wsattr(int, readonly=True)
+    """Bytes of the source image downloaded so far"""
+
+    conversion_progress = wtypes.wsattr(int, readonly=True)
+    """Completion percentage of the conversion reported by qemu-img"""
+
+    bytes_uploaded = wtypes.wsattr(int, readonly=True)
+    """Bytes of the converted image uploaded so far"""
+
+    eta = wtypes.wsattr(datetime.datetime, readonly=True)
+    """Estimated end of the current phase"""
+
+    claimed_by = wtypes.wsattr(wtypes.text, readonly=True)
+    """Worker which claimed this task"""
+
+    lease_expires_at = wtypes.wsattr(datetime.datetime, readonly=True)
+    """Time at which the claim expires unless its worker renews it"""
+
     links = wtypes.wsattr([link.Link], readonly=True)
     """A list containing a self link"""
 
@@ -63,23 +147,66 @@ class Task(base.APIBase):
             setattr(self, k, kwargs.get(k, wtypes.Unset))
 
     @staticmethod
-    def _convert_with_links(task, url, expand=True):
-        if not expand:
-            task.unset_fields_except(['uuid', 'image_id', 'bucket_id',
-                                      'new_format', 'status'])
+    def _convert_with_links(task, url, expand=True, fields=None):
+        # NOTE: the links need the uuid, whether it is rendered or not.
+        task_uuid = task.uuid
+        if fields:
+            task.unset_fields_except(fields)
+        elif not expand:
+            task.unset_fields_except(BRIEF_FIELDS)
 
         task.links = [link.Link.make_link('self', url,
-                                          'tasks', task.uuid),
+                                          'tasks', task_uuid),
                       link.Link.make_link('bookmark', url,
-                                          'tasks', task.uuid,
+                                          'tasks', task_uuid,
                                           bookmark=True)]
         return task
 
     @classmethod
-    def convert_with_links(cls, task, expand=True):
+    def convert_with_links(cls, task, expand=True, fields=None):
+        """:param fields: names of the only fields to render, if set."""
         task = Task(**task.as_dict())
         hide_fields_in_newer_versions(task)
-        return cls._convert_with_links(task, pecan.request.host_url, expand)
+        return cls._convert_with_links(task, pecan.request.host_url, expand,
+                                       fields=fields)
+
+    @staticmethod
+    def render_rows(rows, columns, fields):
+        """Render rows of tasks the way convert_with_links renders tasks.
+
+        This is the JSON document of the tasks rendered with ``fields``,
+        without building the :class:`~.objects.Task`, :class:`Task` and
+        :class:`~.Link` of each row on the way.
+
+        :param rows: tuples of the values of ``columns`` for each task.
+        :param columns: names of the columns of the rows, holding the
+                        ``uuid`` of the tasks and ``fields``.
+        :param fields: names of the fields to render.
+        :returns: a list of dicts, to render as :py:data:`~.types.jsontype`.
+        """
+        host_url = pecan.request.host_url
+        self_url = link.build_url('tasks', '', base_url=host_url)
+        bookmark_url = link.build_url('tasks', '', bookmark=True,
+                                      base_url=host_url)
+        uuid_index = columns.index('uuid')
+        # wsme renders the attributes in the order they are declared.
+        rendered = [(attr.key, columns.index(attr.key),
+                     _value_renderer(attr.key))
+                    for attr in wtypes.list_attributes(Task)
+                    if attr.key in fields]
+
+        tasks = []
+        for row in rows:
+            task = {}
+            for name, index, render in rendered:
+                task[name] = row[index] if render is None else render(
+                    row[index])
+            task_uuid = row[uuid_index]
+            task['links'] = [{'href': self_url + task_uuid, 'rel': 'self'},
+                             {'href': bookmark_url + task_uuid,
+                              'rel': 'bookmark'}]
+            tasks.append(task)
+        return tasks
 
     @classmethod
     def sample(cls, expand=True):
@@ -104,14 +231,41 @@ class TaskCollection(collection.Collection):
         self._type = 'tasks'
 
     @staticmethod
-    def convert_with_links(tasks, limit, url=None, expand=False,
-                           **kwargs):
-        task_collection = TaskCollection()
-        task_collection.tasks = [
-            Task.convert_with_links(t, expand) for t in tasks]
-        task_collection.next = task_collection.get_next(
-            limit, url=url, **kwargs)
-        return task_collection
+    def convert_rows_with_links(rows, columns, limit, url=None, fields=None,
+                                **kwargs):
+        """Render rows of tasks the way their collection is rendered.
+
+        This is the JSON document wsme renders for a
+        :class:`TaskCollection` of the tasks, see
+        :py:meth:`Task.render_rows`.
+
+        :param rows: tuples of the values of ``columns`` for each task.
+        :param columns: names of the columns of the rows, holding the
+                        rendered fields, the ``uuid`` and ``id`` and the
+                        sort key of the tasks.
+        :param fields: names of the fields to render, the
+                       :py:data:`BRIEF_FIELDS` by default.
+        :returns: a dict, to render as :py:data:`~.types.jsontype`.
+        """
+        body = {'tasks': Task.render_rows(rows, columns,
+                                          fields or BRIEF_FIELDS)}
+        if not rows or len(rows) != limit:
+            return body
+
+        if fields:
+            kwargs['fields'] = ','.join(fields)
+        last = dict(zip(columns, rows[-1]))
+        sort_key = kwargs.get('sort_key')
+        cursor = None
+        if sort_key:
+            # NOTE: the object coerces the values as the cursor of a
+            # Task object sees them, e.g. datetimes to UTC ones.
+            values = {'id': last['id'], sort_key: last[sort_key]}
+            cursor = api_utils.encode_cursor(objects.Task(**values),
+                                             sort_key)
+        body['next'] = collection.Collection.next_href(
+            'tasks', limit, last['uuid'], url=url, cursor=cursor, **kwargs)
+        return body
 
     @classmethod
     def sample(cls):
@@ -120,60 +274,267 @@ class TaskCollection(collection.Collection):
         return sample
 
 
+class TaskBatch(wtypes.Base):
+    """API representation of a batch of tasks to create."""
+
+    tasks = wtypes.wsattr([Task], mandatory=True)
+    """The tasks to create"""
+
+
+class TaskBatchResult(wtypes.Base):
+    """API representation of the outcome of one task of a batch."""
+
+    index = int
+    """Position of the task in the submitted batch"""
+
+    task = Task
+    """The created task, unless it was rejected"""
+
+    error = wtypes.text
+    """Why the task was rejected, if it was"""
+
+
+class TaskBatchResultCollection(wtypes.Base):
+    """API representation of the outcome of a batch of tasks."""
+
+    results = [TaskBatchResult]
+    """The outcome of each task, in the order they were submitted"""
+
+
 class TasksController(rest.RestController):
     """REST controller for Tasks."""
+
+    _custom_actions = {
+        'batch': ['POST'],
+    }
+
+    _mandatory_fields = {'image_id': 63, 'bucket_id': 63, 'new_format': 15}
+    """Fields a new task must have, with their maximum length"""
+
+    _filterable_fields = ('status', 'image_id', 'bucket_id', 'new_format',
+                          'leader_uuid', 'created_at', 'updated_at')
+    """Fields of a task that can be used to filter the collection"""
+
+    _datetime_fields = tuple(
+        field for field in _filterable_fields
+        if isinstance(objects.Task.fields[field], wfields.DateTimeField))
+    """Filterable fields holding timestamps"""
+
+    _fields = tuple(field for field in objects.Task.fields
+                    if hasattr(Task, field))
+    """Fields of a task that can be requested with ``fields``"""
+
     def __init__(self):
         super(TasksController, self).__init__()
         self.worker_client = rpcapi.WorkerAPI()
 
     def _get_tasks_collection(self, marker, limit, sort_key, sort_dir,
-                              expand=False, resource_url=None):
+                              resource_url=None, cursor=None, filters=None,
+                              fields=None):
+        filters = filters or {}
+        search_filters = api_utils.build_search_filters(
+            filters, self._filterable_fields, self._datetime_fields)
         api_utils.validate_sort_key(
             sort_key, list(objects.Task.fields))
         limit = api_utils.validate_limit(limit)
         api_utils.validate_sort_dir(sort_dir)
 
-        marker_obj = None
-        if marker:
-            marker_obj = objects.Task.get_by_uuid(
-                pecan.request.context, marker)
-
         sort_db_key = (sort_key if sort_key in objects.Task.fields
                        else None)
 
-        tasks = objects.Task.list(pecan.request.context, limit, marker_obj,
-                                  sort_key=sort_db_key, sort_dir=sort_dir)
+        marker_obj = None
+        keyset = None
+        if cursor:
+            keyset = api_utils.decode_cursor(cursor, sort_key,
+                                              objects.Task.fields)
+        elif marker:
+            marker_obj = objects.Task.get_by_uuid(
+                pecan.request.context, marker)
 
-        return TaskCollection.convert_with_links(tasks, limit,
-                                                 url=resource_url,
-                                                 expand=expand,
-                                                 sort_key=sort_key,
-                                                 sort_dir=sort_dir)
+        # Keep the filters in the link to the next page.
+        next_args = {k: v for k, v in filters.items() if v is not None}
+
+        def list_columns(columns):
+            return objects.Task.list_columns(
+                pecan.request.context, columns, limit, marker_obj,
+                filters=search_filters, sort_key=sort_db_key,
+                sort_dir=sort_dir, cursor=keyset)
+
+        if 'If-None-Match' in pecan.request.headers:
+            # NOTE: the ids and update times of the page are enough to
+            # tell whether it changed, without reading the rest of it.
+            etag = self._tasks_etag(list_columns(['id', 'updated_at']))
+            if api_utils.etag_matches(etag):
+                return _not_modified(etag)
+
+        columns = list(fields or BRIEF_FIELDS)
+        columns += [key for key in ('uuid', 'id', 'updated_at', sort_key)
+                    if key and key not in columns]
+        rows = list_columns(columns)
+        body = TaskCollection.convert_rows_with_links(
+            rows, columns, limit, url=resource_url, fields=fields,
+            sort_key=sort_key, sort_dir=sort_dir, **next_args)
+        id_index = columns.index('id')
+        updated_at_index = columns.index('updated_at')
+        pecan.response.etag = self._tasks_etag(
+            [(row[id_index], row[updated_at_index]) for row in rows])
+        # NOTE: the body is already what wsme would render for a
+        # TaskCollection, see convert_rows_with_links().
+        return wsme.api.Response(body, status_code=HTTPStatus.OK,
+                                 return_type=types.jsontype)
 
     @wsme_pecan.wsexpose(TaskCollection, wtypes.text,
-                         int, wtypes.text, wtypes.text)
-    def get_all(self, marker=None, limit=None, sort_key='id', sort_dir='asc'):
+                         int, wtypes.text, wtypes.text, wtypes.text,
+                         wtypes.text, wtypes.text, wtypes.text, wtypes.text,
+                         wtypes.text, wtypes.text, wtypes.text, wtypes.text)
+    def get_all(self, marker=None, limit=None, sort_key='id', sort_dir='asc',
+                cursor=None, status=None, image_id=None, bucket_id=None,
+                new_format=None, leader_uuid=None, created_at=None,
+                updated_at=None, fields=None):
         """Retrieve a list of tasks.
         :param marker: pagination marker for large data sets.
         :param limit: maximum number of resources to return in a single result.
         :param sort_key: column to sort results by. Default: id.
         :param sort_dir: direction to sort. "asc" or "desc". Default: asc.
+        :param cursor: opaque pagination cursor taken from the ``next`` link
+                       of the previous page; takes precedence over marker.
+        :param status: Optional, filter by status.
+        :param image_id: Optional, filter by source image.
+        :param bucket_id: Optional, filter by bucket.
+        :param new_format: Optional, filter by target format.
+        :param leader_uuid: Optional, filter by the task followed.
+        :param created_at: Optional, filter by creation time.
+        :param updated_at: Optional, filter by last update time.
+        :param fields: Optional, comma separated list of the only fields of
+                       the tasks to return.
+
+        Filter values are either compared for equality or prefixed with a
+        comparison operator, e.g. ``status=in:CREATED,INPROGRESS`` or
+        ``created_at=gte:2021-12-14T12:00:00``.
+
+        The response carries an ETag. Unless a task of the page was
+        created, updated or deleted, a request whose If-None-Match header
+        holds it gets a 304 Not Modified response.
         """
         context = pecan.request.context
         #policy.enforce(context, 'task:get_all',
         #               action='task:get_all')
-        return self._get_tasks_collection(marker, limit, sort_key, sort_dir)
+        filters = {'status': status, 'image_id': image_id,
+                   'bucket_id': bucket_id, 'new_format': new_format,
+                   'leader_uuid': leader_uuid, 'created_at': created_at,
+                   'updated_at': updated_at}
+        fields = api_utils.validate_fields(fields, self._fields)
+        return self._get_tasks_collection(marker, limit, sort_key, sort_dir,
+                                          cursor=cursor, filters=filters,
+                                          fields=fields)
+
+    @staticmethod
+    def _tasks_etag(versions):
+        """:param versions: the (id, updated_at) of the tasks of a page."""
+        parts = [pecan.request.host_url, pecan.request.query_string]
+        for task_id, updated_at in versions:
+            parts += [task_id, updated_at]
+        return api_utils.make_etag('tasks', *parts)
+
+    @staticmethod
+    def _task_etag(task_id, updated_at, fields):
+        return api_utils.make_etag('task', task_id, updated_at,
+                                   pecan.request.host_url, fields)
 
-    @wsme_pecan.wsexpose(Task, wtypes.text)
-    def get_one(self, task):
+    def _get_task_fields(self, task, fields):
+        """Read and render only some fields of a task.
+
+        See :py:meth:`Task.render_rows`.
+        """
+        if utils.is_int_like(task):
+            filters = {'id': int(task)}
+        elif utils.is_uuid_like(task):
+            filters = {'uuid': task}
+        else:
+            raise exception.InvalidIdentity(identity=task)
+        columns = fields + [key for key in ('uuid', 'id', 'updated_at')
+                            if key not in fields]
+        rows = objects.Task.list_columns(pecan.request.context, columns,
+                                         limit=1, filters=filters)
+        if not rows:
+            raise exception.TaskNotFound(task=task)
+        row = dict(zip(columns, rows[0]))
+        pecan.response.etag = self._task_etag(row['id'], row['updated_at'],
+                                              fields)
+        return wsme.api.Response(Task.render_rows(rows, columns, fields)[0],
+                                 status_code=HTTPStatus.OK,
+                                 return_type=types.jsontype)
+
+    @wsme_pecan.wsexpose(Task, wtypes.text, int, wtypes.text)
+    def get_one(self, task, wait=None, fields=None):
         """Retrieve information about the given task.
         :param task: UUID or name of the task.
+        :param wait: Optional, number of seconds to wait for an unfinished
+                     task to change status before returning it, bounded by
+                     ``[api]max_wait``.
+        :param fields: Optional, comma separated list of the only fields of
+                       the task to return.
+
+        The response carries an ETag. Unless the task changed, a request
+        whose If-None-Match header holds it gets a 304 Not Modified
+        response; with ``wait``, once the task changed or the wait is
+        over.
         """
         context = pecan.request.context
-        rpc_task = api_utils.get_resource('Task', task)
-        #policy.enforce(context, 'task:get', rpc_task, action='task:get')
+        fields = api_utils.validate_fields(fields, self._fields)
+        if not wait or wait < 0 or not watch.get_registry().running:
+            if 'If-None-Match' in pecan.request.headers:
+                etag = self._task_etag(
+                    *objects.Task.get_version(context, task), fields=fields)
+                if api_utils.etag_matches(etag):
+                    return _not_modified(etag)
+            if fields:
+                return self._get_task_fields(task, fields)
+            rpc_task = api_utils.get_resource('Task', task)
+            #policy.enforce(context, 'task:get', rpc_task, action='task:get')
+            pecan.response.etag = self._task_etag(
+                rpc_task.id, rpc_task.updated_at, fields)
+            return Task.convert_with_links(rpc_task)
+
+        registry = watch.get_registry()
+        # NOTE: the watch is registered before the task is read, so that
+        # a change made in between is not missed.
+        task_watch = registry.watch(task)
+        try:
+            rpc_task = api_utils.get_resource('Task', task)
+            if rpc_task.status in objects.task.Status.IN_FLIGHT:
+                registry.add_key(task_watch, rpc_task.uuid)
+                if rpc_task.leader_uuid:
+                    registry.add_key(task_watch, rpc_task.leader_uuid)
+                task_watch.wait(rpc_task.status,
+                                min(wait, CONF.api.max_wait))
+                rpc_task.refresh()
+        finally:
+            registry.unwatch(task_watch)
+        etag = self._task_etag(rpc_task.id, rpc_task.updated_at, fields)
+        if api_utils.etag_matches(etag):
+            return _not_modified(etag)
+        pecan.response.etag = etag
+        return Task.convert_with_links(rpc_task, fields=fields)
 
-        return Task.convert_with_links(rpc_task)
+    @staticmethod
+    def _conversion(task_dict):
+        """What identifies the conversion of a new task, to coalesce it."""
+        # NOTE: the profile may change the converted image.
+        return (task_dict['image_id'], task_dict['new_format'],
+                task_dict.get('profile'))
+
+    def _find_leader(self, context, task_dict):
+        """Find an unfinished task doing the same conversion."""
+        image_id, new_format, profile = self._conversion(task_dict)
+        leaders = objects.Task.list(
+            context, limit=1,
+            filters={'image_id': image_id,
+                     'new_format': new_format,
+                     'profile': profile,
+                     'status__in': objects.task.Status.IN_FLIGHT,
+                     'leader_uuid': None})
+        return leaders[0] if leaders else None
 
     @wsme_pecan.wsexpose(Task, body=Task, status_code=HTTPStatus.CREATED)
     def post(self, task):
@@ -184,11 +545,38 @@ class TasksController(rest.RestController):
         task_dict = task.as_dict()
         context = pecan.request.context
         task_dict['status'] =  objects.task.Status.CREATED
+        task_dict['project_id'] = context.project_id
+        if task_dict.get('profile'):
+            profiles.validate(task_dict['profile'],
+                              task_dict.get('new_format'))
+
+        leader = None
+        if CONF.api.coalesce_tasks:
+            leader = self._find_leader(context, task_dict)
+            if leader:
+                task_dict['leader_uuid'] = leader.uuid
+
         new_task = objects.Task(context, **task_dict)
         new_task.create()
+        task_notifications.send_create(context, new_task)
 
         # Set the HTTP Location Header
         pecan.response.location = link.build_url('tasks', new_task.uuid)
+
+        if leader:
+            # NOTE: the worker records the leader status before the status
+            # of its followers, so a leader that is still in flight here
+            # will update this task when it finishes.
+            leader.refresh()
+            if leader.status in objects.task.Status.IN_FLIGHT:
+                return Task.convert_with_links(new_task)
+            new_task.refresh()
+            if new_task.status not in objects.task.Status.IN_FLIGHT:
+                return Task.convert_with_links(new_task)
+            # The leader finished before this task was attached to it.
+            new_task.leader_uuid = None
+            new_task.save()
+
         self.worker_client.launch_task(pecan.request.context,
                                        new_task.uuid)
         return Task.convert_with_links(new_task)
@@ -203,6 +591,139 @@ class TasksController(rest.RestController):
             task_uuid)
         task_to_delete.soft_delete()
 
+    def _validate_new_task(self, task_dict, uuids):
+        """Return why a task of a batch cannot be created, if it cannot."""
+        for field, max_length in self._mandatory_fields.items():
+            value = task_dict.get(field)
+            if not value:
+                return _("Missing mandatory field: %s") % field
+            if len(value) > max_length:
+                return (_("Field %(field)s is longer than %(max)d "
+                          "characters") % {'field': field, 'max': max_length})
+        if task_dict.get('uuid') in uuids:
+            return (_("A task with UUID %s already exists") %
+                    task_dict['uuid'])
+        if task_dict.get('profile'):
+            try:
+                profiles.validate(task_dict['profile'],
+                                  task_dict['new_format'])
+            except exception.InvalidProfile as e:
+                return str(e)
+        return None
+
+    def _find_leaders(self, context, task_dicts):
+        """Find the unfinished tasks doing the conversions of a batch.
+
+        :returns: a dict mapping the conversions, see :py:meth:`_conversion`,
+                  to a leader UUID.
+        """
+        image_ids = sorted(set(d['image_id'] for d in task_dicts))
+        leaders = objects.Task.list(
+            context,
+            filters={'image_id__in': image_ids,
+                     'status__in': objects.task.Status.IN_FLIGHT,
+                     'leader_uuid': None},
+            sort_key='id')
+        found = {}
+        for leader in leaders:
+            found.setdefault(
+                (leader.image_id, leader.new_format, leader.profile),
+                leader.uuid)
+        return found
+
+    def _detach_from_finished_leaders(self, context, tasks, leader_uuids):
+        """Detach tasks from the leaders that finished before they attached.
+
+        :returns: the UUIDs of the detached tasks, which must be launched.
+        """
+        if not leader_uuids:
+            return []
+        # NOTE: see post(), a leader still in flight here will update its
+        # followers when it finishes.
+        in_flight = set(
+            leader.uuid for leader in objects.Task.list(
+                context, filters={'uuid__in': sorted(leader_uuids)})
+            if leader.status in objects.task.Status.IN_FLIGHT)
+        finished = leader_uuids - in_flight
+
+        detached = []
+        for task in tasks:
+            if task.leader_uuid not in finished:
+                continue
+            task.refresh()
+            if task.status not in objects.task.Status.IN_FLIGHT:
+                continue
+            task.leader_uuid = None
+            task.save()
+            detached.append(task.uuid)
+        return detached
+
+    @wsme_pecan.wsexpose(TaskBatchResultCollection, body=TaskBatch,
+                         status_code=HTTPStatus.CREATED)
+    def batch(self, batch):
+        """Create several tasks at once.
+
+        The valid tasks are inserted in a single transaction and announced
+        to the workers in a few batched messages. Invalid tasks are
+        reported in the results without failing the rest of the batch.
+
+        :param batch: the tasks to create within the request body.
+        """
+        context = pecan.request.context
+        if len(batch.tasks) > CONF.api.max_batch_size:
+            raise wsme.exc.ClientSideError(
+                _("A batch cannot hold more than %d tasks") %
+                CONF.api.max_batch_size)
+
+        results = [None] * len(batch.tasks)
+        new_tasks = []
+        uuids = set()
+        for index, task in enumerate(batch.tasks):
+            task_dict = task.as_dict()
+            error = self._validate_new_task(task_dict, uuids)
+            if error:
+                results[index] = TaskBatchResult(index=index, error=error)
+                continue
+            task_dict['uuid'] = task_dict.get('uuid') or utils.generate_uuid()
+            task_dict['status'] = objects.task.Status.CREATED
+            task_dict['project_id'] = context.project_id
+            uuids.add(task_dict['uuid'])
+            new_tasks.append((index, task_dict))
+
+        leaders = {}
+        if CONF.api.coalesce_tasks and new_tasks:
+            leaders = self._find_leaders(
+                context, [task_dict for _index, task_dict in new_tasks])
+        existing_leaders = set(leaders.values())
+
+        to_launch = []
+        for _index, task_dict in new_tasks:
+            key = self._conversion(task_dict)
+            if key in leaders:
+                task_dict['leader_uuid'] = leaders[key]
+                continue
+            if CONF.api.coalesce_tasks:
+                # The first task of the batch for a conversion leads the
+                # ones that follow it in the batch.
+                leaders[key] = task_dict['uuid']
+            to_launch.append(task_dict['uuid'])
+
+        created = objects.Task.create_list(
+            context, [objects.Task(context, **task_dict)
+                      for _index, task_dict in new_tasks])
+        for new_task in created:
+            task_notifications.send_create(context, new_task)
+        to_launch += self._detach_from_finished_leaders(
+            context, created, existing_leaders)
+
+        if to_launch:
+            self.worker_client.launch_tasks(context, to_launch)
+
+        for (index, _task_dict), new_task in zip(new_tasks, created):
+            results[index] = TaskBatchResult(
+                index=index, task=Task.convert_with_links(new_task))
+        return TaskBatchResultCollection(results=results)
+
     @wsme.validate(types.uuid, [TaskPatchType])
     @wsme_pecan.wsexpose(Task, types.uuid, body=[TaskPatchType])
     def patch(self, task_uuid, patch):
@@ -235,6 +756,10 @@ class TasksController(rest.RestController):
                     patch_val == objects.task.Status.INPROGRESS):
                 launch_task = True
 
+        if task_to_update.profile:
+            profiles.validate(task_to_update.profile,
+                              task_to_update.new_format)
+
         task_to_update.save()
 
         if launch_task:
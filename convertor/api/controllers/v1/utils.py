@@ -1,11 +1,18 @@
+import base64
+import datetime
+import hashlib
+
 import jsonpatch
 from oslo_config import cfg
+from oslo_serialization import jsonutils
 from oslo_utils import reflection
+from oslo_utils import timeutils
 from oslo_utils import uuidutils
 import pecan
 import wsme
 
 from convertor._i18n import _
+from convertor.common import exception
 from convertor.common import utils
 from convertor import objects
 
@@ -46,6 +53,76 @@ def validate_sort_key(sort_key, allowed_fields):
             _("Invalid sort key: %s") % sort_key)
 
 
+def validate_fields(fields, allowed_fields):
+    """Parse the comma separated list of a ``fields`` query parameter.
+
+    :returns: the list of the requested fields, or None if ``fields`` is
+              not set.
+    """
+    if fields is None:
+        return None
+    requested = [field.strip() for field in fields.split(',')
+                 if field.strip()]
+    invalid = [field for field in requested if field not in allowed_fields]
+    if invalid or not requested:
+        raise wsme.exc.ClientSideError(
+            _("Invalid fields: %s") % fields)
+    return list(dict.fromkeys(requested))
+
+
+FILTER_OPERATORS = ('eq', 'neq', 'gt', 'gte', 'lt', 'lte', 'in', 'notin')
+"""Comparison operators understood by the database filters"""
+
+
+def build_search_filters(params, allowed_fields, datetime_fields=()):
+    """Turn query string filters into database filters.
+
+    A filter value is either a plain value, compared for equality, or an
+    ``<operator>:<value>`` pair, e.g. ``status=in:CREATED,INPROGRESS`` or
+    ``created_at=gte:2021-12-14T12:00:00``. It is mapped onto the
+    ``<field>__<operator>`` grammar of the database API.
+
+    :param params: dict of the filter names and raw values; None values are
+                   ignored.
+    :param allowed_fields: names of the fields that can be filtered on.
+    :param datetime_fields: names of the fields whose values are ISO 8601
+                            timestamps; they are parsed into naive UTC
+                            datetimes and cannot be used with ``in`` or
+                            ``notin``.
+    :returns: a dict of database filters.
+    """
+    params = {k: v for k, v in params.items() if v is not None}
+    validate_search_filters(params, allowed_fields)
+
+    filters = {}
+    for name, raw_value in params.items():
+        op, sep, value = raw_value.partition(':')
+        if not sep or op not in FILTER_OPERATORS:
+            op, value = '', raw_value
+        if name in datetime_fields:
+            if op in ('in', 'notin'):
+                raise wsme.exc.ClientSideError(
+                    _("Filter %(name)s does not support the %(op)s "
+                      "operator") % {'name': name, 'op': op})
+            value = _parse_filter_time(name, value)
+        elif op in ('in', 'notin'):
+            value = [v for v in value.split(',') if v]
+            if not value:
+                raise wsme.exc.ClientSideError(
+                    _("Filter %s needs at least one value") % name)
+        filters['%s__%s' % (name, op) if op else name] = value
+    return filters
+
+
+def _parse_filter_time(name, value):
+    try:
+        return timeutils.normalize_time(timeutils.parse_isotime(value))
+    except ValueError:
+        raise wsme.exc.ClientSideError(
+            _("Invalid value for filter %(name)s: %(value)s, an ISO 8601 "
+              "timestamp is expected") % {'name': name, 'value': value})
+
+
 def validate_search_filters(filters, allowed_fields):
     # Very lightweight validation for now
     # todo: improve this (e.g. https://www.parse.com/docs/rest/guide/#queries)
@@ -55,6 +132,73 @@ def validate_search_filters(filters, allowed_fields):
                 _("Invalid filter: %s") % filter_name)
 
 
+def encode_cursor(obj, sort_key):
+    """Build an opaque pagination cursor pointing after ``obj``.
+
+    The cursor carries the sort key and the values ``obj`` has for it and
+    for its id, which is all the database needs to seek to the next page.
+    """
+    value = obj[sort_key]
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    data = jsonutils.dump_as_bytes([sort_key, value, obj['id']])
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort_key, fields):
+    """Decode a cursor built by :py:func:`encode_cursor`.
+
+    :param fields: the fields of the listed objects; the value of the
+                   cursor is converted to the type of the ``sort_key``
+                   field, datetimes to naive UTC.
+    :returns: a (sort_key value, id) pair.
+    :raises: :py:class:`~.InvalidParameterValue` if the value does not
+             fit the field.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_key, value, last_id = jsonutils.loads(
+            base64.urlsafe_b64decode(padded.encode('ascii')))
+        last_id = int(last_id)
+    except (TypeError, ValueError):
+        raise wsme.exc.ClientSideError(_("Invalid cursor: %s") % cursor)
+    if cursor_key != sort_key:
+        raise wsme.exc.ClientSideError(
+            _("The cursor was built for sort key %(cursor_key)s, not "
+              "%(sort_key)s") % {'cursor_key': cursor_key,
+                                 'sort_key': sort_key})
+    if sort_key in fields:
+        try:
+            value = fields[sort_key].coerce(None, sort_key, value)
+        except (TypeError, ValueError):
+            raise exception.InvalidParameterValue(
+                parameter='cursor',
+                reason=_("%(value)s is not a valid %(sort_key)s") % {
+                    'value': value, 'sort_key': sort_key})
+        if isinstance(value, datetime.datetime):
+            value = timeutils.normalize_time(value)
+    return value, last_id
+
+
+def make_etag(*parts):
+    """Build a strong entity tag from what identifies a representation.
+
+    :param parts: JSON serializable values, or datetimes, naive or not.
+    """
+    parts = [timeutils.normalize_time(part).isoformat()
+             if isinstance(part, datetime.datetime) else part
+             for part in parts]
+    return hashlib.sha1(jsonutils.dump_as_bytes(parts)).hexdigest()
+
+
+def etag_matches(etag):
+    """Tell whether the If-None-Match header of the request matches.
+
+    The response to such a request should be a 304 Not Modified.
+    """
+    return etag in pecan.request.if_none_match
+
+
 def get_resource(resource, resource_id, eager=False):
     """Get the resource from the uuid, id or logical name.
     :param resource: the resource type.
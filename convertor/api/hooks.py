@@ -1,6 +1,9 @@
+import time
+
 from pecan import hooks
 
 from convertor.common import context
+from convertor.common import metrics
 
 
 class ContextHook(hooks.PecanHook):
@@ -44,3 +47,24 @@ class ContextHook(hooks.PecanHook):
             domain_name=domain_name,
             show_deleted=show_deleted,
             roles=roles)
+
+
+class MetricsHook(hooks.PecanHook):
+    """Times the requests, by the controller method serving them."""
+
+    def on_route(self, state):
+        state.request.environ['convertor.request_start'] = time.monotonic()
+
+    def after(self, state):
+        start = state.request.environ.get('convertor.request_start')
+        if start is None:
+            return
+        controller = getattr(state, 'controller', None)
+        if controller is None:
+            handler = 'unknown'
+        else:
+            owner = getattr(controller, '__self__', None)
+            handler = '%s.%s' % (type(owner).__name__ if owner else
+                                 controller.__module__, controller.__name__)
+        metrics.API_REQUEST_SECONDS.labels(
+            handler, state.request.method).observe(time.monotonic() - start)
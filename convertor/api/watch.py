@@ -0,0 +1,211 @@
+"""Wait for task status changes without polling the database.
+
+Workers emit a ``task.execution`` notification each time they change the
+status of a task (see :py:mod:`convertor.notifications.task`). Every API
+process listens to these notifications in a pool of its own, so that each
+of them receives all of them, and wakes up the requests waiting on the
+task in an in-memory registry. A waiting client costs a green thread and a
+registry entry, and the database is only read again once the task actually
+changed.
+
+Tasks coalesced into another one are waited on through their leader,
+whose status they follow.
+
+The pool of a process is named after the host and a slot, the lowest one
+no other API process of the host holds, see
+:py:func:`~convertor.common.utils.claim_slot`. The messaging driver keeps
+a queue per pool around, and a restarted process takes over the queue of
+the process it replaces instead of leaving it behind, so a host never has
+more queues than it ever ran API processes at once.
+"""
+
+import collections
+import os
+import socket
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+import oslo_messaging as messaging
+
+from convertor.common import rpc
+from convertor.common import utils
+from convertor.notifications import base as notificationbase
+from convertor.objects import fields as wfields
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+_REGISTRY = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+class Watch(object):
+    """A request waiting for the status of a task to change."""
+
+    def __init__(self, keys):
+        self.keys = set(keys)
+        self.status = None
+        self._event = threading.Event()
+
+    def set(self, status):
+        self.status = status
+        self._event.set()
+
+    def wait(self, known_status, timeout):
+        """Wait until the task is notified in another status than
+        ``known_status``.
+
+        :returns: whether it was, before ``timeout`` seconds elapsed.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._event.wait(remaining):
+                return False
+            self._event.clear()
+            if self.status != known_status:
+                return True
+
+
+class TaskWatchRegistry(object):
+    """Dispatch the task updates to the requests waiting on them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watches = collections.defaultdict(set)
+        self.listener = None
+        self._slot_lock = None
+
+    @property
+    def running(self):
+        return self.listener is not None
+
+    def watch(self, *keys):
+        """Register a watch on tasks, by UUID."""
+        watch = Watch(key for key in keys if key)
+        with self._lock:
+            for key in watch.keys:
+                self._watches[key].add(watch)
+        return watch
+
+    def add_key(self, watch, key):
+        with self._lock:
+            watch.keys.add(key)
+            self._watches[key].add(watch)
+
+    def unwatch(self, watch):
+        with self._lock:
+            for key in watch.keys:
+                watches = self._watches.get(key)
+                if watches is None:
+                    continue
+                watches.discard(watch)
+                if not watches:
+                    del self._watches[key]
+
+    def notify(self, task_uuid, status):
+        with self._lock:
+            watches = list(self._watches.get(task_uuid, ()))
+        for watch in watches:
+            watch.set(status)
+
+    def start(self):
+        """Start listening to the task updates of the workers."""
+        if self.running:
+            return
+        targets = [messaging.Target(topic=topic) for topic in
+                   CONF.oslo_messaging_notifications.topics]
+        # NOTE: listeners sharing a pool compete for the notifications,
+        # each process needs all of them.
+        slot, slot_lock = utils.claim_slot(
+            os.path.join(CONF.state_path, 'api-watch'))
+        pool = 'convertor-api-%s-%d' % (CONF.host or socket.gethostname(),
+                                         slot)
+        try:
+            listener = rpc.get_notification_listener(
+                targets, [TaskUpdateEndpoint(self)],
+                serializer=rpc.JsonPayloadSerializer(), pool=pool)
+            listener.start()
+        except Exception:
+            slot_lock.close()
+            raise
+        self.listener = listener
+        self._slot_lock = slot_lock
+        LOG.debug("Listening to task updates in pool %s", pool)
+
+    def stop(self):
+        if not self.running:
+            return
+        self.listener.stop()
+        self.listener.wait()
+        self.listener = None
+        self._slot_lock.close()
+        self._slot_lock = None
+
+
+class TaskUpdateEndpoint(object):
+    """Notification endpoint feeding the task updates to a registry."""
+
+    filter_rule = messaging.NotificationFilter(
+        event_type=r'^task\.execution\.')
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def _notify(self, payload):
+        task = payload['convertor_object.data']
+        self.registry.notify(task['uuid'], task['status'])
+
+    def info(self, ctxt, publisher_id, event_type, payload, metadata):
+        self._notify(payload)
+
+    def error(self, ctxt, publisher_id, event_type, payload, metadata):
+        self._notify(payload)
+
+
+def enabled():
+    """Whether task updates can reach the API at all."""
+    if not (CONF.api.max_wait and CONF.notification_level and
+            rpc.NOTIFICATION_TRANSPORT is not None):
+        return False
+    # The workers announce the tasks they start and complete as INFO.
+    return (notificationbase.NOTIFY_LEVELS[CONF.notification_level] <=
+            notificationbase.NOTIFY_LEVELS[
+                wfields.NotificationPriority.INFO])
+
+
+def get_registry():
+    """Return the watch registry of the API process."""
+    global _REGISTRY
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                _REGISTRY = TaskWatchRegistry()
+    return _REGISTRY
+
+
+def start():
+    """Start receiving task updates, if the deployment allows it.
+
+    The API process does not start when it cannot listen to them: it would
+    otherwise ignore the wait parameter it is configured to honour.
+    """
+    if not enabled():
+        return
+    try:
+        get_registry().start()
+    except Exception as e:
+        LOG.error("Cannot listen to the task updates on the topics %(topics)s"
+                  ": %(error)s. Requests cannot wait for the tasks, fix the "
+                  "messaging configuration or disable waiting with "
+                  "[api]max_wait = 0.",
+                  {'topics': CONF.oslo_messaging_notifications.topics,
+                   'error': e})
+        raise
+
+
+def stop():
+    if _REGISTRY is not None:
+        _REGISTRY.stop()
@@ -0,0 +1,133 @@
+"""Benchmark the qemu-img performance profiles on this host.
+
+Writes a synthetic sparse image to the scratch directory, converts it with
+each enabled profile that applies to the target format, and recommends
+the fastest one as ``[convertor_worker]default_profile``.
+"""
+
+import os
+import statistics
+import sys
+import time
+
+from oslo_concurrency import processutils
+from oslo_config import cfg
+
+from convertor.common import exception
+from convertor.common import service
+from convertor import conf
+from convertor.worker import profiles
+from convertor.worker import scratch
+from convertor.worker import sparse
+from convertor.worker import utils
+
+CONF = conf.CONF
+
+_MiB = 1024 * 1024
+
+BENCH_OPTS = [
+    cfg.IntOpt('size',
+               default=2048,
+               min=1,
+               help='Virtual size, in MiB, of the synthetic image.'),
+    cfg.IntOpt('data_percent',
+               default=50,
+               min=0,
+               max=100,
+               help='Share of the synthetic image holding data, the rest '
+                    'is split between zeros and holes.'),
+    cfg.StrOpt('format',
+               default='qcow2',
+               help='Target format of the conversions.'),
+    cfg.IntOpt('repeat',
+               default=3,
+               min=1,
+               help='Number of conversions timed per profile.'),
+]
+
+
+def write_synthetic_image(path, size, data_percent):
+    """Write a raw image mixing random data, text-like data, zeros and holes.
+
+    Half of the data is random and half of it compresses well, so that
+    compressing profiles are measured on realistic content.
+    """
+    pattern = (b'convertor synthetic image block\n' * (_MiB // 32 + 1))[:_MiB]
+    zeros = bytes(_MiB)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, size * _MiB)
+        for block in range(size):
+            # Spreads the kinds of blocks evenly over the image.
+            slot = block * 37 % 100
+            if slot < data_percent:
+                data = os.urandom(_MiB) if block % 2 else pattern
+            elif slot < (100 + data_percent) // 2:
+                data = zeros
+            else:
+                continue
+            os.pwrite(fd, data, block * _MiB)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def bench_profile(profile, source, target, new_format, repeat):
+    cmd = utils.qemu_img_convert_cmd(
+        source, target, new_format, source_format='raw',
+        extra_args=profile.args() + sparse.qemu_img_args())
+    timings = []
+    for _ in range(repeat):
+        if os.path.exists(target):
+            os.unlink(target)
+        start = time.monotonic()
+        processutils.execute(*cmd)
+        timings.append(time.monotonic() - start)
+    size = os.stat(target).st_blocks * 512
+    os.unlink(target)
+    return statistics.median(timings), size
+
+
+def main():
+    CONF.register_cli_opts(BENCH_OPTS)
+    service.prepare_service(sys.argv, CONF)
+
+    new_format = CONF.format
+    manager = scratch.get_manager()
+    space = manager.reserve(('bench-profiles', new_format),
+                            2 * CONF.size * _MiB)
+    source = str(space.file('bench-profiles.raw'))
+    target = str(space.file('bench-profiles.%s' % new_format))
+
+    print('Writing a %d MiB synthetic image to %s' % (CONF.size, source))
+    write_synthetic_image(source, CONF.size, CONF.data_percent)
+
+    results = []
+    try:
+        for name in CONF.convertor_worker.profiles:
+            profile = profiles.Profile(name)
+            try:
+                profile.validate(new_format)
+            except exception.InvalidProfile as e:
+                print('%-16s skipped: %s' % (name, e))
+                continue
+            try:
+                duration, size = bench_profile(profile, source, target,
+                                               new_format, CONF.repeat)
+            except processutils.ProcessExecutionError as e:
+                print('%-16s failed: %s' % (name, e.stderr.strip()))
+                continue
+            results.append((duration, size, name))
+            print('%-16s %8.2f s %8.1f MiB/s %10.1f MiB output' % (
+                name, duration, CONF.size / duration, size / _MiB))
+    finally:
+        manager.release(space)
+
+    if not results:
+        print('No profile could be measured')
+        return 1
+    duration, size, name = min(results)
+    print('\nFastest profile for %s on this host: %s' % (new_format, name))
+    print('Suggested setting:\n\n[convertor_worker]\n'
+          'default_profile = %s' % name)
+    return 0
@@ -5,7 +5,9 @@ import sys
 
 from oslo_log import log
 
+from convertor.worker import claim
 from convertor.worker import manager
+from convertor.worker import scratch
 from convertor.common import service as convertor_service
 from convertor import conf
 
@@ -22,4 +24,10 @@ def main():
 
     # Only 1 process
     launcher = convertor_service.launch(CONF, applier_service)
+    launcher.launch_service(claim.TaskClaimer(applier_service))
+    launcher.launch_service(scratch.ScratchCollector())
+    if CONF.convertor_worker.metrics_port:
+        launcher.launch_service(convertor_service.MetricsService(
+            'convertor-worker-metrics', CONF.convertor_worker.metrics_host,
+            CONF.convertor_worker.metrics_port))
     launcher.wait()
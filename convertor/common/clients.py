@@ -1,35 +1,86 @@
-from oslo_config import cfg
+"""OpenStack clients shared by a whole process.
+
+Building a client means authenticating against keystone, looking the
+endpoint up in the catalog and opening new TLS connections. Instead of
+paying for it on every task, a process keeps one keystoneauth session,
+whose token and HTTP connection pool are shared by the clients of every
+region. The token is renewed in the background some time before it
+expires, see ``token_refresh_margin``, so requests never wait for
+keystone.
+"""
+
+import threading
+import time
 
 from glanceclient import client as glclient
 from keystoneauth1 import loading as ka_loading
 from keystoneclient import client as keyclient
+from oslo_config import cfg
+from oslo_log import log
+from requests import adapters
+import requests
 
 from convertor.common import exception
 
 
+LOG = log.getLogger(__name__)
 CONF = cfg.CONF
 
 _CLIENTS_AUTH_GROUP = 'convertor_clients_auth'
 
+_REGISTRY = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _connection_pool_size():
+    size = getattr(CONF, _CLIENTS_AUTH_GROUP).connection_pool_size
+    if size:
+        return size
+    return (CONF.convertor_worker.workers *
+            CONF.convertor_worker.download_concurrency)
+
+
+def load_session():
+    """Load a keystoneauth session from the configuration.
+
+    The session keeps up to ``connection_pool_size`` connections open to
+    each endpoint, for all the green threads using it.
+    """
+    auth = ka_loading.load_auth_from_conf_options(CONF, _CLIENTS_AUTH_GROUP)
+    margin = getattr(CONF, _CLIENTS_AUTH_GROUP).token_refresh_margin
+    if margin and hasattr(auth, 'MIN_TOKEN_LIFE_SECONDS'):
+        # NOTE: keystoneauth renews the token when it expires within
+        # this many seconds.
+        auth.MIN_TOKEN_LIFE_SECONDS = margin
+    size = _connection_pool_size()
+    http = requests.Session()
+    adapter = adapters.HTTPAdapter(pool_connections=size, pool_maxsize=size)
+    http.mount('https://', adapter)
+    http.mount('http://', adapter)
+    return ka_loading.load_session_from_conf_options(
+        CONF, _CLIENTS_AUTH_GROUP, auth=auth, session=http)
+
 
 class OpenStackClients(object):
     """Convenience class to create and cache client instances."""
 
-    def __init__(self):
+    def __init__(self, session=None, region_name=None):
+        """:param session: the keystoneauth session of the clients, loaded
+                           from the configuration if not set.
+        :param region_name: the region of the clients, overriding the
+                            region of each client configuration.
+        """
+        self._shared_session = session
+        self.region_name = region_name
         self.reset_clients()
 
     def reset_clients(self):
-        self._session = None
+        self._session = self._shared_session
         self._keystone = None
         self._glance = None
 
     def _get_keystone_session(self):
-        auth = ka_loading.load_auth_from_conf_options(CONF,
-                                                      _CLIENTS_AUTH_GROUP)
-        sess = ka_loading.load_session_from_conf_options(CONF,
-                                                         _CLIENTS_AUTH_GROUP,
-                                                         auth=auth)
-        return sess
+        return load_session()
 
     @property
     def auth_url(self):
@@ -44,14 +95,17 @@ class OpenStackClients(object):
     def _get_client_option(self, client, option):
         return getattr(getattr(CONF, '%s_client' % client), option)
 
+    def _get_region_name(self, client):
+        return (self.region_name or
+                self._get_client_option(client, 'region_name'))
+
     @exception.wrap_keystone_exception
     def keystone(self):
         if self._keystone:
             return self._keystone
         keystone_interface = self._get_client_option('keystone',
                                                      'interface')
-        keystone_region_name = self._get_client_option('keystone',
-                                                       'region_name')
+        keystone_region_name = self._get_region_name('keystone')
         self._keystone = keyclient.Client(
             interface=keystone_interface,
             region_name=keystone_region_name,
@@ -67,9 +121,74 @@ class OpenStackClients(object):
         glanceclient_version = self._get_client_option('glance', 'api_version')
         glance_endpoint_type = self._get_client_option('glance',
                                                        'endpoint_type')
-        glance_region_name = self._get_client_option('glance', 'region_name')
+        glance_region_name = self._get_region_name('glance')
         self._glance = glclient.Client(glanceclient_version,
                                        interface=glance_endpoint_type,
                                        region_name=glance_region_name,
                                        session=self.session)
         return self._glance
+
+
+class ClientRegistry(object):
+    """The clients of a process, one set per region."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session = None
+        self._clients = {}
+        self._refresher = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = load_session()
+        return self._session
+
+    def get(self, region_name=None):
+        """Return the clients of a region, the configured one by default."""
+        clients = self._clients.get(region_name)
+        if clients is None:
+            session = self.session
+            with self._lock:
+                clients = self._clients.setdefault(
+                    region_name, OpenStackClients(session, region_name))
+                self._start_refresher()
+        return clients
+
+    def _start_refresher(self):
+        margin = getattr(CONF, _CLIENTS_AUTH_GROUP).token_refresh_margin
+        if not margin or self._refresher is not None:
+            return
+        self._refresher = threading.Thread(target=self._refresh,
+                                           args=(margin,),
+                                           name='token-refresher',
+                                           daemon=True)
+        self._refresher.start()
+
+    def _refresh(self, margin):
+        # NOTE: the session only goes to keystone when the token expires
+        # within the margin, checking more often than that is enough.
+        while True:
+            time.sleep(max(margin / 2, 1))
+            try:
+                self.session.get_token()
+            except Exception as e:
+                LOG.warning("Failed to renew the token of the OpenStack "
+                            "clients: %s", e)
+
+    def reset(self):
+        with self._lock:
+            self._session = None
+            self._clients = {}
+
+
+def get_clients(region_name=None):
+    """Return the OpenStack clients shared by the process."""
+    global _REGISTRY
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                _REGISTRY = ClientRegistry()
+    return _REGISTRY.get(region_name)
@@ -109,11 +109,50 @@ class TaskAlreadyExists(Conflict):
     msg_fmt = _("A task with UUID %(uuid)s already exists")
 
 
+class ImageChecksumMismatch(ConvertorException):
+    msg_fmt = _("Data downloaded for image %(image)s does not match its "
+                "%(algorithm)s checksum")
+
+
+class ImageUploadFailed(ConvertorException):
+    msg_fmt = _("Failed to upload image %(image)s: %(reason)s")
+
+
+class NotificationPayloadError(ConvertorException):
+    msg_fmt = _("Payload not populated when trying to send notification "
+                "\"%(class_name)s\"")
+
+
+class UnsupportedError(ConvertorException):
+    msg_fmt = _("Not supported")
+
+
+class ScratchSpaceExhausted(ConvertorException):
+    msg_fmt = _("Timed out waiting for %(size)d bytes of scratch space")
+
+
 class Invalid(ConvertorException, ValueError):
     msg_fmt = _("Unacceptable parameters")
     code = HTTPStatus.BAD_REQUEST
 
 
+class InvalidIdentity(Invalid):
+    msg_fmt = _("Expected a uuid or int but received %(identity)s")
+
+
+class InvalidOperator(Invalid):
+    msg_fmt = _("Filter operator is not valid: %(operator)s not "
+                "in %(valid_operators)s")
+
+
+class InvalidParameterValue(Invalid):
+    msg_fmt = _("Invalid value for %(parameter)s: %(reason)s")
+
+
+class InvalidProfile(Invalid):
+    msg_fmt = _("Profile %(profile)s cannot be used: %(reason)s")
+
+
 class InvalidUUID(Invalid):
     msg_fmt = _("Expected a uuid but received %(uuid)s")
 
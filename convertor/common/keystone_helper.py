@@ -1,3 +1,7 @@
+import collections
+import threading
+import time
+
 from oslo_log import log
 
 from keystoneauth1.exceptions import http as ks_exceptions
@@ -11,77 +15,198 @@ from convertor import conf
 CONF = conf.CONF
 LOG = log.getLogger(__name__)
 
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+# Cached in place of a name or ID which matched nothing.
+_NOT_FOUND = object()
+
+
+class TTLCache(object):
+    """Bounded mapping whose entries expire after some time.
+
+    The least recently used entries are evicted first when the cache is
+    full.
+    """
+
+    def __init__(self, max_size, ttl, negative_ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """:returns: a (found, value) tuple."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def set(self, key, value):
+        ttl = self.negative_ttl if value is _NOT_FOUND else self.ttl
+        if not self.max_size or not ttl:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0,
+                    'entries': len(self._entries),
+                    'max_size': self.max_size}
+
+
+def get_cache():
+    """Return the keystone resource cache shared by the process."""
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = TTLCache(CONF.keystone_client.cache_size,
+                                  CONF.keystone_client.cache_ttl,
+                                  CONF.keystone_client.negative_cache_ttl)
+    return _CACHE
+
 
 class KeystoneHelper(object):
+    """Resolve keystone resources by name or ID.
+
+    Resolved resources, and the names or IDs which matched nothing, are
+    remembered for a while by a cache shared by all the helpers of the
+    process, see the ``[keystone_client]cache_*`` options.
+    """
 
-    def __init__(self, osc=None):
-        """:param osc: an OpenStackClients instance"""
-        self.osc = osc if osc else clients.OpenStackClients()
+    def __init__(self, osc=None, cache=None):
+        """:param osc: an OpenStackClients instance
+        :param cache: a :py:class:`TTLCache`, the shared one by default.
+        """
+        self.osc = osc if osc else clients.get_clients()
         self.keystone = self.osc.keystone()
+        self.cache = cache if cache is not None else get_cache()
 
-    def get_role(self, name_or_id):
+    def _remember(self, kind, name_or_id, resource):
+        self.cache.set((kind, name_or_id), resource)
+        if resource is not _NOT_FOUND:
+            # It is found by ID and by name from now on.
+            self.cache.set((kind, resource.id), resource)
+            if getattr(resource, 'name', None):
+                self.cache.set((kind, resource.name), resource)
+
+    def _resolve(self, kind, manager, label, name_or_id):
+        found, resource = self.cache.get((kind, name_or_id))
+        if not found:
+            resource = self._lookup(manager, label, name_or_id)
+            self._remember(kind, name_or_id, resource)
+        if resource is _NOT_FOUND:
+            raise exception.Invalid(
+                message=(_("%(label)s not Found: %(name)s") %
+                         {'label': label, 'name': name_or_id}))
+        return resource
+
+    @staticmethod
+    def _lookup(manager, label, name_or_id):
         try:
-            role = self.keystone.roles.get(name_or_id)
-            return role
+            return manager.get(name_or_id)
         except ks_exceptions.NotFound:
-            roles = self.keystone.roles.list(name=name_or_id)
-            if len(roles) == 0:
-                raise exception.Invalid(
-                    message=(_("Role not Found: %s") % name_or_id))
-            if len(roles) > 1:
+            resources = manager.list(name=name_or_id)
+            if len(resources) == 0:
+                return _NOT_FOUND
+            if len(resources) > 1:
                 raise exception.Invalid(
-                    message=(_("Role name seems ambiguous: %s") % name_or_id))
-        return roles[0]
+                    message=(_("%(label)s name seems ambiguous: %(name)s") %
+                             {'label': label, 'name': name_or_id}))
+            return resources[0]
+
+    def invalidate(self, kind, *names_or_ids):
+        """Forget what was resolved for some names or IDs.
+
+        :param kind: ``user``, ``project``, ``role`` or ``domain``.
+        """
+        for name_or_id in names_or_ids:
+            if name_or_id:
+                self.cache.invalidate((kind, name_or_id))
+
+    def cache_stats(self):
+        """Hits, misses and hit rate of the cache of the helpers."""
+        return self.cache.stats()
+
+    def get_role(self, name_or_id):
+        return self._resolve('role', self.keystone.roles, 'Role',
+                             name_or_id)
+
+    def get_roles(self, names_or_ids):
+        """Resolve several roles, with a single request for the misses.
+
+        :returns: the roles, in the order of ``names_or_ids``.
+        """
+        resolved = {}
+        for name_or_id in names_or_ids:
+            found, role = self.cache.get(('role', name_or_id))
+            if found:
+                resolved[name_or_id] = role
+        missing = [name_or_id for name_or_id in names_or_ids
+                   if name_or_id not in resolved]
+        if missing:
+            # NOTE: deployments have few roles, listing them all costs
+            # less than one round trip per role.
+            by_key = collections.defaultdict(list)
+            for role in self.keystone.roles.list():
+                by_key[role.id].append(role)
+                by_key[role.name].append(role)
+            for name_or_id in missing:
+                matches = by_key.get(name_or_id, [])
+                if len(matches) > 1:
+                    # Let the usual lookup tell an ID from a name.
+                    continue
+                resolved[name_or_id] = matches[0] if matches else _NOT_FOUND
+                self._remember('role', name_or_id, resolved[name_or_id])
+        roles = []
+        for name_or_id in names_or_ids:
+            role = resolved.get(name_or_id)
+            if role is None or role is _NOT_FOUND:
+                role = self.get_role(name_or_id)
+            roles.append(role)
+        return roles
 
     def get_user(self, name_or_id):
-        try:
-            user = self.keystone.users.get(name_or_id)
-            return user
-        except ks_exceptions.NotFound:
-            users = self.keystone.users.list(name=name_or_id)
-            if len(users) == 0:
-                raise exception.Invalid(
-                    message=(_("User not Found: %s") % name_or_id))
-            if len(users) > 1:
-                raise exception.Invalid(
-                    message=(_("User name seems ambiguous: %s") % name_or_id))
-            return users[0]
+        return self._resolve('user', self.keystone.users, 'User',
+                             name_or_id)
 
     def get_project(self, name_or_id):
-        try:
-            project = self.keystone.projects.get(name_or_id)
-            return project
-        except ks_exceptions.NotFound:
-            projects = self.keystone.projects.list(name=name_or_id)
-            if len(projects) == 0:
-                raise exception.Invalid(
-                    message=(_("Project not Found: %s") % name_or_id))
-            if len(projects) > 1:
-                raise exception.Invalid(
-                    messsage=(_("Project name seems ambiguous: %s") %
-                              name_or_id))
-            return projects[0]
+        return self._resolve('project', self.keystone.projects, 'Project',
+                             name_or_id)
 
     def get_domain(self, name_or_id):
-        try:
-            domain = self.keystone.domains.get(name_or_id)
-            return domain
-        except ks_exceptions.NotFound:
-            domains = self.keystone.domains.list(name=name_or_id)
-            if len(domains) == 0:
-                raise exception.Invalid(
-                    message=(_("Domain not Found: %s") % name_or_id))
-            if len(domains) > 1:
-                raise exception.Invalid(
-                    message=(_("Domain name seems ambiguous: %s") %
-                             name_or_id))
-            return domains[0]
+        return self._resolve('domain', self.keystone.domains, 'Domain',
+                             name_or_id)
 
     def create_session(self, user_id, password):
         user = self.get_user(user_id)
         loader = loading.get_plugin_loader('password')
         auth = loader.load_from_options(
-            auth_url=CONF.watcher_clients_auth.auth_url,
+            auth_url=CONF.convertor_clients_auth.auth_url,
             password=password,
             user_id=user_id,
             project_id=user.default_project_id)
@@ -90,14 +215,16 @@ class KeystoneHelper(object):
     def create_user(self, user):
         project = self.get_project(user['project'])
         domain = self.get_domain(user['domain'])
+        roles = self.get_roles(user['roles'])
         _user = self.keystone.users.create(
             user['name'],
             password=user['password'],
             domain=domain,
             project=project,
         )
-        for role in user['roles']:
-            role = self.get_role(role)
+        # The name may be remembered as matching nothing.
+        self.invalidate('user', user['name'])
+        for role in roles:
             self.keystone.roles.grant(
                 role.id, user=_user.id, project=project.id)
         return _user
@@ -106,5 +233,6 @@ class KeystoneHelper(object):
         try:
             user = self.get_user(user)
             self.keystone.users.delete(user)
+            self.invalidate('user', user.id, getattr(user, 'name', None))
         except exception.Invalid:
-            pass
\ No newline at end of file
+            pass
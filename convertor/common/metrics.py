@@ -0,0 +1,172 @@
+"""In-process metrics, exposed in the Prometheus text format.
+
+Histograms are recorded in memory: an observation is a bisection over the
+bucket bounds and two increments under a lock, cheap enough to time every
+request, query and task phase. They are rendered on demand by
+:py:func:`render`, which the API and worker processes serve on ports of
+their own, see ``[api]metrics_port`` and ``[convertor_worker]metrics_port``.
+
+The metrics are those of the process serving the scrape. Each process
+serves them on a distinct port rather than through a port shared with
+other processes, whose scrapes would land on any of them and make the
+counters jump back and forth.
+"""
+
+import bisect
+import contextlib
+import threading
+import time
+
+_INF = float('inf')
+
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30,
+                   60, 120, 300, 600, 1800, 3600, _INF)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_REGISTRY = []
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _format_value(value):
+    if value == _INF:
+        return '+Inf'
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', r'\\')
+                     .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels)
+
+
+class _HistogramChild(object):
+    """The observations of a histogram for one set of label values."""
+
+    def __init__(self, upper_bounds):
+        self._upper_bounds = upper_bounds
+        self._counts = [0] * len(upper_bounds)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextlib.contextmanager
+    def time(self):
+        """Observe the seconds spent in the ``with`` block."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class Histogram(object):
+    """A Prometheus histogram, optionally partitioned by labels."""
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.upper_bounds = tuple(sorted(buckets))
+        if self.upper_bounds[-1] != _INF:
+            self.upper_bounds += (_INF,)
+        self._children = {}
+        self._lock = threading.Lock()
+        register(self)
+
+    def labels(self, *values):
+        """Return the histogram of a set of label values."""
+        values = tuple(str(value) for value in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError("%s expects the labels %s" %
+                             (self.name, ', '.join(self.labelnames)))
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(
+                    values, _HistogramChild(self.upper_bounds))
+        return child
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def collect(self):
+        """Yield the lines of the histogram in the text format."""
+        yield '# HELP %s %s' % (self.name, self.documentation)
+        yield '# TYPE %s histogram' % self.name
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            labels = list(zip(self.labelnames, values))
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds, counts):
+                cumulative += count
+                yield '%s_bucket%s %d' % (
+                    self.name,
+                    _format_labels(labels + [('le', _format_value(bound))]),
+                    cumulative)
+            yield '%s_sum%s %s' % (self.name, _format_labels(labels),
+                                   _format_value(total))
+            yield '%s_count%s %d' % (self.name, _format_labels(labels),
+                                     cumulative)
+
+
+def register(metric):
+    with _REGISTRY_LOCK:
+        _REGISTRY.append(metric)
+
+
+def render():
+    """Return all the metrics of the process in the text format."""
+    with _REGISTRY_LOCK:
+        registry = list(_REGISTRY)
+    lines = []
+    for metric in registry:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+def wsgi_app(environ, start_response):
+    """WSGI application serving the metrics of the process."""
+    body = render().encode('utf-8')
+    start_response('200 OK', [('Content-Type', CONTENT_TYPE),
+                              ('Content-Length', str(len(body)))])
+    return [body]
+
+
+TASK_PHASE_SECONDS = Histogram(
+    'convertor_task_phase_seconds',
+    'Seconds spent by the tasks in each phase.',
+    ['phase'])
+
+RPC_QUEUE_SECONDS = Histogram(
+    'convertor_rpc_queue_seconds',
+    'Seconds between the cast of a task and its pickup by a worker.',
+    ['method'])
+
+API_REQUEST_SECONDS = Histogram(
+    'convertor_api_request_seconds',
+    'Seconds spent serving the API requests, by controller method.',
+    ['handler', 'method'])
+
+DB_QUERY_SECONDS = Histogram(
+    'convertor_db_query_seconds',
+    'Seconds spent executing the database statements, by kind.',
+    ['operation'])
@@ -1,3 +1,4 @@
+import os
 import socket
 
 from oslo_concurrency import processutils
@@ -11,8 +12,11 @@ from oslo_service import wsgi
 
 from convertor._i18n import _
 from convertor.api import app
+from convertor.api import watch
 from convertor.common import config
+from convertor.common import metrics
 from convertor.common import rpc
+from convertor.common import utils
 from convertor import objects
 from convertor.objects import base
 from convertor.objects import fields as wfields
@@ -25,7 +29,19 @@ NOTIFICATION_OPTS = [
                help=_('Specifies the minimum level for which to send '
                       'notifications. If not set, no notifications will '
                       'be sent. The default is for this option to be at the '
-                      '`INFO` level.'))
+                      '`INFO` level.')),
+    cfg.IntOpt('notification_queue_size',
+               default=10000,
+               min=1,
+               help=_('Maximum number of notifications waiting to be sent '
+                      'by a process. Notifications are dropped while the '
+                      'queue is full, so that they never slow down the '
+                      'tasks.')),
+    cfg.IntOpt('notification_batch_size',
+               default=100,
+               min=1,
+               help=_('Maximum number of queued notifications sent at '
+                      'once by the background sender of a process.')),
 ]
 cfg.CONF.register_opts(NOTIFICATION_OPTS)
 
@@ -61,14 +77,26 @@ class WSGIService(service.ServiceBase):
                                   port=CONF.api.port,
                                   use_ssl=use_ssl,
                                   logger_name=self.service_name)
+        self.metrics = None
 
     def start(self):
         """Start serving this service using loaded configuration"""
+        # NOTE: started here, once the API worker processes are forked.
+        watch.start()
+        if CONF.api.metrics_port and self.metrics is None:
+            self.metrics = MetricsService(
+                '%s-metrics' % self.service_name, CONF.api.metrics_host,
+                CONF.api.metrics_port)
+        if self.metrics:
+            self.metrics.start()
         self.server.start()
 
     def stop(self):
         """Stop serving this API"""
         self.server.stop()
+        if self.metrics:
+            self.metrics.stop()
+        watch.stop()
 
     def wait(self):
         """Wait for the service to stop serving this API"""
@@ -79,6 +107,34 @@ class WSGIService(service.ServiceBase):
         self.server.reset()
 
 
+class MetricsService(service.ServiceBase):
+    """Serves the metrics of the process on a port of its own.
+
+    The processes of a host serving the same metrics take a slot each, and
+    serve them on ``base_port`` plus their slot.
+    """
+
+    def __init__(self, service_name, host, base_port):
+        # NOTE: the slot is held until the process exits.
+        self.slot, self._slot_lock = utils.claim_slot(
+            os.path.join(CONF.state_path, service_name))
+        self.server = wsgi.Server(CONF, service_name, metrics.wsgi_app,
+                                  host=host, port=base_port + self.slot,
+                                  logger_name=service_name)
+
+    def start(self):
+        self.server.start()
+
+    def stop(self):
+        self.server.stop()
+
+    def wait(self):
+        self.server.wait()
+
+    def reset(self):
+        self.server.reset()
+
+
 class Service(service.ServiceBase):
 
     API_VERSION = '1.0'
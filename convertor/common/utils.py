@@ -1,5 +1,10 @@
+import errno
+import fcntl
+import os
+
 from oslo_log import log
 from oslo_utils import strutils
+from oslo_utils import uuidutils
 
 LOG = log.getLogger(__name__)
 
@@ -20,3 +25,50 @@ def safe_rstrip(value, chars=None):
 
 
 is_int_like = strutils.is_int_like
+
+generate_uuid = uuidutils.generate_uuid
+is_uuid_like = uuidutils.is_uuid_like
+
+
+def claim_slot(directory):
+    """Lock the lowest slot no other process of the host holds.
+
+    Processes of a host taking slots in the same directory each get a
+    distinct small integer, and a restarted process gets back the slot of
+    the one it replaces.
+
+    :returns: the slot and the open lock file, which holds the slot until
+              it is closed, or the process exits.
+    """
+    os.makedirs(directory, exist_ok=True)
+    slot = 0
+    while True:
+        lock = open(os.path.join(directory, '%d.lock' % slot), 'a')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return slot, lock
+        except OSError as e:
+            lock.close()
+            if e.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+        slot += 1
+
+
+def slot_held(directory, slot):
+    """Tell whether another process holds a slot of ``directory``.
+
+    See :py:func:`claim_slot`.
+    """
+    try:
+        lock = open(os.path.join(directory, '%d.lock' % slot), 'r')
+    except FileNotFoundError:
+        return False
+    with lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+            return True
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        return False
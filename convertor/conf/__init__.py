@@ -6,10 +6,14 @@ from convertor.conf import clients_auth
 from convertor.conf import db
 from convertor.conf import glance_client
 from convertor.conf import keystone_client
+from convertor.conf import paths
+from convertor.conf import service
 
 
 CONF = cfg.CONF
 
+paths.register_opts(CONF)
+service.register_opts(CONF)
 api.register_opts(CONF)
 db.register_opts(CONF)
 worker.register_opts(CONF)
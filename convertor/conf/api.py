@@ -38,6 +38,50 @@ API_SERVICE_OPTS = [
                      "will want to change public API endpoint to represent "
                      "SSL termination URL with 'public_endpoint' option."),
 
+    cfg.BoolOpt('coalesce_tasks',
+                default=True,
+                help='Attach a new task to an unfinished task converting '
+                     'the same image to the same format instead of '
+                     'scheduling the same conversion twice. The attached '
+                     'task finishes together with the task it follows.'),
+
+    cfg.IntOpt('max_batch_size',
+               default=1000,
+               min=1,
+               help='The maximum number of tasks that can be submitted in '
+                    'a single request to the batch endpoint.'),
+    cfg.IntOpt('batch_cast_size',
+               default=100,
+               min=1,
+               help='The maximum number of tasks announced to the workers '
+                    'in a single RPC message. Each message is consumed by '
+                    'one worker, so smaller messages spread a batch over '
+                    'more workers.'),
+
+    cfg.IntOpt('max_wait',
+               default=60,
+               min=0,
+               help='The maximum number of seconds a request for a task can '
+                    'wait for the task to change with the wait parameter. '
+                    'The API learns about the changes from the '
+                    'notifications of the workers, which requires a '
+                    'notification driver. Each waiting request holds a '
+                    'green thread of the WSGI server, see '
+                    '[DEFAULT]wsgi_default_pool_size. 0 disables waiting.'),
+
+    cfg.PortOpt('metrics_port',
+                default=0,
+                help='The first port on which the API processes serve their '
+                     'metrics in the Prometheus text format, without '
+                     'authentication. Each API process of a host serves its '
+                     'own metrics on this port plus its slot, from 0 to the '
+                     'number of workers minus 1, and should be scraped as '
+                     'a target of its own. 0 disables it.'),
+    cfg.HostAddressOpt('metrics_host',
+                       default='127.0.0.1',
+                       help='The listen IP address of the metrics servers '
+                            'of the API processes.'),
+
     cfg.BoolOpt('enable_webhooks_auth',
                 default=True,
                 help='This option enables or disables webhook request '
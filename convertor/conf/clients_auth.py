@@ -1,13 +1,32 @@
 from keystoneauth1 import loading as ka_loading
+from oslo_config import cfg
 
-WATCHER_CLIENTS_AUTH = 'watcher_clients_auth'
+CONVERTOR_CLIENTS_AUTH = 'convertor_clients_auth'
+
+CLIENTS_OPTS = [
+    cfg.IntOpt('connection_pool_size',
+               min=1,
+               help='Maximum number of HTTP connections kept open to each '
+                    'OpenStack endpoint by a process. The clients of a '
+                    'process share them. Defaults to enough connections '
+                    'for every worker green thread to download with '
+                    '[convertor_worker]download_concurrency connections.'),
+    cfg.IntOpt('token_refresh_margin',
+               default=300,
+               min=0,
+               help='Number of seconds before its expiry at which the '
+                    'token shared by the clients of a process is renewed '
+                    'in the background, so that no request waits for '
+                    'keystone. 0 renews it on demand only.'),
+]
 
 
 def register_opts(conf):
-    ka_loading.register_session_conf_options(conf, WATCHER_CLIENTS_AUTH)
-    ka_loading.register_auth_conf_options(conf, WATCHER_CLIENTS_AUTH)
+    ka_loading.register_session_conf_options(conf, CONVERTOR_CLIENTS_AUTH)
+    ka_loading.register_auth_conf_options(conf, CONVERTOR_CLIENTS_AUTH)
+    conf.register_opts(CLIENTS_OPTS, group=CONVERTOR_CLIENTS_AUTH)
 
 
 def list_opts():
-    return [(WATCHER_CLIENTS_AUTH, ka_loading.get_session_conf_options() +
-            ka_loading.get_auth_common_conf_options())]
\ No newline at end of file
+    return [(CONVERTOR_CLIENTS_AUTH, ka_loading.get_session_conf_options() +
+            ka_loading.get_auth_common_conf_options() + CLIENTS_OPTS)]
@@ -10,7 +10,23 @@ KEYSTONE_CLIENT_OPTS = [
                help='Type of endpoint to use in keystoneclient.'),
     cfg.StrOpt('region_name',
                help='Region in Identity service catalog to use for '
-                    'communication with the OpenStack service.')]
+                    'communication with the OpenStack service.'),
+    cfg.IntOpt('cache_size',
+               default=1024,
+               min=0,
+               help='Maximum number of users, projects, roles and domains '
+                    'a process remembers after resolving them by name or '
+                    'ID. 0 disables the cache.'),
+    cfg.IntOpt('cache_ttl',
+               default=300,
+               min=1,
+               help='Number of seconds a resolved user, project, role or '
+                    'domain is remembered.'),
+    cfg.IntOpt('negative_cache_ttl',
+               default=30,
+               min=0,
+               help='Number of seconds a name or ID which matched nothing '
+                    'is remembered as such. 0 does not remember them.')]
 
 
 def register_opts(conf):
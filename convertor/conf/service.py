@@ -0,0 +1,21 @@
+import socket
+
+from oslo_config import cfg
+
+SERVICE_OPTS = [
+    cfg.StrOpt('host',
+               default=socket.gethostname(),
+               sample_default='<myhost>',
+               help='Name of this node. This can be an opaque identifier. '
+                    'It is not necessarily a hostname, FQDN, or IP address. '
+                    'It identifies the services of the node on the message '
+                    'bus and in the notifications they send.'),
+]
+
+
+def register_opts(conf):
+    conf.register_opts(SERVICE_OPTS)
+
+
+def list_opts():
+    return [('DEFAULT', SERVICE_OPTS)]
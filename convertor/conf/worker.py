@@ -1,15 +1,19 @@
+import copy
+
 from oslo_config import cfg
 
-watcher_applier = cfg.OptGroup(name='watcher_applier',
-                               title='Options for the Applier messaging '
-                               'core')
+convertor_worker = cfg.OptGroup(name='convertor_worker',
+                                title='Options for the Worker messaging '
+                                'core')
 
-APPLIER_MANAGER_OPTS = [
+WORKER_MANAGER_OPTS = [
     cfg.IntOpt('workers',
                default=1,
                min=1,
                required=True,
-               help='Number of workers for applier, default value is 1.'),
+               help='Number of tasks a worker handles at the same time, '
+                    'default value is 1. Conversions started by these tasks '
+                    'are further limited by conversion_workers.'),
     cfg.StrOpt('conductor_topic',
                default='convertor.worker.control',
                help='The topic name used for '
@@ -23,13 +27,329 @@ APPLIER_MANAGER_OPTS = [
                default='taskflow',
                required=True,
                help='Select the engine to use to execute the workflow'),
+    cfg.ListOpt('scratch_dirs',
+                default=['/tmp/convertor_imgs'],
+                deprecated_name='scratch_dir',
+                help='Directories where images are staged while they are '
+                     'downloaded and converted, possibly on different '
+                     'devices. Each conversion is placed in the directory '
+                     'with the most available space.'),
+    cfg.IntOpt('scratch_quota',
+               default=0,
+               min=0,
+               help='Maximum amount of space, in MiB, reserved by the '
+                    'conversions in each scratch directory. 0 means only '
+                    'the free space of the device is a limit.'),
+    cfg.BoolOpt('scratch_preallocate',
+                default=True,
+                help='Preallocate the staged images with fallocate, so '
+                     'that a download never runs out of space midway and '
+                     'is not fragmented on disk. Skipped on the '
+                     'filesystems which do not support fallocate.'),
+    cfg.IntOpt('scratch_wait_timeout',
+               default=3600,
+               min=0,
+               help='Time, in seconds, a conversion waits for scratch '
+                    'space to be released before failing.'),
+    cfg.IntOpt('scratch_stale_age',
+               default=21600,
+               min=0,
+               help='Age, in seconds, after which the scratch directories '
+                    'left behind by a worker that did not shut down '
+                    'cleanly are removed, when a worker starts and then '
+                    'every scratch_gc_interval seconds. Until then, a task '
+                    'claimed again resumes its download. The directories '
+                    'of the running workers of the host are kept.'),
+    cfg.IntOpt('scratch_gc_interval',
+               default=3600,
+               min=0,
+               help='Interval, in seconds, at which the workers remove the '
+                    'stale scratch directories, see scratch_stale_age. 0 '
+                    'only removes them when a worker starts.'),
+    cfg.BoolOpt('pipeline_mode',
+                default=False,
+                help='Stream raw and qcow2 images from Glance straight into '
+                     'qemu-img through a local NBD endpoint served by '
+                     'nbdkit, so that download and conversion overlap '
+                     'instead of staging the whole source image on disk '
+                     'first. Images in other formats, or hosts without '
+                     'nbdkit, fall back to the staged download.'),
+    cfg.StrOpt('nbdkit_path',
+               default='nbdkit',
+               help='Path of the nbdkit executable used by the pipeline '
+                    'mode.'),
+    cfg.IntOpt('pipeline_max_requests',
+               default=8,
+               min=1,
+               max=16,
+               help='Maximum number of in-flight read requests qemu-img '
+                    'issues against the NBD endpoint in pipeline mode. '
+                    'Together with the nbdkit readahead window this bounds '
+                    'the amount of image data buffered in memory.'),
+    cfg.IntOpt('conversion_workers',
+               min=1,
+               help='Maximum number of qemu-img conversions a worker runs '
+                    'at the same time. The default is equal to the number '
+                    'of CPUs available if that can be determined, else 1. '
+                    'Conversions are further limited by the admission '
+                    'control options below.'),
+    cfg.IntOpt('cpus_per_conversion',
+               default=1,
+               min=1,
+               help='Number of CPU cores accounted to each running '
+                    'conversion by the admission control.'),
+    cfg.IntOpt('reserved_cpus',
+               default=0,
+               min=0,
+               help='Number of CPU cores kept free for other services '
+                    'running on the worker host.'),
+    cfg.IntOpt('reserved_scratch_space',
+               default=1024,
+               min=0,
+               help='Amount of disk space, in MiB, that is never handed '
+                    'out to conversions in each scratch directory.'),
+    cfg.IntOpt('max_io_bandwidth',
+               default=0,
+               min=0,
+               help='Disk bandwidth, in MiB/s, the worker may use for '
+                    'conversions in total. 0 means unlimited.'),
+    cfg.IntOpt('io_bandwidth_per_conversion',
+               default=100,
+               min=1,
+               help='Disk bandwidth, in MiB/s, accounted to each running '
+                    'conversion when max_io_bandwidth is set.'),
+    cfg.IntOpt('download_concurrency',
+               default=4,
+               min=1,
+               help='Number of byte ranges of an image downloaded from '
+                    'Glance at the same time, when the image backend '
+                    'supports range requests.'),
+    cfg.IntOpt('download_range_size',
+               default=64,
+               min=1,
+               help='Size, in MiB, of the byte ranges an image is split '
+                    'into for parallel download. A failed download resumes '
+                    'from the last completed range.'),
+    cfg.IntOpt('download_chunk_size',
+               default=1024,
+               min=4,
+               help='Size, in KiB, of the chunks read from the HTTP '
+                    'response while downloading an image.'),
+    cfg.IntOpt('download_buffer_size',
+               default=8,
+               min=1,
+               help='Size, in MiB, of the buffer downloaded chunks are '
+                    'coalesced in before being written to disk. Each '
+                    'concurrent range download uses its own buffer.'),
+    cfg.StrOpt('download_io_mode',
+               default='drop-behind',
+               choices=[('buffered', 'Write through the page cache.'),
+                        ('drop-behind', 'Write through the page cache and '
+                         'drop the written data from it every '
+                         'download_drop_interval MiB.'),
+                        ('direct', 'Bypass the page cache with O_DIRECT. '
+                         'Falls back to drop-behind on filesystems which '
+                         'do not support it.')],
+               help='How downloaded images are written, so that large '
+                    'downloads do not evict the page cache of the host.'),
+    cfg.IntOpt('download_drop_interval',
+               default=64,
+               min=1,
+               help='Amount of data, in MiB, written between two flushes '
+                    'of a download dropping it from the page cache.'),
+    cfg.StrOpt('cache_dir',
+               default='/var/cache/convertor/images',
+               help='Directory holding the cache of converted images. '
+                    'Placing it on the same filesystem as a scratch_dirs '
+                    'lets artifacts be cached without copying them.'),
+    cfg.IntOpt('cache_max_size',
+               default=10240,
+               min=0,
+               help='Maximum size, in MiB, of the cache of converted '
+                    'images. 0 disables the cache.'),
+    cfg.StrOpt('cache_eviction_policy',
+               default='lru',
+               choices=[('lru', 'Evict the least recently used images.'),
+                        ('lfu', 'Evict the least frequently used images.')],
+               help='Policy used to evict images when the cache of '
+                    'converted images is full.'),
+    cfg.IntOpt('claim_interval',
+               default=10,
+               min=0,
+               help='Interval, in seconds, at which the worker claims '
+                    'pending tasks from the database and renews the leases '
+                    'of the tasks it runs. 0 disables claiming; tasks are '
+                    'then only run when the API announces them.'),
+    cfg.IntOpt('claim_batch_size',
+               default=10,
+               min=1,
+               help='Maximum number of tasks claimed at once. A worker '
+                    'never claims more tasks than it has free workers.'),
+    cfg.IntOpt('lease_duration',
+               default=300,
+               min=1,
+               help='Time, in seconds, a claimed task stays reserved for '
+                    'its worker without being renewed. Tasks whose lease '
+                    'expired, e.g. because their worker died, are claimed '
+                    'again by other workers. Must be well above '
+                    'claim_interval.'),
+    cfg.BoolOpt('upload_images',
+                default=True,
+                help='Publish converted images as new Glance images. The '
+                     'ID of the new image is recorded on the task.'),
+    cfg.IntOpt('upload_chunk_size',
+               default=1024,
+               min=4,
+               help='Size, in KiB, of the chunks a converted image is '
+                    'streamed to Glance in.'),
+    cfg.IntOpt('import_timeout',
+               default=600,
+               min=1,
+               help='Time, in seconds, to wait for Glance to import a '
+                    'staged image before failing the task.'),
+    cfg.IntOpt('import_poll_interval',
+               default=2,
+               min=1,
+               help='Interval, in seconds, between checks of the status of '
+                    'an image being imported by Glance.'),
+    cfg.IntOpt('sparse_size',
+               default=4,
+               min=0,
+               help='Size, in KiB, of the runs of zeros that are left as '
+                    'holes instead of being written, both in the images '
+                    'staged from Glance (which skip zero chunks of '
+                    'download_chunk_size) and in the converted images '
+                    '(qemu-img -S). 0 writes every byte.'),
+    cfg.ListOpt('profiles',
+                default=['default', 'throughput', 'compact'],
+                help='Names of the qemu-img performance profiles tasks can '
+                     'select. The settings of a profile are read from the '
+                     '[convertor_profile_<name>] group.'),
+    cfg.StrOpt('default_profile',
+               default='default',
+               help='Profile used by the tasks which do not select one, '
+                    'when it applies to their target format.'),
+    cfg.IntOpt('progress_interval',
+               default=5,
+               min=1,
+               help='Interval, in seconds, at which the progress of the '
+                    'running tasks is written to the database, all tasks '
+                    'of the worker at once.'),
+    cfg.PortOpt('metrics_port',
+                default=0,
+                help='The first port on which the workers serve their '
+                     'metrics in the Prometheus text format. Each worker of '
+                     'a host serves them on this port plus its slot, from 0 '
+                     'to the number of workers of the host minus 1. 0 '
+                     'disables it.'),
+    cfg.HostAddressOpt('metrics_host',
+                       default='127.0.0.1',
+                       help='The listen IP address of the metrics server '
+                            'of the worker.'),
+    cfg.StrOpt('scheduling_policy',
+               default='fifo',
+               choices=[('fifo', 'Tasks are run in the order they are '
+                                 'announced to the workers.'),
+                        ('fair', 'Tasks are claimed by weighted fair '
+                                 'queuing across projects, by priority '
+                                 'within a project. Announcements only '
+                                 'wake the workers up.')],
+               help='How the workers pick the next tasks to run.'),
+    cfg.DictOpt('project_weights',
+                default={},
+                help='Share of the workers given to projects under the fair '
+                     'scheduling policy, as project_id:weight pairs. A '
+                     'project of weight 2 runs twice as many tasks as a '
+                     'project of weight 1 when both have tasks waiting.'),
+    cfg.FloatOpt('default_project_weight',
+                 default=1.0,
+                 min=0.001,
+                 help='Weight of the projects not listed in '
+                      'project_weights.'),
+    cfg.IntOpt('max_tasks_per_project',
+               default=0,
+               min=0,
+               help='Maximum number of tasks of a project running at once '
+                    'across all the workers under the fair scheduling '
+                    'policy. 0 means no limit.'),
+    cfg.DictOpt('project_max_tasks',
+                default={},
+                help='Per-project overrides of max_tasks_per_project, as '
+                     'project_id:limit pairs.'),
 ]
 
+_CACHE_MODES = ['none', 'writeback', 'writethrough', 'directsync', 'unsafe']
+
+PROFILE_OPTS = [
+    cfg.ListOpt('formats',
+                default=[],
+                help='Target formats this profile can be used for. Empty '
+                     'means any format.'),
+    cfg.IntOpt('coroutines',
+               min=1,
+               max=16,
+               help='Number of parallel coroutines qemu-img runs the '
+                    'conversion with (-m). Compressed output is also '
+                    'compressed in parallel by these coroutines.'),
+    cfg.BoolOpt('out_of_order',
+                default=False,
+                help='Allow out-of-order writes to the target (-W). Not '
+                     'compatible with compressed output.'),
+    cfg.StrOpt('source_cache',
+               choices=_CACHE_MODES,
+               help='Cache mode used to read the source image (-T). '
+                    '"none" bypasses the page cache, which needs a '
+                    'filesystem supporting O_DIRECT.'),
+    cfg.StrOpt('target_cache',
+               choices=_CACHE_MODES,
+               help='Cache mode used to write the target image (-t). '
+                    '"none" bypasses the page cache, which needs a '
+                    'filesystem supporting O_DIRECT.'),
+    cfg.BoolOpt('compress',
+                default=False,
+                help='Compress the target image (-c). Only for qcow2.'),
+    cfg.StrOpt('compression_type',
+               choices=['zlib', 'zstd'],
+               help='Compression algorithm of a compressed qcow2 target.'),
+]
+
+BUILTIN_PROFILES = {
+    'default': {},
+    'throughput': {'coroutines': 16,
+                   'out_of_order': True,
+                   'source_cache': 'none',
+                   'target_cache': 'none'},
+    'compact': {'formats': ['qcow2'],
+                'coroutines': 8,
+                'compress': True,
+                'compression_type': 'zstd'},
+}
+
+
+def profile_group(name):
+    return 'convertor_profile_%s' % name
+
+
+def profile_opts(name):
+    """Return the options of a profile, with the defaults of its preset."""
+    opts = copy.deepcopy(PROFILE_OPTS)
+    cfg.set_defaults(opts, **BUILTIN_PROFILES.get(name, {}))
+    return opts
+
+
+def register_profile_opts(conf, name):
+    group = profile_group(name)
+    if group not in conf:
+        conf.register_opts(profile_opts(name), group=group)
+    return getattr(conf, group)
+
 
 def register_opts(conf):
-    conf.register_group(watcher_applier)
-    conf.register_opts(APPLIER_MANAGER_OPTS, group=watcher_applier)
+    conf.register_group(convertor_worker)
+    conf.register_opts(WORKER_MANAGER_OPTS, group=convertor_worker)
 
 
 def list_opts():
-    return [(watcher_applier, APPLIER_MANAGER_OPTS)]
+    return ([(convertor_worker, WORKER_MANAGER_OPTS)] +
+            [(profile_group(name), profile_opts(name))
+             for name in sorted(BUILTIN_PROFILES)])
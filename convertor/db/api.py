@@ -21,7 +21,8 @@ class BaseConnection(object, metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
     def get_task_list(self, context, filters=None, limit=None,
-                      marker=None, sort_key=None, sort_dir=None):
+                      marker=None, sort_key=None, sort_dir=None,
+                      cursor=None, columns=None):
         """Get specific columns for matching tasks.
 
         Return a list of the specified columns for all goals that
@@ -35,7 +36,13 @@ class BaseConnection(object, metaclass=abc.ABCMeta):
         :param sort_key: Attribute by which results should be sorted.
         :param sort_dir: direction in which results should be sorted.
                          (asc, desc)
-        :returns: A list of tuples of the specified columns.
+        :param cursor: a (sort_key value, id) pair identifying the last item
+                       of the previous page, used instead of ``marker`` to
+                       seek directly to the next page.
+        :param columns: names of the columns to select. Defaults to None,
+                        selecting whole tasks.
+        :returns: A list of tuples of the specified columns, or of tasks
+                  when no columns are specified.
         """
 
     @abc.abstractmethod
@@ -46,6 +53,18 @@ class BaseConnection(object, metaclass=abc.ABCMeta):
         :returns: A task
         """
 
+    @abc.abstractmethod
+    def create_task_list(self, values_list):
+        """Create several tasks at once.
+
+        All the tasks are inserted with a single statement, in a single
+        transaction: either all of them are created or none is.
+
+        :param values_list: A list of dicts
+        :returns: A list of tasks, in the order of ``values_list``
+        :raises: :py:class:`~.TaskAlreadyExists`
+        """
+
     @abc.abstractmethod
     def get_task_by_id(self, context, task_id, eager=False):
         """Return a task given its ID.
@@ -68,6 +87,16 @@ class BaseConnection(object, metaclass=abc.ABCMeta):
         :raises: :py:class:`~.TaskNotFound`
         """
 
+    @abc.abstractmethod
+    def get_task_version(self, context, task_id):
+        """Return what identifies the current version of a task.
+
+        :param context: The security context
+        :param task_id: The ID or UUID of a task
+        :returns: A (id, updated_at) tuple
+        :raises: :py:class:`~.TaskNotFound`
+        """
+
     @abc.abstractmethod
     def destroy_task(self, task_uuid):
         """Destroy a goal.
@@ -87,6 +116,70 @@ class BaseConnection(object, metaclass=abc.ABCMeta):
         :raises: :py:class:`~.Invalid`
         """
 
+    @abc.abstractmethod
+    def update_followers(self, leader_uuid, values):
+        """Update properties of all tasks attached to a leader task.
+
+        :param leader_uuid: The UUID of the leader task
+        :param values: A dict
+        :returns: The number of updated tasks
+        """
+
+    @abc.abstractmethod
+    def update_task_progress(self, progress):
+        """Update the progress of several running tasks at once.
+
+        Tasks which are not in progress anymore are left untouched.
+
+        :param progress: A dict mapping task UUIDs to dicts of values
+        """
+
+    @abc.abstractmethod
+    def get_claim_candidates(self, limit):
+        """Return the tasks each project would have claimed first.
+
+        :param limit: Maximum number of tasks returned per project
+        :returns: A list of dicts holding the ``id``, ``project_id`` and
+                  ``priority`` of claimable tasks, in the order the tasks
+                  of each project should be claimed
+        """
+
+    @abc.abstractmethod
+    def count_running_tasks(self):
+        """Count the tasks running under a valid lease, by project.
+
+        :returns: A dict mapping project IDs to task counts
+        """
+
+    @abc.abstractmethod
+    def claim_tasks(self, worker, limit, lease_duration, task_uuid=None,
+                    task_ids=None):
+        """Atomically claim tasks for a worker.
+
+        A task can be claimed when it is not attached to a leader and
+        either has not started yet or is in progress with an expired lease.
+        Claimed tasks are marked in progress and leased to ``worker``.
+        Tasks locked by a concurrent claim are skipped rather than waited
+        for.
+
+        :param worker: The identifier of the claiming worker
+        :param limit: Maximum number of tasks to claim
+        :param lease_duration: Duration of the lease, in seconds
+        :param task_uuid: Only claim the task with this UUID
+        :param task_ids: Only claim tasks among these IDs
+        :returns: A list of claimed tasks
+        """
+
+    @abc.abstractmethod
+    def renew_leases(self, worker, task_uuids, lease_duration):
+        """Extend the leases a worker holds on tasks.
+
+        :param worker: The identifier of the worker holding the leases
+        :param task_uuids: The UUIDs of the leased tasks
+        :param lease_duration: Duration of the lease, in seconds
+        :returns: The number of renewed leases
+        """
+
     def soft_delete_task(self, task_id):
         """Soft delete a task.
 
@@ -0,0 +1,40 @@
+"""Initial schema
+
+Revision ID: 001
+Revises:
+Create Date: 2021-12-14 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'tasks',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.Column('deleted', sa.Integer(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False, autoincrement=True),
+        sa.Column('uuid', sa.String(length=36), nullable=True),
+        sa.Column('image_id', sa.String(length=63), nullable=False),
+        sa.Column('bucket_id', sa.String(length=63), nullable=False),
+        sa.Column('new_format', sa.String(length=15), nullable=False),
+        sa.Column('status', sa.String(length=63), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('uuid', name='uniq_tasks0uuid'),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8'
+    )
+
+
+def downgrade():
+    op.drop_table('tasks')
@@ -0,0 +1,25 @@
+"""Add leader_uuid to tasks
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tasks', sa.Column('leader_uuid', sa.String(length=36),
+                                     nullable=True))
+
+
+def downgrade():
+    op.drop_column('tasks', 'leader_uuid')
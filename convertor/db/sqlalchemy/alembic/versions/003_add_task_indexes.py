@@ -0,0 +1,34 @@
+"""Add indexes matching the task access patterns
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('tasks_deleted_at_status_id_idx', ['deleted_at', 'status', 'id']),
+    ('tasks_deleted_at_created_at_id_idx', ['deleted_at', 'created_at', 'id']),
+    ('tasks_bucket_id_deleted_at_id_idx', ['bucket_id', 'deleted_at', 'id']),
+    ('tasks_image_id_new_format_status_idx',
+     ['image_id', 'new_format', 'status']),
+    ('tasks_leader_uuid_idx', ['leader_uuid']),
+)
+
+
+def upgrade():
+    for name, columns in INDEXES:
+        op.create_index(name, 'tasks', columns)
+
+
+def downgrade():
+    for name, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name='tasks')
@@ -0,0 +1,25 @@
+"""Add an index for listing the tasks of a bucket by status
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('tasks_bucket_id_status_deleted_at_id_idx', 'tasks',
+                    ['bucket_id', 'status', 'deleted_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('tasks_bucket_id_status_deleted_at_id_idx',
+                  table_name='tasks')
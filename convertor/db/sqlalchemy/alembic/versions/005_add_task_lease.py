@@ -0,0 +1,31 @@
+"""Add the claim and lease of tasks
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tasks', sa.Column('claimed_by', sa.String(length=255),
+                                     nullable=True))
+    op.add_column('tasks', sa.Column('lease_expires_at', sa.DateTime(),
+                                     nullable=True))
+    op.create_index('tasks_status_lease_expires_at_idx', 'tasks',
+                    ['status', 'lease_expires_at'])
+
+
+def downgrade():
+    op.drop_index('tasks_status_lease_expires_at_idx', table_name='tasks')
+    op.drop_column('tasks', 'lease_expires_at')
+    op.drop_column('tasks', 'claimed_by')
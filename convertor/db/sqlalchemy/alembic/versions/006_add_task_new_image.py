@@ -0,0 +1,25 @@
+"""Add new_image_id to tasks
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tasks', sa.Column('new_image_id', sa.String(length=36),
+                                     nullable=True))
+
+
+def downgrade():
+    op.drop_column('tasks', 'new_image_id')
@@ -0,0 +1,28 @@
+"""Add the sizes of the converted image to tasks
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tasks', sa.Column('virtual_size', sa.BigInteger(),
+                                     nullable=True))
+    op.add_column('tasks', sa.Column('allocated_size', sa.BigInteger(),
+                                     nullable=True))
+
+
+def downgrade():
+    op.drop_column('tasks', 'allocated_size')
+    op.drop_column('tasks', 'virtual_size')
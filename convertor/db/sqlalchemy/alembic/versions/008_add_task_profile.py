@@ -0,0 +1,25 @@
+"""Add profile to tasks
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tasks', sa.Column('profile', sa.String(length=63),
+                                     nullable=True))
+
+
+def downgrade():
+    op.drop_column('tasks', 'profile')
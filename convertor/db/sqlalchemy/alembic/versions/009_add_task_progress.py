@@ -0,0 +1,36 @@
+"""Add the progress of tasks
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tasks', sa.Column('phase', sa.String(length=31),
+                                     nullable=True))
+    op.add_column('tasks', sa.Column('bytes_downloaded', sa.BigInteger(),
+                                     nullable=True))
+    op.add_column('tasks', sa.Column('conversion_progress', sa.Integer(),
+                                     nullable=True))
+    op.add_column('tasks', sa.Column('bytes_uploaded', sa.BigInteger(),
+                                     nullable=True))
+    op.add_column('tasks', sa.Column('eta', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('tasks', 'eta')
+    op.drop_column('tasks', 'bytes_uploaded')
+    op.drop_column('tasks', 'conversion_progress')
+    op.drop_column('tasks', 'bytes_downloaded')
+    op.drop_column('tasks', 'phase')
@@ -0,0 +1,31 @@
+"""Add project and priority to tasks
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tasks', sa.Column('project_id', sa.String(length=64),
+                                     nullable=True))
+    op.add_column('tasks', sa.Column('priority', sa.Integer(),
+                                     nullable=False, server_default='0'))
+    op.create_index('tasks_status_project_id_idx', 'tasks',
+                    ['status', 'project_id'])
+
+
+def downgrade():
+    op.drop_index('tasks_status_project_id_idx', table_name='tasks')
+    op.drop_column('tasks', 'priority')
+    op.drop_column('tasks', 'project_id')
@@ -0,0 +1,34 @@
+"""Store the update time of tasks to the microsecond
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'mysql':
+        # NOTE: the ETags of the tasks are derived from updated_at, which
+        # must tell apart two updates within the same second.
+        op.alter_column('tasks', 'updated_at',
+                        existing_type=mysql.DATETIME(),
+                        type_=mysql.DATETIME(fsp=6),
+                        existing_nullable=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'mysql':
+        op.alter_column('tasks', 'updated_at',
+                        existing_type=mysql.DATETIME(fsp=6),
+                        type_=mysql.DATETIME(),
+                        existing_nullable=True)
@@ -0,0 +1,25 @@
+"""Add the token of the claim which took a task
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tasks', sa.Column('claim_token', sa.String(length=36),
+                                     nullable=True))
+
+
+def downgrade():
+    op.drop_column('tasks', 'claim_token')
@@ -3,18 +3,23 @@
 import collections
 import datetime
 import operator
+import time
 
 from oslo_config import cfg
 from oslo_db import exception as db_exc
 from oslo_db.sqlalchemy import session as db_session
 from oslo_db.sqlalchemy import utils as db_utils
 from oslo_utils import timeutils
+import sqlalchemy
+from sqlalchemy import event
 from sqlalchemy.inspection import inspect
 from sqlalchemy.orm import exc
 from sqlalchemy.orm import joinedload
+from sqlalchemy import sql
 
 from convertor._i18n import _
 from convertor.common import exception
+from convertor.common import metrics
 from convertor.common import utils
 from convertor.db import api
 from convertor.db.sqlalchemy import models
@@ -29,9 +34,32 @@ def _create_facade_lazily():
     global _FACADE
     if _FACADE is None:
         _FACADE = db_session.EngineFacade.from_config(CONF)
+        _instrument_engine(_FACADE.get_engine())
     return _FACADE
 
 
+def _instrument_engine(engine):
+    """Time the statements executed by the engine.
+
+    All the queries built by :py:func:`model_query` and the other
+    statements of this module go through the engine.
+    """
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters,
+                              context, executemany):
+        conn.info['convertor.query_start'] = time.monotonic()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters,
+                             context, executemany):
+        start = conn.info.pop('convertor.query_start', None)
+        if start is None:
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper()
+        metrics.DB_QUERY_SECONDS.labels(operation).observe(
+            time.monotonic() - start)
+
+
 def get_engine():
     facade = _create_facade_lazily()
     return facade.get_engine()
@@ -50,8 +78,14 @@ def get_backend():
 def model_query(model, *args, **kwargs):
     """Query helper for simpler session usage.
     :param session: if present, the session to use
+    :param columns: if present, the names of the columns of ``model`` to
+                    select instead of whole rows.
     """
     session = kwargs.get('session') or get_session()
+    columns = kwargs.get('columns')
+    if columns:
+        return session.query(
+            *[getattr(model, column) for column in columns] + list(args))
     query = session.query(model, *args)
     return query
 
@@ -72,17 +106,74 @@ def add_identity_filter(query, value):
         raise exception.InvalidIdentity(identity=value)
 
 
+def _is_datetime(column):
+    """Tell whether a column holds datetimes."""
+    # NOTE: before SQLAlchemy 2.0, a type with variants is a Variant
+    # wrapping it, whose python_type is not implemented.
+    column_type = getattr(column.type, 'impl', column.type)
+    return isinstance(column_type, sqlalchemy.DateTime)
+
+
+def _keyset_filter(model, sort_key, sort_dir, cursor):
+    """Build the clause selecting the rows that follow ``cursor``.
+
+    Unlike the marker based pagination of oslo.db, which compares the
+    sort keys one by one in a chain of ORs, this compares them as a single
+    row value so the next page is one range scan on an index ending with
+    the primary key.
+
+    :param cursor: a ``(sort_key value, id)`` pair of the last row of the
+                   previous page.
+    """
+    value, last_id = cursor
+    id_col = model.id
+    forward = operator.gt if sort_dir != 'desc' else operator.lt
+    if not sort_key or sort_key == 'id':
+        return forward(id_col, last_id)
+
+    sort_col = getattr(model, sort_key)
+    # NOTE: NULLs sort first in ascending order and last in descending
+    # order on MySQL and SQLite, and cannot be compared as part of a row
+    # value.
+    if value is None:
+        # Only NULLs follow a NULL in descending order; in ascending
+        # order, the remaining NULLs then all the values.
+        if sort_dir == 'desc':
+            return sql.and_(sort_col.is_(None), forward(id_col, last_id))
+        return sql.or_(sql.and_(sort_col.is_(None),
+                                forward(id_col, last_id)),
+                       sort_col.isnot(None))
+
+    if _is_datetime(sort_col) and not isinstance(value, datetime.datetime):
+        value = timeutils.normalize_time(timeutils.parse_isotime(value))
+    following = forward(sql.tuple_(sort_col, id_col),
+                        sql.tuple_(value, last_id))
+    if sort_dir == 'desc':
+        # The NULLs come after all the values.
+        return sql.or_(following, sort_col.is_(None))
+    return following
+
+
 def _paginate_query(model, limit=None, marker=None, sort_key=None,
-                    sort_dir=None, query=None):
+                    sort_dir=None, query=None, cursor=None):
     if not query:
         query = model_query(model)
     sort_keys = ['id']
     if sort_key and sort_key not in sort_keys:
         sort_keys.insert(0, sort_key)
-    query = db_utils.paginate_query(query, model, limit, sort_keys,
-                                    marker=marker, sort_dir=sort_dir)
+    if cursor is None:
+        query = db_utils.paginate_query(query, model, limit, sort_keys,
+                                        marker=marker, sort_dir=sort_dir)
+        return query.all()
+
+    query = query.filter(_keyset_filter(model, sort_key, sort_dir, cursor))
+    order = sql.desc if sort_dir == 'desc' else sql.asc
+    query = query.order_by(*[order(getattr(model, key)) for key in sort_keys])
+    if limit is not None:
+        query = query.limit(limit)
     return query.all()
 
+
 class Connection(api.BaseConnection):
     """SqlAlchemy connection."""
 
@@ -104,8 +195,7 @@ class Connection(api.BaseConnection):
     def __add_simple_filter(self, query, model, fieldname, value, operator_):
         field = getattr(model, fieldname)
 
-        if (fieldname != 'deleted' and value and
-                field.type.python_type is datetime.datetime):
+        if fieldname != 'deleted' and value and _is_datetime(field):
             if not isinstance(value, datetime.datetime):
                 value = timeutils.parse_isotime(value)
 
@@ -282,21 +372,24 @@ class Connection(api.BaseConnection):
 
     def _get_model_list(self, model, add_filters_func, context, filters=None,
                         limit=None, marker=None, sort_key=None, sort_dir=None,
-                        eager=False):
-        query = model_query(model)
-        if eager:
+                        eager=False, cursor=None, columns=None):
+        query = model_query(model, columns=columns)
+        if eager and not columns:
             query = self._set_eager_options(model, query)
         query = add_filters_func(query, filters)
         if not context.show_deleted:
             query = query.filter(model.deleted_at.is_(None))
         return _paginate_query(model, limit, marker,
-                               sort_key, sort_dir, query)
+                               sort_key, sort_dir, query, cursor=cursor)
 
     def _add_tasks_filters(self, query, filters):
         if filters is None:
             filters = {}
 
-        plain_fields = ['uuid', 'image_id', 'bucket_id', 'status', 'new_format']
+        plain_fields = ['id', 'uuid', 'image_id', 'bucket_id', 'status',
+                        'new_format', 'leader_uuid', 'claimed_by',
+                        'lease_expires_at', 'new_image_id', 'profile',
+                        'project_id', 'priority']
 
         return self._add_filters(
             query=query, model=models.Task, filters=filters,
@@ -321,6 +414,38 @@ class Connection(api.BaseConnection):
             raise exception.TaskAlreadyExists(uuid=values['uuid'])
         return task
 
+    def create_task_list(self, values_list):
+        if not values_list:
+            return []
+        now = timeutils.utcnow()
+        rows = []
+        for values in values_list:
+            row = dict(values)
+            if not row.get('uuid'):
+                row['uuid'] = utils.generate_uuid()
+            row.setdefault('created_at', now)
+            row.setdefault('deleted', 0)
+            row.setdefault('priority', 0)
+            rows.append(row)
+        # NOTE: a multi-row VALUES clause needs the same columns on every
+        # row, and the column defaults are not applied to it.
+        columns = set().union(*rows)
+        rows = [{column: row.get(column) for column in columns}
+                for row in rows]
+        uuids = [row['uuid'] for row in rows]
+
+        session = get_session()
+        try:
+            with session.begin():
+                session.execute(models.Task.__table__.insert().values(rows))
+        except db_exc.DBDuplicateEntry:
+            raise exception.TaskAlreadyExists(uuid=', '.join(uuids))
+
+        tasks = {task.uuid: task for task in
+                 model_query(models.Task).filter(
+                     models.Task.uuid.in_(uuids))}
+        return [tasks[uuid] for uuid in uuids]
+
     def _get_task(self, context, fieldname, value, eager):
         try:
             return self._get(context, model=models.Task,
@@ -329,20 +454,30 @@ class Connection(api.BaseConnection):
             raise exception.TaskNotFound(task=value)
 
     def get_task_by_id(self, context, task_id, eager=False):
-        return self._get_goal(
+        return self._get_task(
             context, fieldname="id", value=task_id, eager=eager)
 
     def get_task_by_uuid(self, context, task_uuid, eager=False):
-        return self._get_goal(
+        return self._get_task(
             context, fieldname="uuid", value=task_uuid, eager=eager)
 
-    def destroy_goal(self, task_id):
+    def get_task_version(self, context, task_id):
+        query = model_query(models.Task.id, models.Task.updated_at)
+        query = add_identity_filter(query, task_id)
+        if not context.show_deleted:
+            query = query.filter(models.Task.deleted_at.is_(None))
+        try:
+            return tuple(query.one())
+        except exc.NoResultFound:
+            raise exception.TaskNotFound(task=task_id)
+
+    def destroy_task(self, task_id):
         try:
             return self._destroy(models.Task, task_id)
         except exception.ResourceNotFound:
             raise exception.TaskNotFound(task=task_id)
 
-    def update_goal(self, task_id, values):
+    def update_task(self, task_id, values):
         if 'uuid' in values:
             raise exception.Invalid(
                 message=_("Cannot overwrite UUID for an existing Task."))
@@ -352,6 +487,126 @@ class Connection(api.BaseConnection):
         except exception.ResourceNotFound:
             raise exception.TaskNotFound(task=task_id)
 
+    def update_followers(self, leader_uuid, values):
+        session = get_session()
+        with session.begin():
+            query = model_query(models.Task, session=session)
+            query = query.filter_by(leader_uuid=leader_uuid, deleted_at=None)
+            return query.update(values, synchronize_session=False)
+
+    def update_task_progress(self, progress):
+        table = models.Task.__table__
+        # NOTE: rows updating the same columns are sent as one statement
+        # with many parameter sets.
+        batches = collections.defaultdict(list)
+        for task_uuid, values in progress.items():
+            params = {'_%s' % column: value
+                      for column, value in values.items()}
+            params['_uuid'] = task_uuid
+            batches[tuple(sorted(values))].append(params)
+
+        session = get_session()
+        with session.begin():
+            for columns, params in batches.items():
+                statement = table.update().where(sql.and_(
+                    table.c.uuid == sql.bindparam('_uuid'),
+                    table.c.status == objects.task.Status.INPROGRESS)
+                ).values({column: sql.bindparam('_%s' % column)
+                          for column in columns})
+                session.execute(statement, params)
+
+    @staticmethod
+    def _claimable_tasks(now):
+        status = objects.task.Status
+        return sql.and_(
+            models.Task.deleted_at.is_(None),
+            models.Task.leader_uuid.is_(None),
+            sql.or_(
+                models.Task.status == status.CREATED,
+                sql.and_(models.Task.status == status.INPROGRESS,
+                         sql.or_(models.Task.lease_expires_at.is_(None),
+                                 models.Task.lease_expires_at < now))))
+
+    def get_claim_candidates(self, limit):
+        claimable = self._claimable_tasks(timeutils.utcnow())
+        rank = sql.func.row_number().over(
+            partition_by=models.Task.project_id,
+            order_by=(models.Task.priority.desc(), models.Task.id))
+        ranked = model_query(
+            models.Task.id, models.Task.project_id, models.Task.priority,
+            rank.label('rank')).filter(claimable).subquery()
+        query = get_session().query(
+            ranked.c.id, ranked.c.project_id, ranked.c.priority).filter(
+                ranked.c.rank <= limit).order_by(ranked.c.rank)
+        return [{'id': row.id, 'project_id': row.project_id,
+                 'priority': row.priority} for row in query]
+
+    def count_running_tasks(self):
+        query = model_query(models.Task.project_id,
+                            sql.func.count(models.Task.id))
+        query = query.filter(
+            models.Task.deleted_at.is_(None),
+            models.Task.status == objects.task.Status.INPROGRESS,
+            models.Task.lease_expires_at >= timeutils.utcnow())
+        return dict(query.group_by(models.Task.project_id).all())
+
+    def claim_tasks(self, worker, limit, lease_duration, task_uuid=None,
+                    task_ids=None):
+        now = timeutils.utcnow()
+        expires_at = now + datetime.timedelta(seconds=lease_duration)
+        # NOTE: the claimed rows are read back by a token unique to this
+        # claim: another claim of the same worker may take rows the same
+        # way at the same time.
+        token = utils.generate_uuid()
+        claimable = self._claimable_tasks(now)
+
+        session = get_session()
+        with session.begin():
+            query = model_query(models.Task.id, session=session)
+            query = query.filter(claimable)
+            if task_uuid:
+                query = query.filter(models.Task.uuid == task_uuid)
+            if task_ids is not None:
+                query = query.filter(models.Task.id.in_(task_ids))
+            # NOTE: SKIP LOCKED lets concurrent workers claim disjoint
+            # batches instead of queueing on each other's row locks.
+            query = query.order_by(models.Task.id).limit(limit)
+            ids = [row.id for row in query.with_for_update(skip_locked=True)]
+            if not ids:
+                return []
+
+            # NOTE: the claimable condition is checked again for the
+            # databases which ignore FOR UPDATE, such as SQLite; only the
+            # rows this statement updated are returned.
+            query = model_query(models.Task, session=session)
+            query.filter(models.Task.id.in_(ids), claimable).update(
+                {'status': objects.task.Status.INPROGRESS,
+                 'claimed_by': worker,
+                 'claim_token': token,
+                 'lease_expires_at': expires_at},
+                synchronize_session=False)
+
+            query = model_query(models.Task, session=session)
+            return query.filter(
+                models.Task.id.in_(ids),
+                models.Task.claim_token == token).order_by(
+                    models.Task.id).all()
+
+    def renew_leases(self, worker, task_uuids, lease_duration):
+        if not task_uuids:
+            return 0
+        expires_at = (timeutils.utcnow() +
+                      datetime.timedelta(seconds=lease_duration))
+        session = get_session()
+        with session.begin():
+            query = model_query(models.Task, session=session)
+            query = query.filter(
+                models.Task.uuid.in_(task_uuids),
+                models.Task.claimed_by == worker,
+                models.Task.status == objects.task.Status.INPROGRESS)
+            return query.update({'lease_expires_at': expires_at},
+                                synchronize_session=False)
+
     def soft_delete_task(self, task_id):
         try:
             return self._soft_delete(models.Task, task_id)
@@ -3,8 +3,13 @@ SQLAlchemy models for convertor service
 """
 
 from oslo_db.sqlalchemy import models
+from oslo_utils import timeutils
+from sqlalchemy import BigInteger
 from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy.dialects import mysql
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Index
 from sqlalchemy import Integer
 from sqlalchemy import String
 from sqlalchemy import UniqueConstraint
@@ -50,6 +55,26 @@ class Task(Base):
     __tablename__ = 'tasks'
     __table_args__ = (
         UniqueConstraint('uuid', name='uniq_tasks0uuid'),
+        # Listing with or without a status filter, sorted by id
+        Index('tasks_deleted_at_status_id_idx', 'deleted_at', 'status', 'id'),
+        # Listing sorted by creation time
+        Index('tasks_deleted_at_created_at_id_idx',
+              'deleted_at', 'created_at', 'id'),
+        # Listing the tasks of a bucket, with or without a status filter
+        Index('tasks_bucket_id_deleted_at_id_idx',
+              'bucket_id', 'deleted_at', 'id'),
+        Index('tasks_bucket_id_status_deleted_at_id_idx',
+              'bucket_id', 'status', 'deleted_at', 'id'),
+        # Looking up in-flight conversions of an image to coalesce with
+        Index('tasks_image_id_new_format_status_idx',
+              'image_id', 'new_format', 'status'),
+        # Updating the followers of a leader task
+        Index('tasks_leader_uuid_idx', 'leader_uuid'),
+        # Claiming the tasks whose lease expired
+        Index('tasks_status_lease_expires_at_idx',
+              'status', 'lease_expires_at'),
+        # Counting the running tasks of each project
+        Index('tasks_status_project_id_idx', 'status', 'project_id'),
         table_args(),
     )
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -58,3 +83,25 @@ class Task(Base):
     bucket_id = Column(String(63), nullable=False)
     new_format = Column(String(15), nullable=False)
     status = Column(String(63), nullable=False)
+    leader_uuid = Column(String(36), nullable=True)
+    claimed_by = Column(String(255), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    # NOTE: identifies the claim which took the task, to read back the
+    # tasks a claim took; not exposed in the Task objects.
+    claim_token = Column(String(36), nullable=True)
+    new_image_id = Column(String(36), nullable=True)
+    virtual_size = Column(BigInteger, nullable=True)
+    allocated_size = Column(BigInteger, nullable=True)
+    profile = Column(String(63), nullable=True)
+    phase = Column(String(31), nullable=True)
+    bytes_downloaded = Column(BigInteger, nullable=True)
+    conversion_progress = Column(Integer, nullable=True)
+    bytes_uploaded = Column(BigInteger, nullable=True)
+    eta = Column(DateTime, nullable=True)
+    project_id = Column(String(64), nullable=True)
+    priority = Column(Integer, nullable=False, default=0, server_default='0')
+    # NOTE: the ETags of the tasks are derived from updated_at, which
+    # keeps its microseconds on MySQL too, see migration 011.
+    updated_at = Column(
+        DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql'),
+        onupdate=lambda: timeutils.utcnow())
@@ -0,0 +1,4 @@
+# NOTE: the notification modules are imported here so that their classes
+# are registered as soon as the package is.
+from convertor.notifications import exception  # noqa
+from convertor.notifications import task  # noqa
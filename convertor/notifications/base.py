@@ -0,0 +1,264 @@
+"""Base classes of the versioned notifications.
+
+Notifications and their payloads are versioned objects, so consumers get
+a stable, documented schema: the payload is sent as the primitive of its
+object, with its name and version.
+
+Emitting a notification never waits for the message bus. The notification
+is serialized by the caller and queued; a background thread of the process
+drains the queue in batches and hands them to the notifier. When the queue
+is full, for instance because the bus is down, new notifications are
+dropped rather than slowing down the conversions.
+"""
+
+import queue
+import threading
+
+from oslo_config import cfg
+from oslo_log import log
+from oslo_versionedobjects import exception as ovo_exception
+
+from convertor.common import exception
+from convertor.common import rpc
+from convertor.objects import base
+from convertor.objects import fields as wfields
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+# Definition of notification levels in increasing order of severity
+NOTIFY_LEVELS = {
+    wfields.NotificationPriority.DEBUG: 0,
+    wfields.NotificationPriority.INFO: 1,
+    wfields.NotificationPriority.WARNING: 2,
+    wfields.NotificationPriority.ERROR: 3,
+    wfields.NotificationPriority.CRITICAL: 4
+}
+
+_EMITTER = None
+_EMITTER_LOCK = threading.Lock()
+
+
+def should_notify(priority):
+    """Determine whether a notification should be sent.
+
+    A notification is sent when the level of the notification is
+    greater than or equal to the level specified in the
+    configuration, in the increasing order of DEBUG, INFO, WARNING,
+    ERROR, CRITICAL. Callers check it before building a notification,
+    so nothing is built for the notifications which are not sent.
+    :return: True if notification should be sent, False otherwise.
+    """
+    if not CONF.notification_level:
+        return False
+    return NOTIFY_LEVELS[priority] >= NOTIFY_LEVELS[CONF.notification_level]
+
+
+@base.ConvertorObjectRegistry.register_if(False)
+class NotificationObject(base.ConvertorObject):
+    """Base class for every notification related versioned object."""
+
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    def __init__(self, **kwargs):
+        super(NotificationObject, self).__init__(**kwargs)
+        # The notification objects are created on the fly when convertor
+        # emits the notification. This causes that every object shows every
+        # field as changed. We don't want to send this meaningless
+        # information so we reset the object after creation.
+        self.obj_reset_changes(recursive=False)
+
+
+@base.ConvertorObjectRegistry.register_notification
+class EventType(NotificationObject):
+
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'object': wfields.StringField(),
+        'action': wfields.NotificationActionField(),
+        'phase': wfields.NotificationPhaseField(nullable=True),
+    }
+
+    def to_notification_event_type_field(self):
+        """Serialize the object to the wire format."""
+        s = '%s.%s' % (self.object, self.action)
+        if self.obj_attr_is_set('phase'):
+            s += '.%s' % self.phase
+        return s
+
+
+@base.ConvertorObjectRegistry.register_if(False)
+class NotificationPayloadBase(NotificationObject):
+    """Base class for the payload of versioned notifications."""
+
+    # SCHEMA defines how to populate the payload fields. It is a dictionary
+    # where every key value pair has the following format:
+    # <payload_field_name>: (<data_source_name>,
+    #                        <field_of_the_data_source>)
+    # The <payload_field_name> is the name where the data will be stored in
+    # the payload object, this field has to be defined as a field of the
+    # payload. The <data_source_name> shall refer to name of the parameter
+    # passed as kwarg to the payload's populate_schema() call and this
+    # object will be used as the source of the data. The
+    # <field_of_the_data_source> shall be a valid field of the passed
+    # argument.
+    # The SCHEMA needs to be applied with the populate_schema() call before
+    # the notification can be emitted.
+    # Payload fields that are not set by the SCHEMA can be filled in the
+    # same way as in any versioned object.
+    SCHEMA = {}
+
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    def __init__(self, **kwargs):
+        super(NotificationPayloadBase, self).__init__(**kwargs)
+        self.populated = not self.SCHEMA
+
+    def populate_schema(self, **kwargs):
+        """Populate the object based on the SCHEMA and the source objects
+
+        :param kwargs: A dict contains the source object at the key defined
+                       in the SCHEMA
+        """
+        for key, (obj, field) in self.SCHEMA.items():
+            source = kwargs[obj]
+            try:
+                setattr(self, key, getattr(source, field))
+            # NotImplementedError - obj_load_attr() is not even defined
+            # OrphanedObjectError - lazy loadable field but context is None
+            except (NotImplementedError,
+                    ovo_exception.OrphanedObjectError):
+                # If it is unset or non lazy loadable in the source object
+                # then we cannot do anything else but try to default it in
+                # the payload object we are generating here.
+                setattr(self, key, None)
+        self.populated = True
+
+        # the schema population will create changed fields but we don't
+        # need this information in the notification
+        self.obj_reset_changes(recursive=False)
+
+
+@base.ConvertorObjectRegistry.register_notification
+class NotificationPublisher(NotificationObject):
+
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'host': wfields.StringField(nullable=False),
+        'binary': wfields.StringField(nullable=False),
+    }
+
+
+@base.ConvertorObjectRegistry.register_if(False)
+class NotificationBase(NotificationObject):
+    """Base class for versioned notifications.
+
+    Every subclass shall define a 'payload' field.
+    """
+
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'priority': wfields.NotificationPriorityField(),
+        'event_type': wfields.ObjectField('EventType'),
+        'publisher': wfields.ObjectField('NotificationPublisher'),
+    }
+
+    def save(self, context):
+        raise exception.UnsupportedError()
+
+    def obj_load_attr(self, attrname):
+        raise exception.UnsupportedError()
+
+    def _should_notify(self):
+        return should_notify(self.priority)
+
+    def emit(self, context):
+        """Queue the notification to be sent."""
+        if not self._should_notify() or not rpc.initialized():
+            return
+        if not self.payload.populated:
+            raise exception.NotificationPayloadError(
+                class_name=self.__class__.__name__)
+        # Note(gibi): notification payload will be a newly populated object
+        # therefore every field of it will look changed so this does not
+        # carry any extra information so we drop this from the payload.
+        self.payload.obj_reset_changes(recursive=False)
+
+        get_emitter().submit(
+            context, self.priority,
+            event_type=self.event_type.to_notification_event_type_field(),
+            publisher_id='%s:%s' % (self.publisher.binary,
+                                    self.publisher.host),
+            payload=self.payload.obj_to_primitive())
+
+
+class NotificationEmitter(object):
+    """Send the queued notifications from a background thread."""
+
+    def __init__(self, max_pending, batch_size):
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue = queue.Queue(max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, context, priority, event_type, publisher_id, payload):
+        try:
+            self._queue.put_nowait((context, priority, event_type,
+                                    publisher_id, payload))
+        except queue.Full:
+            self.dropped += 1
+            LOG.warning("Notification queue full, dropped `%s`", event_type)
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='notifications',
+                                                daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, batch):
+        notifiers = {}
+        for context, priority, event_type, publisher_id, payload in batch:
+            if publisher_id not in notifiers:
+                notifiers[publisher_id] = rpc.get_notifier(publisher_id)
+            notify = getattr(notifiers[publisher_id], priority)
+            LOG.debug("Emitting notification `%s`", event_type)
+            try:
+                notify(context, event_type=event_type, payload=payload)
+            except Exception:
+                LOG.exception("Failed to emit notification `%s`",
+                              event_type)
+
+    def _run(self):
+        while True:
+            self._send(self._next_batch())
+
+
+def get_emitter():
+    """Return the notification emitter shared by the process."""
+    global _EMITTER
+    if _EMITTER is None:
+        with _EMITTER_LOCK:
+            if _EMITTER is None:
+                _EMITTER = NotificationEmitter(
+                    CONF.notification_queue_size,
+                    CONF.notification_batch_size)
+    return _EMITTER
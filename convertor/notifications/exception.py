@@ -0,0 +1,37 @@
+import inspect
+
+from convertor.notifications import base as notificationbase
+from convertor.objects import base
+from convertor.objects import fields as wfields
+
+
+@base.ConvertorObjectRegistry.register_notification
+class ExceptionPayload(notificationbase.NotificationPayloadBase):
+
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'module_name': wfields.StringField(),
+        'function_name': wfields.StringField(),
+        'exception': wfields.StringField(),
+        'exception_message': wfields.StringField()
+    }
+
+    @classmethod
+    def from_exception(cls, fault=None):
+        trace = inspect.trace()
+        # NOTE: the exception may have been raised outside of an except
+        # block, then there is no frame to report.
+        if trace:
+            trace = trace[-1]
+            module = inspect.getmodule(trace[0])
+            module_name = module.__name__ if module else 'unknown'
+            function_name = trace[3]
+        else:
+            module_name = function_name = 'unknown'
+        return cls(
+            function_name=function_name,
+            module_name=module_name,
+            exception=fault.__class__.__name__,
+            exception_message=str(fault))
@@ -0,0 +1,214 @@
+
+from oslo_config import cfg
+
+from convertor.notifications import base as notificationbase
+from convertor.notifications import exception as exception_notifications
+from convertor.objects import base
+from convertor.objects import fields as wfields
+
+CONF = cfg.CONF
+
+
+@base.ConvertorObjectRegistry.register_notification
+class TaskPayload(notificationbase.NotificationPayloadBase):
+    SCHEMA = {
+        'uuid': ('task', 'uuid'),
+        'image_id': ('task', 'image_id'),
+        'bucket_id': ('task', 'bucket_id'),
+        'new_format': ('task', 'new_format'),
+        'status': ('task', 'status'),
+        'leader_uuid': ('task', 'leader_uuid'),
+        'profile': ('task', 'profile'),
+        'new_image_id': ('task', 'new_image_id'),
+        'virtual_size': ('task', 'virtual_size'),
+        'allocated_size': ('task', 'allocated_size'),
+        'created_at': ('task', 'created_at'),
+        'updated_at': ('task', 'updated_at'),
+    }
+
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'uuid': wfields.UUIDField(),
+        'image_id': wfields.StringField(),
+        'bucket_id': wfields.StringField(),
+        'new_format': wfields.StringField(),
+        'status': wfields.StringField(nullable=True),
+        'leader_uuid': wfields.UUIDField(nullable=True),
+        'profile': wfields.StringField(nullable=True),
+        'new_image_id': wfields.StringField(nullable=True),
+        'virtual_size': wfields.IntegerField(nullable=True),
+        'allocated_size': wfields.IntegerField(nullable=True),
+        'created_at': wfields.DateTimeField(nullable=True),
+        'updated_at': wfields.DateTimeField(nullable=True),
+    }
+
+    def __init__(self, task, **kwargs):
+        super(TaskPayload, self).__init__(**kwargs)
+        self.populate_schema(task=task)
+
+
+@base.ConvertorObjectRegistry.register_notification
+class TaskTimingsPayload(notificationbase.NotificationPayloadBase):
+    """Where the time of a task went, in seconds.
+
+    Phases a task did not go through are not set, e.g. the download of a
+    task converted while it streams from Glance.
+    """
+
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'queue_wait': wfields.FloatField(nullable=True),
+        'download': wfields.FloatField(nullable=True),
+        'convert': wfields.FloatField(nullable=True),
+        'upload': wfields.FloatField(nullable=True),
+    }
+
+
+@base.ConvertorObjectRegistry.register_notification
+class TaskCreatePayload(TaskPayload):
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {}
+
+
+@base.ConvertorObjectRegistry.register_notification
+class TaskActionPayload(TaskPayload):
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'timings': wfields.ObjectField('TaskTimingsPayload'),
+        'fault': wfields.ObjectField('ExceptionPayload', nullable=True),
+    }
+
+    def __init__(self, task, timings, **kwargs):
+        super(TaskActionPayload, self).__init__(task=task, timings=timings,
+                                                **kwargs)
+
+
+@base.ConvertorObjectRegistry.register_notification
+class TaskProgressPayload(notificationbase.NotificationPayloadBase):
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'uuid': wfields.UUIDField(),
+        'phase': wfields.StringField(nullable=True),
+        'bytes_downloaded': wfields.IntegerField(nullable=True),
+        'conversion_progress': wfields.IntegerField(nullable=True),
+        'bytes_uploaded': wfields.IntegerField(nullable=True),
+        'eta': wfields.DateTimeField(nullable=True),
+    }
+
+
+@base.ConvertorObjectRegistry.register_notification
+class TaskCreateNotification(notificationbase.NotificationBase):
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'payload': wfields.ObjectField('TaskCreatePayload')
+    }
+
+
+@base.ConvertorObjectRegistry.register_notification
+class TaskActionNotification(notificationbase.NotificationBase):
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'payload': wfields.ObjectField('TaskActionPayload')
+    }
+
+
+@base.ConvertorObjectRegistry.register_notification
+class TaskProgressNotification(notificationbase.NotificationBase):
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'payload': wfields.ObjectField('TaskProgressPayload')
+    }
+
+
+def _publisher(service, host):
+    return notificationbase.NotificationPublisher(
+        host=host or CONF.host, binary=service)
+
+
+def send_create(context, task, service='convertor-api', host=None):
+    """Emit a task.create notification."""
+    priority = wfields.NotificationPriority.INFO
+    if not notificationbase.should_notify(priority):
+        return
+    versioned_payload = TaskCreatePayload(task=task)
+
+    notification = TaskCreateNotification(
+        priority=priority,
+        event_type=notificationbase.EventType(
+            object='task',
+            action=wfields.NotificationAction.CREATE),
+        publisher=_publisher(service, host),
+        payload=versioned_payload)
+
+    notification.emit(context)
+
+
+def send_action(context, task, phase, timings=None, fault=None,
+                service='convertor-worker', host=None):
+    """Emit a task.execution.{start,end,error} notification.
+
+    :param timings: a dict of the seconds spent by the task, see
+                    :py:class:`TaskTimingsPayload`.
+    :param fault: the exception which made the task fail.
+    """
+    priority = (wfields.NotificationPriority.ERROR
+                if phase == wfields.NotificationPhase.ERROR
+                else wfields.NotificationPriority.INFO)
+    if not notificationbase.should_notify(priority):
+        return
+
+    versioned_payload = TaskActionPayload(
+        task=task,
+        timings=TaskTimingsPayload(**(timings or {})),
+        fault=(exception_notifications.ExceptionPayload.from_exception(fault)
+               if fault is not None else None))
+
+    notification = TaskActionNotification(
+        priority=priority,
+        event_type=notificationbase.EventType(
+            object='task',
+            action=wfields.NotificationAction.EXECUTION,
+            phase=phase),
+        publisher=_publisher(service, host),
+        payload=versioned_payload)
+
+    notification.emit(context)
+
+
+def send_progress(context, task_uuid, values, service='convertor-worker',
+                  host=None):
+    """Emit a task.progress notification.
+
+    :param values: the progress fields which changed, see
+                   :py:class:`TaskProgressPayload`.
+    """
+    priority = wfields.NotificationPriority.INFO
+    if not notificationbase.should_notify(priority):
+        return
+    versioned_payload = TaskProgressPayload(uuid=task_uuid, **values)
+
+    notification = TaskProgressNotification(
+        priority=priority,
+        event_type=notificationbase.EventType(
+            object='task',
+            action=wfields.NotificationAction.PROGRESS),
+        publisher=_publisher(service, host),
+        payload=versioned_payload)
+
+    notification.emit(context)
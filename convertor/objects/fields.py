@@ -36,3 +36,53 @@ class Numeric(fields.FieldType):
 
 class NumericField(fields.AutoTypedField):
     AUTO_TYPE = Numeric()
+
+
+# NOTE: the notification enums below only contain the values used by the
+# versioned notifications, see convertor.notifications.
+
+class BaseConvertorEnum(Enum):
+
+    ALL = ()
+
+    def __init__(self, **kwargs):
+        super(BaseConvertorEnum, self).__init__(
+            valid_values=self.__class__.ALL, **kwargs)
+
+
+class NotificationPriority(BaseConvertorEnum):
+    DEBUG = 'debug'
+    INFO = 'info'
+    WARNING = 'warning'
+    ERROR = 'error'
+    CRITICAL = 'critical'
+
+    ALL = (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+
+
+class NotificationPhase(BaseConvertorEnum):
+    START = 'start'
+    END = 'end'
+    ERROR = 'error'
+
+    ALL = (START, END, ERROR)
+
+
+class NotificationAction(BaseConvertorEnum):
+    CREATE = 'create'
+    EXECUTION = 'execution'
+    PROGRESS = 'progress'
+
+    ALL = (CREATE, EXECUTION, PROGRESS)
+
+
+class NotificationPriorityField(BaseEnumField):
+    AUTO_TYPE = NotificationPriority()
+
+
+class NotificationPhaseField(BaseEnumField):
+    AUTO_TYPE = NotificationPhase()
+
+
+class NotificationActionField(BaseEnumField):
+    AUTO_TYPE = NotificationAction()
@@ -1,5 +1,7 @@
+from oslo_utils import versionutils
+
 from convertor.common import exception
-from watcher.common import utils
+from convertor.common import utils
 from convertor.db import api as db_api
 from convertor.objects import base
 from convertor.objects import fields as wfields
@@ -12,12 +14,22 @@ class Status(object):
     ERROR = 'ERROR'
     DELETED = 'DELETED'
 
+    IN_FLIGHT = (CREATED, INPROGRESS)
+
 
 @base.ConvertorObjectRegistry.register
 class Task(base.ConvertorPersistentObject, base.ConvertorObject,
            base.ConvertorObjectDictCompat):
     # Version 1.0: Initial version
-    VERSION = '1.0'
+    # Version 1.1: Added 'leader_uuid' field
+    # Version 1.2: Added 'claimed_by' and 'lease_expires_at' fields
+    # Version 1.3: Added 'new_image_id' field
+    # Version 1.4: Added 'virtual_size' and 'allocated_size' fields
+    # Version 1.5: Added 'profile' field
+    # Version 1.6: Added 'phase', 'bytes_downloaded', 'conversion_progress',
+    #              'bytes_uploaded' and 'eta' fields
+    # Version 1.7: Added 'project_id' and 'priority' fields
+    VERSION = '1.7'
 
     dbapi = db_api.get_instance()
 
@@ -28,8 +40,45 @@ class Task(base.ConvertorPersistentObject, base.ConvertorObject,
         'bucket_id': wfields.StringField(),
         'new_format': wfields.StringField(),
         'status': wfields.StringField(nullable=True),
+        'leader_uuid': wfields.UUIDField(nullable=True),
+        'claimed_by': wfields.StringField(nullable=True),
+        'lease_expires_at': wfields.DateTimeField(nullable=True),
+        'new_image_id': wfields.StringField(nullable=True),
+        'virtual_size': wfields.IntegerField(nullable=True),
+        'allocated_size': wfields.IntegerField(nullable=True),
+        'profile': wfields.StringField(nullable=True),
+        'phase': wfields.StringField(nullable=True),
+        'bytes_downloaded': wfields.IntegerField(nullable=True),
+        'conversion_progress': wfields.IntegerField(nullable=True),
+        'bytes_uploaded': wfields.IntegerField(nullable=True),
+        'eta': wfields.DateTimeField(nullable=True),
+        'project_id': wfields.StringField(nullable=True),
+        'priority': wfields.IntegerField(default=0),
     }
 
+    def obj_make_compatible(self, primitive, target_version):
+        super(Task, self).obj_make_compatible(primitive, target_version)
+        target_version = versionutils.convert_version_to_tuple(target_version)
+        if target_version < (1, 1):
+            primitive.pop('leader_uuid', None)
+        if target_version < (1, 2):
+            primitive.pop('claimed_by', None)
+            primitive.pop('lease_expires_at', None)
+        if target_version < (1, 3):
+            primitive.pop('new_image_id', None)
+        if target_version < (1, 4):
+            primitive.pop('virtual_size', None)
+            primitive.pop('allocated_size', None)
+        if target_version < (1, 5):
+            primitive.pop('profile', None)
+        if target_version < (1, 6):
+            for field in ('phase', 'bytes_downloaded', 'conversion_progress',
+                          'bytes_uploaded', 'eta'):
+                primitive.pop(field, None)
+        if target_version < (1, 7):
+            primitive.pop('project_id', None)
+            primitive.pop('priority', None)
+
     @base.remotable_classmethod
     def get(cls, context, task_id):
         """Find a task based on its id or uuid
@@ -83,7 +132,7 @@ class Task(base.ConvertorPersistentObject, base.ConvertorObject,
 
     @base.remotable_classmethod
     def list(cls, context, limit=None, marker=None, filters=None,
-             sort_key=None, sort_dir=None):
+             sort_key=None, sort_dir=None, cursor=None):
         """Return a list of :class:`Task` objects.
         :param context: Security context. NOTE: This should only
                         be used internally by the indirection_api.
@@ -96,6 +145,8 @@ class Task(base.ConvertorPersistentObject, base.ConvertorObject,
         :param marker: pagination marker for large data sets.
         :param sort_key: column to sort results by.
         :param sort_dir: direction to sort. "asc" or "desc".
+        :param cursor: (sort_key value, id) of the last item of the previous
+                       page, see :py:meth:`~.BaseConnection.get_task_list`.
         :returns: a list of :class:`Task` object.
         """
         db_tasks = cls.dbapi.get_task_list(
@@ -104,10 +155,127 @@ class Task(base.ConvertorPersistentObject, base.ConvertorObject,
             limit=limit,
             marker=marker,
             sort_key=sort_key,
-            sort_dir=sort_dir)
+            sort_dir=sort_dir,
+            cursor=cursor)
 
         return [cls._from_db_object(cls(context), obj) for obj in db_tasks]
 
+    @classmethod
+    def list_columns(cls, context, columns, limit=None, marker=None,
+                     filters=None, sort_key=None, sort_dir=None, cursor=None):
+        """Return some columns of the tasks :py:meth:`list` would return.
+
+        No :class:`Task` is built, which makes listing many tasks much
+        cheaper when only a few of their fields are needed. Unlike the
+        fields of a :class:`Task`, the values are as the database returns
+        them, e.g. naive datetimes.
+
+        :param columns: names of the fields to read.
+        :returns: a list of tuples of the values of ``columns``.
+        """
+        return cls.dbapi.get_task_list(
+            context,
+            filters=filters,
+            limit=limit,
+            marker=marker,
+            sort_key=sort_key,
+            sort_dir=sort_dir,
+            cursor=cursor,
+            columns=columns)
+
+    @classmethod
+    def get_version(cls, context, task_id):
+        """Return what changes whenever a task changes.
+
+        This reads neither the task nor builds a :class:`Task`, to check
+        cheaply whether a task changed.
+
+        :param task_id: the id *or* uuid of a task.
+        :returns: an (id, updated_at) tuple.
+        """
+        return cls.dbapi.get_task_version(context, task_id)
+
+    @base.remotable_classmethod
+    def update_followers(cls, context, leader_uuid, status, **values):
+        """Set the status of all the tasks attached to a leader task.
+        :param context: Security context.
+        :param leader_uuid: the uuid of the leader task.
+        :param status: the new status of the followers.
+        :param values: other fields to copy from the leader task, such as
+                       the image it produced.
+        :returns: the number of updated tasks.
+        """
+        values['status'] = status
+        return cls.dbapi.update_followers(leader_uuid, values)
+
+    @base.remotable_classmethod
+    def update_progress(cls, context, progress):
+        """Record the progress of several running tasks at once.
+        :param context: Security context.
+        :param progress: a dict mapping task uuids to dicts of progress
+                         fields.
+        """
+        cls.dbapi.update_task_progress(progress)
+
+    @base.remotable_classmethod
+    def claim(cls, context, worker, limit, lease_duration, task_ids=None):
+        """Claim pending tasks and tasks whose lease expired.
+        :param context: Security context.
+        :param worker: the identifier of the claiming worker.
+        :param limit: maximum number of tasks to claim.
+        :param lease_duration: duration of the lease, in seconds.
+        :param task_ids: only claim tasks among these ids.
+        :returns: a list of the claimed :class:`Task` objects.
+        """
+        db_tasks = cls.dbapi.claim_tasks(worker, limit, lease_duration,
+                                         task_ids=task_ids)
+        return [cls._from_db_object(cls(context), obj) for obj in db_tasks]
+
+    @base.remotable_classmethod
+    def get_claim_candidates(cls, context, limit):
+        """Return the tasks each project would have claimed first.
+        :param context: Security context.
+        :param limit: maximum number of tasks returned per project.
+        :returns: a list of dicts holding the ``id``, ``project_id`` and
+                  ``priority`` of the tasks.
+        """
+        return cls.dbapi.get_claim_candidates(limit)
+
+    @base.remotable_classmethod
+    def count_running(cls, context):
+        """Count the tasks running under a valid lease, by project.
+        :param context: Security context.
+        :returns: a dict mapping project IDs to task counts.
+        """
+        return cls.dbapi.count_running_tasks()
+
+    @base.remotable_classmethod
+    def claim_by_uuid(cls, context, uuid, worker, lease_duration):
+        """Claim a given task, unless another worker holds it.
+        :param context: Security context.
+        :param uuid: the uuid of the task.
+        :param worker: the identifier of the claiming worker.
+        :param lease_duration: duration of the lease, in seconds.
+        :returns: the claimed :class:`Task`, or None if it could not be
+                  claimed.
+        """
+        db_tasks = cls.dbapi.claim_tasks(worker, 1, lease_duration,
+                                         task_uuid=uuid)
+        if not db_tasks:
+            return None
+        return cls._from_db_object(cls(context), db_tasks[0])
+
+    @base.remotable_classmethod
+    def renew_leases(cls, context, worker, uuids, lease_duration):
+        """Extend the leases a worker holds on tasks.
+        :param context: Security context.
+        :param worker: the identifier of the worker holding the leases.
+        :param uuids: the uuids of the leased tasks.
+        :param lease_duration: duration of the lease, in seconds.
+        :returns: the number of renewed leases.
+        """
+        return cls.dbapi.renew_leases(worker, uuids, lease_duration)
+
     @base.remotable
     def create(self):
         """Create a :class:`Task` record in the DB"""
@@ -115,6 +283,17 @@ class Task(base.ConvertorPersistentObject, base.ConvertorObject,
         db_task = self.dbapi.create_task(values)
         self._from_db_object(self, db_task)
 
+    @base.remotable_classmethod
+    def create_list(cls, context, tasks):
+        """Create several :class:`Task` records in the DB at once.
+        :param context: Security context.
+        :param tasks: a list of :class:`Task` objects to create.
+        :returns: the list of the created :class:`Task` objects.
+        """
+        db_tasks = cls.dbapi.create_task_list(
+            [task.obj_get_changes() for task in tasks])
+        return [cls._from_db_object(cls(context), obj) for obj in db_tasks]
+
     def destroy(self):
         """Delete the :class:`Task` from the DB"""
         self.dbapi.destroy_task(self.id)
@@ -0,0 +1,105 @@
+"""Base class of the functional tests of the API.
+
+The requests go through the whole WSGI application, from the pecan hooks
+to the database; only the messages cast to the workers are mocked.
+"""
+
+import copy
+
+import fixtures
+import pecan
+import pecan.testing
+
+from convertor.api import hooks
+from convertor.tests import base
+from convertor.worker import rpcapi
+
+PATH_PREFIX = '/v1'
+
+
+class FunctionalTest(base.DbTestCase):
+    """Used for functional tests of Pecan controllers."""
+
+    def setUp(self):
+        super(FunctionalTest, self).setUp()
+        self.config(enable_authentication=False)
+        self.launch_task = self.useFixture(fixtures.MockPatchObject(
+            rpcapi.WorkerAPI, 'launch_task')).mock
+        self.launch_tasks = self.useFixture(fixtures.MockPatchObject(
+            rpcapi.WorkerAPI, 'launch_tasks')).mock
+        self.app = self._make_app()
+        self.addCleanup(pecan.set_config,
+                        copy.deepcopy(pecan.configuration.DEFAULT),
+                        overwrite=True)
+
+    def _make_app(self):
+        self.app_config = {
+            'app': {
+                'root': 'convertor.api.controllers.root.RootController',
+                'modules': ['convertor.api'],
+                'hooks': [
+                    hooks.ContextHook(),
+                    hooks.MetricsHook(),
+                ],
+                'acl_public_routes': ['/'],
+            },
+        }
+        return pecan.testing.load_test_app(self.app_config)
+
+    def _request_json(self, path, params, expect_errors=False, headers=None,
+                      method="post", extra_environ=None, status=None,
+                      path_prefix=PATH_PREFIX):
+        response = getattr(self.app, "%s_json" % method)(
+            str(path_prefix + path),
+            params=params,
+            headers=headers,
+            status=status,
+            extra_environ=extra_environ,
+            expect_errors=expect_errors
+        )
+        return response
+
+    def post_json(self, path, params, expect_errors=False, headers=None,
+                  extra_environ=None, status=None):
+        """Sends simulated HTTP POST request to Pecan test app.
+
+        :param path: url path of target service
+        :param params: content for wsgi.input of request
+        :param expect_errors: Boolean value; whether an error is expected
+                              based on request
+        :param headers: a dictionary of headers to send along with the
+                        request
+        :param extra_environ: a dictionary of environ variables to send along
+                              with the request
+        :param status: expected status code of response
+        """
+        return self._request_json(path=path, params=params,
+                                  expect_errors=expect_errors,
+                                  headers=headers, extra_environ=extra_environ,
+                                  status=status, method="post")
+
+    def get_json(self, path, expect_errors=False, headers=None,
+                 extra_environ=None, path_prefix=PATH_PREFIX,
+                 return_json=True, **params):
+        """Sends simulated HTTP GET request to Pecan test app.
+
+        :param path: url path of target service
+        :param expect_errors: Boolean value; whether an error is expected
+                              based on request
+        :param headers: a dictionary of headers to send along with the
+                        request
+        :param extra_environ: a dictionary of environ variables to send along
+                              with the request
+        :param path_prefix: prefix of the url path
+        :param return_json: whether to return the decoded body rather than
+                            the response
+        :param params: the query parameters of the request
+        """
+        response = self.app.get(path_prefix + path,
+                                params=params,
+                                headers=headers,
+                                extra_environ=extra_environ,
+                                expect_errors=expect_errors)
+        if return_json and not expect_errors:
+            response = response.json
+        return response
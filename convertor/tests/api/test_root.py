@@ -0,0 +1,9 @@
+from convertor.tests.api import base
+
+
+class TestRoot(base.FunctionalTest):
+
+    def test_get_v1(self):
+        data = self.get_json('/')
+        self.assertEqual('v1', data['id'])
+        self.assertIn('tasks', data)
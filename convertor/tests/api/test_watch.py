@@ -0,0 +1,74 @@
+import os
+import socket
+from unittest import mock
+
+from convertor.api import watch
+from convertor.common import rpc
+from convertor.tests import base
+
+
+class TestWatchRegistry(base.TestCase):
+
+    def test_notify_wakes_the_watches_of_the_task(self):
+        registry = watch.get_registry()
+        task_watch = registry.watch('task-1')
+        other = registry.watch('task-2')
+
+        registry.notify('task-1', 'SUCCEEDED')
+
+        self.assertTrue(task_watch.wait('PENDING', 0.1))
+        self.assertEqual('SUCCEEDED', task_watch.status)
+        self.assertFalse(other.wait('PENDING', 0.01))
+
+    def test_wait_ignores_the_known_status(self):
+        registry = watch.get_registry()
+        task_watch = registry.watch('task-1')
+
+        registry.notify('task-1', 'PENDING')
+
+        self.assertFalse(task_watch.wait('PENDING', 0.01))
+
+    def test_unwatch(self):
+        registry = watch.get_registry()
+        task_watch = registry.watch('task-1')
+        registry.unwatch(task_watch)
+
+        registry.notify('task-1', 'SUCCEEDED')
+
+        self.assertFalse(task_watch.wait('PENDING', 0.01))
+
+
+class TestStart(base.TestCase):
+
+    def setUp(self):
+        super(TestStart, self).setUp()
+        self.config(notification_level='info')
+
+    def test_start_disabled(self):
+        self.config(max_wait=0, group='api')
+
+        watch.start()
+
+        self.assertFalse(watch.get_registry().running)
+
+    @mock.patch.object(rpc, 'get_notification_listener')
+    def test_start_default_config(self, m_listener):
+        watch.start()
+        self.addCleanup(watch.stop)
+
+        self.assertTrue(watch.get_registry().running)
+        m_listener.assert_called_once_with(
+            mock.ANY, mock.ANY, serializer=mock.ANY,
+            pool='convertor-api-%s-0' % socket.gethostname())
+        self.assertTrue(os.path.exists(
+            os.path.join(self.state_path, 'api-watch', '0.lock')))
+
+    @mock.patch.object(watch, 'LOG')
+    @mock.patch.object(rpc, 'get_notification_listener')
+    def test_start_failure(self, m_listener, m_log):
+        m_listener.return_value.start.side_effect = RuntimeError('boom')
+
+        self.assertRaises(RuntimeError, watch.start)
+
+        self.assertFalse(watch.get_registry().running)
+        self.assertTrue(m_log.error.called)
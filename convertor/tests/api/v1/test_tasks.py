@@ -0,0 +1,444 @@
+import datetime
+from unittest import mock
+
+import fixtures
+
+from convertor.api.controllers.v1 import utils as api_utils
+from convertor.api import watch
+from convertor.notifications import base as notificationbase
+from convertor import objects
+from convertor.tests.api import base as api_base
+
+
+def task_post_data(**kwargs):
+    data = {'image_id': 'image', 'bucket_id': 'bucket',
+            'new_format': 'qcow2'}
+    data.update(kwargs)
+    return data
+
+
+class TestPost(api_base.FunctionalTest):
+
+    def test_create_task(self):
+        response = self.post_json('/tasks', task_post_data())
+
+        self.assertEqual(201, response.status_int)
+        task = objects.Task.get_by_uuid(self.context, response.json['uuid'])
+        self.assertEqual(objects.task.Status.CREATED, task.status)
+        self.launch_task.assert_called_once_with(
+            mock.ANY, task.uuid)
+
+    @mock.patch.object(notificationbase.NotificationEmitter, 'submit')
+    def test_create_task_notifications_disabled(self, m_submit):
+        response = self.post_json('/tasks', task_post_data())
+
+        self.assertEqual(201, response.status_int)
+        self.assertFalse(m_submit.called)
+
+    @mock.patch.object(notificationbase.NotificationEmitter, 'submit')
+    def test_create_task_sends_notification(self, m_submit):
+        self.config(notification_level='info')
+
+        response = self.post_json('/tasks', task_post_data())
+
+        self.assertEqual(201, response.status_int)
+        m_submit.assert_called_once_with(
+            mock.ANY, 'info', event_type='task.create',
+            publisher_id=mock.ANY, payload=mock.ANY)
+
+    def test_create_tasks_batch(self):
+        response = self.post_json(
+            '/tasks/batch',
+            {'tasks': [task_post_data(image_id='image-%d' % i)
+                       for i in range(3)]})
+
+        self.assertEqual(201, response.status_int)
+        results = response.json['results']
+        self.assertEqual([0, 1, 2], [r['index'] for r in results])
+        self.launch_tasks.assert_called_once_with(
+            mock.ANY, [r['task']['uuid'] for r in results])
+
+
+class TestListPagination(api_base.FunctionalTest):
+
+    def setUp(self):
+        super(TestListPagination, self).setUp()
+        start = datetime.datetime(2024, 1, 1)
+        self.uuids = []
+        # NOTE: the update times go backwards, and two tasks share one.
+        for i, minutes in enumerate((5, 4, 3, 3, 1)):
+            task = objects.Task(
+                self.context, image_id='image-%d' % i, bucket_id='bucket',
+                new_format='qcow2', status=objects.task.Status.CREATED,
+                updated_at=start + datetime.timedelta(minutes=minutes))
+            task.create()
+            self.uuids.append(task.uuid)
+
+    def _list_all(self, **params):
+        """List the tasks page by page, following the next links."""
+        data = self.get_json('/tasks', **params)
+        pages = [[task['uuid'] for task in data['tasks']]]
+        while data.get('next'):
+            data = self.app.get(data['next']).json
+            pages.append([task['uuid'] for task in data['tasks']])
+        return pages
+
+    def test_pages(self):
+        pages = self._list_all(limit=2)
+
+        self.assertEqual([self.uuids[0:2], self.uuids[2:4], self.uuids[4:]],
+                         pages)
+
+    def test_pages_sorted_by_updated_at(self):
+        pages = self._list_all(limit=2, sort_key='updated_at')
+
+        self.assertEqual(
+            [self.uuids[4], self.uuids[2], self.uuids[3], self.uuids[1],
+             self.uuids[0]],
+            sum(pages, []))
+
+    def test_pages_sorted_by_updated_at_desc(self):
+        pages = self._list_all(limit=2, sort_key='updated_at',
+                               sort_dir='desc')
+
+        self.assertEqual(
+            [self.uuids[0], self.uuids[1], self.uuids[3], self.uuids[2],
+             self.uuids[4]],
+            sum(pages, []))
+
+    def test_filter_updated_at(self):
+        pages = self._list_all(updated_at='gte:2024-01-01T00:03:00')
+
+        self.assertEqual([self.uuids[0:4]], pages)
+
+    def test_next_link_keeps_the_filters(self):
+        pages = self._list_all(limit=1, image_id='in:image-1,image-3')
+
+        self.assertEqual([[self.uuids[1]], [self.uuids[3]]],
+                         [page for page in pages if page])
+
+    def _get_page(self, sort_key, value, last_id):
+        cursor = api_utils.encode_cursor({sort_key: value, 'id': last_id},
+                                         sort_key)
+        return self.get_json('/tasks', sort_key=sort_key, cursor=cursor,
+                             expect_errors=True)
+
+    def test_cursor_other_timezone(self):
+        response = self._get_page('updated_at', '2024-01-01T01:03:00+01:00',
+                                  0)
+
+        self.assertEqual(200, response.status_int)
+        self.assertEqual([self.uuids[2], self.uuids[3], self.uuids[1],
+                          self.uuids[0]],
+                         [task['uuid'] for task in response.json['tasks']])
+
+    def test_cursor_invalid_timestamp(self):
+        response = self._get_page('updated_at', 'yesterday', 1)
+
+        self.assertEqual(400, response.status_int)
+        self.assertIn('cursor', response.json['faultstring'])
+
+    def test_cursor_wrongly_typed_value(self):
+        for sort_key, value in (('created_at', 42),
+                                ('priority', 'high'),
+                                ('priority', [1])):
+            response = self._get_page(sort_key, value, 1)
+
+            self.assertEqual(400, response.status_int, sort_key)
+
+    def test_cursor_of_other_sort_key(self):
+        cursor = api_utils.encode_cursor({'created_at': None, 'id': 1},
+                                         'created_at')
+
+        response = self.get_json('/tasks', sort_key='updated_at',
+                                 cursor=cursor, expect_errors=True)
+
+        self.assertEqual(400, response.status_int)
+
+
+class TestCoalescing(api_base.FunctionalTest):
+
+    def setUp(self):
+        super(TestCoalescing, self).setUp()
+        self.leader = self.post_json('/tasks', task_post_data()).json
+        self.launch_task.reset_mock()
+
+    def test_post_follows_the_same_conversion(self):
+        task = self.post_json('/tasks', task_post_data()).json
+
+        self.assertEqual(self.leader['uuid'], task['leader_uuid'])
+        self.assertFalse(self.launch_task.called)
+
+    def test_post_other_format_is_not_coalesced(self):
+        task = self.post_json('/tasks', task_post_data(new_format='raw')).json
+
+        self.assertIsNone(task['leader_uuid'])
+        self.launch_task.assert_called_once_with(mock.ANY, task['uuid'])
+
+    def test_post_other_profile_is_not_coalesced(self):
+        task = self.post_json('/tasks',
+                              task_post_data(profile='compact')).json
+
+        self.assertIsNone(task['leader_uuid'])
+        self.launch_task.assert_called_once_with(mock.ANY, task['uuid'])
+        follower = self.post_json('/tasks',
+                                  task_post_data(profile='compact')).json
+        self.assertEqual(task['uuid'], follower['leader_uuid'])
+
+    def test_post_finished_leader_is_not_followed(self):
+        leader = objects.Task.get_by_uuid(self.context, self.leader['uuid'])
+        leader.status = objects.task.Status.COMPLETED
+        leader.save()
+
+        task = self.post_json('/tasks', task_post_data()).json
+
+        self.assertIsNone(task['leader_uuid'])
+
+    def test_post_coalescing_disabled(self):
+        self.config(coalesce_tasks=False, group='api')
+
+        task = self.post_json('/tasks', task_post_data()).json
+
+        self.assertIsNone(task['leader_uuid'])
+
+    def test_batch_coalesces_by_conversion(self):
+        response = self.post_json('/tasks/batch', {'tasks': [
+            task_post_data(),
+            task_post_data(profile='compact'),
+            task_post_data(profile='compact'),
+            task_post_data(image_id='other'),
+            task_post_data(image_id='other'),
+        ]})
+
+        tasks = [result['task'] for result in response.json['results']]
+        self.assertEqual(
+            [self.leader['uuid'], None, tasks[1]['uuid'], None,
+             tasks[3]['uuid']],
+            [task['leader_uuid'] for task in tasks])
+        self.launch_tasks.assert_called_once_with(
+            mock.ANY, [tasks[1]['uuid'], tasks[3]['uuid']])
+
+
+class TestGetOne(api_base.FunctionalTest):
+
+    def setUp(self):
+        super(TestGetOne, self).setUp()
+        self.task = objects.Task(
+            self.context, image_id='image', bucket_id='bucket',
+            new_format='qcow2', status=objects.task.Status.INPROGRESS)
+        self.task.create()
+        # The API listens to the task updates.
+        self.useFixture(fixtures.MockPatchObject(
+            watch.get_registry(), 'listener'))
+
+    def _links(self, task_uuid):
+        return [{'href': 'http://localhost/v1/tasks/%s' % task_uuid,
+                 'rel': 'self'},
+                {'href': 'http://localhost/tasks/%s' % task_uuid,
+                 'rel': 'bookmark'}]
+
+    def test_get_one(self):
+        data = self.get_json('/tasks/%s' % self.task.uuid)
+
+        self.assertEqual(self.task.uuid, data['uuid'])
+        self.assertEqual(self._links(self.task.uuid), data['links'])
+
+    def test_get_one_fields(self):
+        data = self.get_json('/tasks/%s' % self.task.uuid,
+                             fields='status,new_format')
+
+        self.assertEqual({'status': 'INPROGRESS', 'new_format': 'qcow2',
+                          'links': self._links(self.task.uuid)}, data)
+
+    @mock.patch.object(watch.Watch, 'wait')
+    def test_get_one_wait(self, m_wait):
+        data = self.get_json('/tasks/%s' % self.task.uuid, wait=5)
+
+        m_wait.assert_called_once_with('INPROGRESS', 5)
+        self.assertEqual(self.task.uuid, data['uuid'])
+
+    @mock.patch.object(watch.Watch, 'wait')
+    def test_get_one_wait_fields(self, m_wait):
+        data = self.get_json('/tasks/%s' % self.task.uuid, wait=5,
+                             fields='status,new_format')
+
+        self.assertTrue(m_wait.called)
+        self.assertEqual({'status': 'INPROGRESS', 'new_format': 'qcow2',
+                          'links': self._links(self.task.uuid)}, data)
+
+    @mock.patch.object(watch.Watch, 'wait')
+    def test_get_one_wait_finished_task(self, m_wait):
+        self.task.status = objects.task.Status.COMPLETED
+        self.task.save()
+
+        data = self.get_json('/tasks/%s' % self.task.uuid, wait=5,
+                             fields='status')
+
+        self.assertFalse(m_wait.called)
+        self.assertEqual({'status': 'COMPLETED',
+                          'links': self._links(self.task.uuid)}, data)
+
+
+class TestListFilters(api_base.FunctionalTest):
+
+    def setUp(self):
+        super(TestListFilters, self).setUp()
+        self.tasks = []
+        for i, status in enumerate((objects.task.Status.CREATED,
+                                    objects.task.Status.INPROGRESS,
+                                    objects.task.Status.COMPLETED)):
+            task = objects.Task(
+                self.context, image_id='image-%d' % i, bucket_id='bucket',
+                new_format='qcow2', status=status,
+                created_at=datetime.datetime(2024, 1, 1 + i))
+            task.create()
+            self.tasks.append(task)
+
+    def _uuids(self, **params):
+        data = self.get_json('/tasks', **params)
+        return [task['uuid'] for task in data['tasks']]
+
+    def test_filter_status(self):
+        self.assertEqual([self.tasks[1].uuid],
+                         self._uuids(status='INPROGRESS'))
+
+    def test_filter_status_in(self):
+        self.assertEqual([self.tasks[0].uuid, self.tasks[1].uuid],
+                         self._uuids(status='in:CREATED,INPROGRESS'))
+
+    def test_filter_status_neq(self):
+        self.assertEqual([self.tasks[0].uuid, self.tasks[2].uuid],
+                         self._uuids(status='neq:INPROGRESS'))
+
+    def test_filter_created_at(self):
+        self.assertEqual([self.tasks[1].uuid, self.tasks[2].uuid],
+                         self._uuids(created_at='gt:2024-01-01T12:00:00'))
+
+    def test_filter_created_at_timezone(self):
+        self.assertEqual(
+            [self.tasks[2].uuid],
+            self._uuids(created_at='gte:2024-01-03T01:00:00+01:00'))
+
+    def test_filter_created_at_invalid(self):
+        for value in ('yesterday', 'in:2024-01-01T00:00:00'):
+            response = self.get_json('/tasks', created_at=value,
+                                     expect_errors=True)
+
+            self.assertEqual(400, response.status_int, value)
+
+    def test_filter_in_without_values(self):
+        response = self.get_json('/tasks', status='in:',
+                                 expect_errors=True)
+
+        self.assertEqual(400, response.status_int)
+
+    def test_list_fields(self):
+        data = self.get_json('/tasks', fields='status')
+
+        self.assertEqual(['links', 'status'], sorted(data['tasks'][0]))
+        self.assertEqual('CREATED', data['tasks'][0]['status'])
+
+    def test_list_invalid_fields(self):
+        response = self.get_json('/tasks', fields='status,password',
+                                 expect_errors=True)
+
+        self.assertEqual(400, response.status_int)
+
+
+class TestBatch(api_base.FunctionalTest):
+
+    def test_batch_reports_the_invalid_tasks(self):
+        uuid = '27e3153e-d5bf-4b7e-b517-fb518e17f34c'
+        response = self.post_json('/tasks/batch', {'tasks': [
+            task_post_data(uuid=uuid),
+            task_post_data(image_id=''),
+            task_post_data(uuid=uuid, image_id='other'),
+            task_post_data(image_id='x' * 64),
+            task_post_data(new_format='raw', profile='compact'),
+            task_post_data(image_id='last'),
+        ]})
+
+        self.assertEqual(201, response.status_int)
+        results = response.json['results']
+        self.assertEqual(list(range(6)), [r['index'] for r in results])
+        self.assertEqual(uuid, results[0]['task']['uuid'])
+        for result in results[1:5]:
+            self.assertNotIn('task', result)
+            self.assertTrue(result['error'])
+        self.assertEqual('last', results[5]['task']['image_id'])
+        self.launch_tasks.assert_called_once_with(
+            mock.ANY, [uuid, results[5]['task']['uuid']])
+
+    def test_batch_too_large(self):
+        self.config(max_batch_size=2, group='api')
+
+        response = self.post_json(
+            '/tasks/batch', {'tasks': [task_post_data()] * 3},
+            expect_errors=True)
+
+        self.assertEqual(400, response.status_int)
+        self.assertFalse(self.launch_tasks.called)
+        self.assertEqual([], objects.Task.list(self.context))
+
+
+class TestETag(api_base.FunctionalTest):
+
+    def setUp(self):
+        super(TestETag, self).setUp()
+        self.task = objects.Task(
+            self.context, image_id='image', bucket_id='bucket',
+            new_format='qcow2', status=objects.task.Status.CREATED)
+        self.task.create()
+
+    def _get(self, path, etag=None, **params):
+        headers = {'If-None-Match': etag} if etag else None
+        return self.get_json(path, headers=headers, return_json=False,
+                             **params)
+
+    def _update_task(self):
+        self.task.status = objects.task.Status.INPROGRESS
+        self.task.save()
+
+    def test_list_not_modified(self):
+        etag = self._get('/tasks').headers['ETag']
+
+        response = self._get('/tasks', etag=etag)
+
+        self.assertEqual(304, response.status_int)
+        self.assertEqual(etag, response.headers['ETag'])
+        self.assertEqual(b'', response.body)
+
+    def test_list_modified(self):
+        etag = self._get('/tasks').headers['ETag']
+        self._update_task()
+
+        response = self._get('/tasks', etag=etag)
+
+        self.assertEqual(200, response.status_int)
+        self.assertNotEqual(etag, response.headers['ETag'])
+
+    def test_list_etag_depends_on_the_query(self):
+        etag = self._get('/tasks').headers['ETag']
+
+        response = self._get('/tasks', etag=etag, fields='status')
+
+        self.assertEqual(200, response.status_int)
+
+    def test_get_one_not_modified(self):
+        path = '/tasks/%s' % self.task.uuid
+        etag = self._get(path).headers['ETag']
+
+        self.assertEqual(304, self._get(path, etag=etag).status_int)
+        self._update_task()
+        self.assertEqual(200, self._get(path, etag=etag).status_int)
+
+    def test_get_one_etag_depends_on_the_fields(self):
+        path = '/tasks/%s' % self.task.uuid
+        etag = self._get(path).headers['ETag']
+
+        response = self._get(path, etag=etag, fields='status')
+
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(304, self._get(
+            path, etag=response.headers['ETag'],
+            fields='status').status_int)
@@ -0,0 +1,85 @@
+"""Base classes of the unit and functional tests.
+
+Every test runs against the default configuration of the services, with
+an in-memory SQLite database, a fake message bus and a temporary
+``state_path``. The singletons the services build lazily are reset
+between the tests so each test builds them from its own configuration.
+"""
+
+import fixtures
+from oslo_config import fixture as config_fixture
+from oslo_log import log
+from oslo_messaging import conffixture as messaging_conffixture
+import testtools
+
+from convertor.api import watch
+from convertor.common import context
+from convertor.common import rpc
+from convertor.common import service  # noqa: F401, registers options
+from convertor import conf
+from convertor.db.sqlalchemy import api as sqla_api
+from convertor.db.sqlalchemy import models
+from convertor.notifications import base as notificationbase
+from convertor import objects
+from convertor.worker import cache
+from convertor.worker import progress
+from convertor.worker import scheduler
+from convertor.worker import scratch
+
+CONF = conf.CONF
+
+log.register_options(CONF)
+objects.register_all()
+
+# Singletons reset before every test, as (module, attribute).
+_SINGLETONS = (
+    (sqla_api, '_FACADE'),
+    (notificationbase, '_EMITTER'),
+    (watch, '_REGISTRY'),
+    (cache, '_CACHE'),
+    (progress, '_REPORTER'),
+    (scheduler, '_SCHEDULER'),
+    (scratch, '_MANAGER'),
+)
+_RPC_GLOBALS = (
+    (rpc, 'TRANSPORT'),
+    (rpc, 'NOTIFICATION_TRANSPORT'),
+    (rpc, 'NOTIFIER'),
+)
+
+
+class TestCase(testtools.TestCase):
+    """Test case with the default configuration of the services."""
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        self.conf = self.useFixture(config_fixture.Config(CONF))
+        self.state_path = self.useFixture(fixtures.TempDir()).path
+        self.config(state_path=self.state_path)
+        self.config(connection='sqlite://', group='database')
+        # NOTE: the tests checking the notifications enable them, the
+        # thread sending them would outlive the others.
+        self.config(notification_level='')
+
+        messaging_conf = self.useFixture(
+            messaging_conffixture.ConfFixture(CONF))
+        messaging_conf.transport_url = 'fake:/'
+
+        for module, name in _SINGLETONS + _RPC_GLOBALS:
+            self.useFixture(fixtures.MonkeyPatch(
+                '%s.%s' % (module.__name__, name), None))
+        rpc.init(CONF)
+
+    def config(self, **kw):
+        """Override config options for a test."""
+        self.conf.config(**kw)
+
+
+class DbTestCase(TestCase):
+    """Test case with the schema created in an empty database."""
+
+    def setUp(self):
+        super(DbTestCase, self).setUp()
+        models.Base.metadata.create_all(sqla_api.get_engine())
+        self.dbapi = sqla_api.get_backend()
+        self.context = context.make_context(project_id='project')
@@ -0,0 +1,35 @@
+import os
+from unittest import mock
+
+from oslo_service import wsgi
+
+from convertor.common import service
+from convertor.tests import base
+
+
+@mock.patch.object(wsgi, 'Server')
+class TestMetricsService(base.TestCase):
+
+    def _make_service(self, name='convertor-worker-metrics'):
+        metrics_service = service.MetricsService(name, '127.0.0.1', 9400)
+        self.addCleanup(metrics_service._slot_lock.close)
+        return metrics_service
+
+    def test_default_config(self, m_server):
+        metrics_service = self._make_service()
+
+        self.assertEqual(0, metrics_service.slot)
+        self.assertTrue(os.path.exists(os.path.join(
+            self.state_path, 'convertor-worker-metrics', '0.lock')))
+        m_server.assert_called_once_with(
+            mock.ANY, 'convertor-worker-metrics', mock.ANY,
+            host='127.0.0.1', port=9400,
+            logger_name='convertor-worker-metrics')
+
+    def test_processes_serve_on_ports_of_their_own(self, m_server):
+        self._make_service()
+        self._make_service()
+        self._make_service(name='convertor-api-metrics')
+
+        self.assertEqual([9400, 9401, 9400],
+                         [c[1]['port'] for c in m_server.call_args_list])
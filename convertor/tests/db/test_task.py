@@ -0,0 +1,83 @@
+import datetime
+from unittest import mock
+
+from oslo_utils import timeutils
+from sqlalchemy import orm
+
+from convertor import objects
+from convertor.tests import base
+
+
+class TestClaimTasks(base.DbTestCase):
+
+    def setUp(self):
+        super(TestClaimTasks, self).setUp()
+        self.now = datetime.datetime(2024, 1, 1, 12, 0, 0, 250000)
+        timeutils.set_time_override(self.now)
+        self.addCleanup(timeutils.clear_time_override)
+        self.tasks = []
+        for i in range(3):
+            task = objects.Task(self.context, image_id='image-%d' % i,
+                                bucket_id='bucket', new_format='qcow2',
+                                status=objects.task.Status.CREATED)
+            task.create()
+            self.tasks.append(task)
+
+    def _ids(self, db_tasks):
+        return [db_task.id for db_task in db_tasks]
+
+    def test_claim(self):
+        claimed = self.dbapi.claim_tasks('worker-1', 2, 60)
+
+        self.assertEqual([t.id for t in self.tasks[:2]], self._ids(claimed))
+        for db_task in claimed:
+            self.assertEqual(objects.task.Status.INPROGRESS, db_task.status)
+            self.assertEqual('worker-1', db_task.claimed_by)
+            self.assertEqual(self.now + datetime.timedelta(seconds=60),
+                             db_task.lease_expires_at)
+
+    def test_claim_skips_the_leased_tasks(self):
+        self.dbapi.claim_tasks('worker-1', 2, 60)
+
+        claimed = self.dbapi.claim_tasks('worker-2', 2, 60)
+
+        self.assertEqual([self.tasks[2].id], self._ids(claimed))
+
+    def test_claim_expired_lease(self):
+        self.dbapi.claim_tasks('worker-1', 3, 60)
+        timeutils.advance_time_seconds(61)
+
+        claimed = self.dbapi.claim_tasks('worker-2', 3, 60)
+
+        self.assertEqual([t.id for t in self.tasks], self._ids(claimed))
+        self.assertEqual({'worker-2'},
+                         set(db_task.claimed_by for db_task in claimed))
+
+    def test_claim_by_uuid(self):
+        claimed = self.dbapi.claim_tasks('worker-1', 1, 60,
+                                         task_uuid=self.tasks[1].uuid)
+
+        self.assertEqual([self.tasks[1].id], self._ids(claimed))
+        self.assertEqual([], self.dbapi.claim_tasks(
+            'worker-2', 1, 60, task_uuid=self.tasks[1].uuid))
+
+    def test_claim_skips_the_followers(self):
+        self.tasks[0].leader_uuid = self.tasks[1].uuid
+        self.tasks[0].save()
+
+        claimed = self.dbapi.claim_tasks('worker-1', 3, 60)
+
+        self.assertEqual([t.id for t in self.tasks[1:]], self._ids(claimed))
+
+    def test_concurrent_claims_of_a_worker(self):
+        first = self.dbapi.claim_tasks('worker-1', 2, 60)
+        # Another claim of the worker, within the same second, selected
+        # the same tasks before the first one took them, as it can on
+        # the databases which ignore FOR UPDATE.
+        stale_rows = [mock.Mock(id=db_task.id) for db_task in first]
+        with mock.patch.object(orm.Query, 'with_for_update',
+                               return_value=stale_rows):
+            second = self.dbapi.claim_tasks('worker-1', 2, 60)
+
+        self.assertEqual([t.id for t in self.tasks[:2]], self._ids(first))
+        self.assertEqual([], second)
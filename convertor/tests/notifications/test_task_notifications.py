@@ -0,0 +1,43 @@
+from unittest import mock
+
+from convertor.notifications import base as notificationbase
+from convertor.notifications import task as task_notifications
+from convertor import objects
+from convertor.tests import base
+
+
+class TestTaskNotifications(base.DbTestCase):
+
+    def setUp(self):
+        super(TestTaskNotifications, self).setUp()
+        self.task = objects.Task(self.context, image_id='image',
+                                 bucket_id='bucket', new_format='qcow2',
+                                 status=objects.task.Status.CREATED)
+        self.task.create()
+
+    @mock.patch.object(notificationbase.NotificationEmitter, 'submit')
+    @mock.patch.object(task_notifications, '_publisher')
+    def test_send_create_notifications_disabled(self, m_publisher,
+                                                m_submit):
+        task_notifications.send_create(self.context, self.task)
+
+        self.assertFalse(m_publisher.called)
+        self.assertFalse(m_submit.called)
+
+    @mock.patch.object(notificationbase.NotificationEmitter, 'submit')
+    def test_send_create_below_notification_level(self, m_submit):
+        self.config(notification_level='warning')
+
+        task_notifications.send_create(self.context, self.task)
+
+        self.assertFalse(m_submit.called)
+
+    @mock.patch.object(notificationbase.NotificationEmitter, 'submit')
+    def test_send_create_default_host(self, m_submit):
+        self.config(host='node-1', notification_level='info')
+
+        task_notifications.send_create(self.context, self.task)
+
+        m_submit.assert_called_once_with(
+            self.context, 'info', event_type='task.create',
+            publisher_id='convertor-api:node-1', payload=mock.ANY)
@@ -0,0 +1,50 @@
+"""Run the benchmarks of tools/ on a few tasks, as they are shipped."""
+
+import contextlib
+import io
+import os
+import sys
+
+from convertor.db.sqlalchemy import api as sqla_api
+from convertor.tests import base
+
+TOOLS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..',
+                         'tools')
+sys.path.insert(0, os.path.abspath(TOOLS_DIR))
+
+import benchmark_task_list  # noqa: E402
+import benchmark_task_serialization  # noqa: E402
+
+
+class TestBenchmarkTaskList(base.DbTestCase):
+
+    def test_run(self):
+        engine = sqla_api.get_engine()
+        benchmark_task_list.populate(engine, 50, batch_size=20)
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            benchmark_task_list.run(engine, repeat=1, limit=10)
+
+        lines = output.getvalue().splitlines()
+        for name, _filters, _sort_key in benchmark_task_list.SCENARIOS:
+            self.assertTrue(any(line.strip().startswith(name)
+                                for line in lines), name)
+
+
+class TestBenchmarkTaskSerialization(base.DbTestCase):
+
+    def setUp(self):
+        super(TestBenchmarkTaskSerialization, self).setUp()
+        self.config(enable_authentication=False)
+        benchmark_task_list.populate(sqla_api.get_engine(), 30)
+
+    def test_renderings_match(self):
+        benchmark_task_serialization.bind_request()
+
+        for sort_key in ('id', 'created_at'):
+            self.assertEqual(
+                benchmark_task_serialization.render_objects(
+                    self.context, 10, sort_key),
+                benchmark_task_serialization.render_rows(
+                    self.context, 10, sort_key))
@@ -0,0 +1,129 @@
+import datetime
+from unittest import mock
+
+from oslo_utils import timeutils
+
+from convertor import conf
+from convertor import objects
+from convertor.tests import base
+from convertor.worker import claim
+from convertor.worker.messaging import trigger
+from convertor.worker import utils
+
+CONF = conf.CONF
+
+
+class TestTriggerTaskClaim(base.DbTestCase):
+
+    def setUp(self):
+        super(TestTriggerTaskClaim, self).setUp()
+        self.config(workers=2, group='convertor_worker')
+        self.now = datetime.datetime(2024, 1, 1, 12, 0, 0)
+        timeutils.set_time_override(self.now)
+        self.addCleanup(timeutils.clear_time_override)
+        self.trigger = trigger.TriggerTask(mock.Mock())
+        self.trigger.executor = mock.Mock()
+
+    def _create_tasks(self, count, project_id='project', priority=0):
+        tasks = []
+        for i in range(count):
+            task = objects.Task(self.context, image_id='image-%d' % i,
+                                bucket_id='bucket', new_format='qcow2',
+                                status=objects.task.Status.CREATED,
+                                project_id=project_id, priority=priority)
+            task.create()
+            tasks.append(task)
+        return tasks
+
+    def test_claim_tasks_up_to_the_idle_workers(self):
+        tasks = self._create_tasks(3)
+
+        claimed = self.trigger.claim_tasks(self.context)
+
+        self.assertEqual([t.uuid for t in tasks[:2]],
+                         [t.uuid for t in claimed])
+        self.assertEqual(2, self.trigger.executor.submit.call_count)
+        for task in claimed:
+            self.assertEqual(utils.worker_id(), task.claimed_by)
+        self.assertEqual([], self.trigger.claim_tasks(self.context))
+
+    def test_claim_tasks_batch_size(self):
+        self._create_tasks(3)
+        self.config(claim_batch_size=1, group='convertor_worker')
+
+        self.assertEqual(1, len(self.trigger.claim_tasks(self.context)))
+
+    def test_claim_tasks_fair(self):
+        self.config(scheduling_policy='fair', group='convertor_worker')
+        flood = self._create_tasks(3, project_id='flood')
+        other = self._create_tasks(1, project_id='other')
+
+        claimed = self.trigger.claim_tasks(self.context)
+
+        self.assertEqual(sorted([flood[0].uuid, other[0].uuid]),
+                         sorted(t.uuid for t in claimed))
+
+    def test_claim_tasks_fair_project_limit(self):
+        self.config(scheduling_policy='fair', max_tasks_per_project=1,
+                    group='convertor_worker')
+        self._create_tasks(3, project_id='flood')
+
+        self.assertEqual(1, len(self.trigger.claim_tasks(self.context)))
+        self.trigger._tasks.clear()
+        self.assertEqual([], self.trigger.claim_tasks(self.context))
+
+    def test_renew_leases(self):
+        self._create_tasks(1)
+        task = self.trigger.claim_tasks(self.context)[0]
+        timeutils.advance_time_seconds(30)
+
+        self.assertEqual(1, self.trigger.renew_leases(self.context))
+
+        task.refresh()
+        self.assertEqual(
+            self.now + datetime.timedelta(
+                seconds=30 + CONF.convertor_worker.lease_duration),
+            task.lease_expires_at.replace(tzinfo=None))
+
+    def test_launch_task_fair_claims_from_the_database(self):
+        self.config(scheduling_policy='fair', group='convertor_worker')
+        tasks = self._create_tasks(1)
+
+        self.trigger.launch_task(self.context, 'announced-task')
+
+        self.trigger.executor.submit.assert_called_once_with(
+            self.trigger.do_launch_task, self.context, tasks[0].uuid,
+            mock.ANY)
+
+
+class TestTaskClaimer(base.TestCase):
+
+    def setUp(self):
+        super(TestTaskClaimer, self).setUp()
+        self.trigger = mock.Mock(spec=trigger.TriggerTask)
+        worker_service = mock.Mock(conductor_endpoints=[self.trigger])
+        self.claimer = claim.TaskClaimer(worker_service)
+
+    def test_claim(self):
+        self.claimer.claim()
+
+        self.trigger.renew_leases.assert_called_once_with(
+            self.claimer.context)
+        self.trigger.claim_tasks.assert_called_once_with(
+            self.claimer.context)
+
+    @mock.patch.object(claim, 'LOG')
+    def test_claim_failure_is_logged(self, m_log):
+        self.trigger.claim_tasks.side_effect = RuntimeError('database down')
+
+        self.claimer.claim()
+
+        self.assertTrue(m_log.exception.called)
+
+    def test_start_disabled(self):
+        self.config(claim_interval=0, group='convertor_worker')
+
+        self.claimer.start()
+        self.claimer.stop()
+
+        self.assertFalse(self.trigger.claim_tasks.called)
@@ -0,0 +1,51 @@
+from convertor.tests import base
+from convertor.worker import fairshare
+
+
+def candidates(project_id, ids, priority=0):
+    return [{'id': task_id, 'project_id': project_id, 'priority': priority}
+            for task_id in ids]
+
+
+class TestSelect(base.TestCase):
+
+    def test_projects_take_turns(self):
+        picked = fairshare.select(
+            candidates('a', [1, 2, 3, 4]) + candidates('b', [5, 6]), {}, 4)
+
+        self.assertEqual([1, 5, 2, 6], picked)
+
+    def test_running_tasks_count(self):
+        picked = fairshare.select(
+            candidates('a', [1, 2]) + candidates('b', [3, 4]), {'a': 2}, 2)
+
+        self.assertEqual([3, 4], picked)
+
+    def test_weights(self):
+        self.config(project_weights={'a': '2'}, group='convertor_worker')
+
+        picked = fairshare.select(
+            candidates('a', [1, 2, 3, 4]) + candidates('b', [5, 6]), {}, 3)
+
+        self.assertEqual([1, 5, 2], picked)
+        self.assertEqual(
+            [1, 5, 2, 3],
+            fairshare.select(candidates('a', [1, 2, 3, 4]) +
+                             candidates('b', [5, 6]), {}, 4))
+
+    def test_priority_breaks_ties(self):
+        picked = fairshare.select(
+            candidates('a', [1]) + candidates('b', [2], priority=5), {}, 1)
+
+        self.assertEqual([2], picked)
+
+    def test_project_limits(self):
+        # NOTE: a limit of 0 lifts the default limit of the project.
+        self.config(max_tasks_per_project=2,
+                    project_max_tasks={'b': '0'},
+                    group='convertor_worker')
+
+        picked = fairshare.select(
+            candidates('a', [1, 2, 3]) + candidates('b', [4, 5]), {'a': 1}, 5)
+
+        self.assertEqual([4, 1, 5], picked)
@@ -0,0 +1,36 @@
+from unittest import mock
+
+import fixtures
+
+from convertor.tests import base
+from convertor.worker import rpcapi
+
+
+class TestWorkerAPI(base.TestCase):
+
+    def setUp(self):
+        super(TestWorkerAPI, self).setUp()
+        self.client = mock.Mock()
+        self.useFixture(fixtures.MockPatchObject(
+            rpcapi.WorkerAPI, 'conductor_client', self.client))
+        self.api = rpcapi.WorkerAPI()
+        self.context = mock.sentinel.context
+
+    def test_launch_task(self):
+        self.api.launch_task(self.context, 'task-1')
+
+        self.client.cast.assert_called_once_with(
+            self.context, 'launch_task', task_uuid='task-1',
+            sent_at=mock.ANY)
+
+    def test_launch_tasks_in_batches(self):
+        self.config(batch_cast_size=2, group='api')
+
+        self.api.launch_tasks(self.context, ['t1', 't2', 't3'])
+
+        self.assertEqual(
+            [mock.call(self.context, 'launch_tasks', task_uuids=['t1', 't2'],
+                       sent_at=mock.ANY),
+             mock.call(self.context, 'launch_tasks', task_uuids=['t3'],
+                       sent_at=mock.ANY)],
+            self.client.cast.call_args_list)
@@ -0,0 +1,124 @@
+import sys
+import threading
+
+import fixtures
+from oslo_concurrency import processutils
+
+from convertor.tests import base
+from convertor.worker import scheduler
+
+
+class TestConversionScheduler(base.TestCase):
+
+    def setUp(self):
+        super(TestConversionScheduler, self).setUp()
+        self.config(cpus_per_conversion=2, reserved_cpus=0,
+                    group='convertor_worker')
+        self.scheduler = scheduler.ConversionScheduler(max_workers=4)
+        self.addCleanup(self.scheduler.shutdown)
+        self.useFixture(fixtures.MockPatchObject(
+            scheduler.os, 'cpu_count', return_value=8))
+
+    def _job(self, **conf):
+        self.config(group='convertor_worker', **conf)
+        return scheduler.ConversionJob(['true'])
+
+    def test_idle_host_admits_any_job(self):
+        self.assertTrue(self.scheduler._can_admit(
+            self._job(cpus_per_conversion=64)))
+
+    def test_admission_by_cpus(self):
+        job = self._job()
+        for _ in range(4):
+            self.assertTrue(self.scheduler._can_admit(job))
+            self.scheduler._acquire(job)
+
+        self.assertEqual(0, self.scheduler.free_cpus())
+        self.assertFalse(self.scheduler._can_admit(job))
+        self.scheduler._release(job)
+        self.assertTrue(self.scheduler._can_admit(job))
+
+    def test_admission_by_workers(self):
+        job = self._job(cpus_per_conversion=1)
+        for _ in range(4):
+            self.scheduler._acquire(job)
+
+        self.assertEqual(4, self.scheduler.free_cpus())
+        self.assertFalse(self.scheduler._can_admit(job))
+
+    def test_admission_by_io_bandwidth(self):
+        job = self._job(cpus_per_conversion=1, max_io_bandwidth=100,
+                        io_bandwidth_per_conversion=60)
+        self.scheduler._acquire(job)
+
+        self.assertEqual(40, self.scheduler.free_io_bandwidth())
+        self.assertFalse(self.scheduler._can_admit(job))
+
+    def test_unlimited_io_bandwidth(self):
+        self.assertIsNone(self.scheduler.free_io_bandwidth())
+
+    def test_waiting_job_is_admitted_once_released(self):
+        job = self._job(cpus_per_conversion=8)
+        self.scheduler._acquire(job)
+        admitted = threading.Event()
+
+        def acquire():
+            self.scheduler._acquire(job)
+            admitted.set()
+
+        waiter = threading.Thread(target=acquire)
+        waiter.start()
+        self.assertFalse(admitted.wait(0.05))
+        self.scheduler._release(job)
+        self.assertTrue(admitted.wait(5))
+        waiter.join()
+
+    def test_execute(self):
+        output = self.scheduler.execute([sys.executable, '-c',
+                                         'print("converted")'])
+
+        self.assertEqual('converted\n', output)
+        self.assertEqual(0, self.scheduler._running)
+        self.assertEqual(0, self.scheduler._cpus_in_use)
+
+    def test_execute_failure(self):
+        self.assertRaises(processutils.ProcessExecutionError,
+                          self.scheduler.execute,
+                          [sys.executable, '-c', 'raise SystemExit(3)'])
+        self.assertEqual(0, self.scheduler._running)
+
+    def test_execute_with_progress(self):
+        progress = []
+        script = ('import sys\n'
+                  'for p in ("0.00", "50.00", "100.00"):\n'
+                  '    sys.stdout.write("    (%s/100%%)\\r" % p)\n'
+                  '    sys.stdout.flush()\n')
+
+        self.scheduler.execute([sys.executable, '-c', script],
+                               on_progress=progress.append)
+
+        self.assertEqual([0.0, 50.0, 100.0], progress)
+
+    def test_execute_with_progress_drains_stderr(self):
+        progress = []
+        # More than a pipe holds, written before stdout is closed.
+        script = ('import sys\n'
+                  'sys.stderr.write("x" * 1024 * 1024)\n'
+                  'sys.stdout.write("    (100.00/100%)\\n")\n'
+                  'sys.exit(1)\n')
+
+        error = self.assertRaises(
+            processutils.ProcessExecutionError, self.scheduler.execute,
+            [sys.executable, '-c', script], on_progress=progress.append)
+
+        self.assertEqual(1024 * 1024, len(error.stderr))
+        self.assertEqual([100.0], progress)
+
+    def test_get_scheduler(self):
+        self.config(conversion_workers=3, group='convertor_worker')
+
+        conversion_scheduler = scheduler.get_scheduler()
+        self.addCleanup(conversion_scheduler.shutdown)
+
+        self.assertIs(conversion_scheduler, scheduler.get_scheduler())
+        self.assertEqual(3, conversion_scheduler.max_workers)
@@ -0,0 +1,82 @@
+import os
+import time
+
+import fixtures
+
+from convertor.common import exception
+from convertor.tests import base
+from convertor.worker import scratch
+
+
+class TestScratchManager(base.TestCase):
+
+    def setUp(self):
+        super(TestScratchManager, self).setUp()
+        self.scratch_dir = self.useFixture(fixtures.TempDir()).path
+        self.config(scratch_dirs=[self.scratch_dir],
+                    scratch_preallocate=False,
+                    group='convertor_worker')
+
+    def _make_manager(self, **kwargs):
+        manager = scratch.ScratchManager([self.scratch_dir], **kwargs)
+        self.addCleanup(manager._owner_lock.close)
+        return manager
+
+    def test_get_manager_default_config(self):
+        manager = scratch.get_manager()
+        self.addCleanup(manager._owner_lock.close)
+
+        self.assertIs(manager, scratch.get_manager())
+        self.assertEqual(os.path.join(self.state_path, 'worker-scratch'),
+                         manager.slots_dir)
+        self.assertEqual(0, manager.owner)
+        self.assertTrue(os.path.exists(
+            os.path.join(manager.slots_dir, '0.lock')))
+
+    def test_workers_take_distinct_slots(self):
+        first = self._make_manager()
+        second = self._make_manager()
+
+        self.assertEqual(0, first.owner)
+        self.assertEqual(1, second.owner)
+
+    def test_reserve_shares_the_space_of_a_conversion(self):
+        manager = self._make_manager()
+
+        space = manager.reserve(('image', 'qcow2'), 1024)
+        self.assertIs(space, manager.reserve(('image', 'qcow2'), 1024))
+        self.assertTrue(space.path.is_dir())
+        self.assertEqual(manager.owner,
+                         scratch.ScratchSpace.owner(space.path.name))
+
+        manager.release(space)
+        self.assertTrue(space.path.is_dir())
+        manager.release(space)
+        self.assertFalse(space.path.exists())
+
+    def test_reserve_times_out_beyond_the_quota(self):
+        self.config(scratch_wait_timeout=0, group='convertor_worker')
+        manager = self._make_manager(quota=2048)
+        manager.reserve(('image', 'qcow2'), 1024)
+
+        self.assertRaises(exception.ScratchSpaceExhausted,
+                          manager.reserve, ('image', 'raw'), 2048)
+
+    def test_collect_garbage_keeps_the_live_workers(self):
+        manager = self._make_manager()
+        other = self._make_manager()
+        stale = time.time() - 3600
+        dirs = {}
+        for name, owner in (('mine', manager.owner),
+                            ('live', other.owner),
+                            ('dead', other.owner + 1)):
+            path = os.path.join(self.scratch_dir,
+                                scratch.ScratchSpace.dirname(name, owner))
+            os.mkdir(path)
+            os.utime(path, (stale, stale))
+            dirs[name] = path
+
+        self.assertEqual(2, manager.collect_garbage(60))
+        self.assertFalse(os.path.exists(dirs['mine']))
+        self.assertTrue(os.path.exists(dirs['live']))
+        self.assertFalse(os.path.exists(dirs['dead']))
@@ -0,0 +1,214 @@
+"""Content-addressed cache of converted images.
+
+Converted artifacts are stored under a key derived from the hash of the
+source image data (as published by Glance), the target format and the
+qemu-img options that influence the output, so identical conversions are
+only done once per worker host, whatever image ID they were requested
+for. Glance image data is immutable, which lets the cache also remember
+which hash an image ID resolves to and serve later requests without
+asking Glance at all. The Glance image an artifact was published as is
+remembered with it, so that it is only uploaded once too.
+
+The cache is bounded in size; the least recently (LRU) or least frequently
+(LFU) used artifacts are evicted first.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+_MiB = 1024 * 1024
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def image_hash(image):
+    """Return the content hash Glance published for ``image``, if any."""
+    algo = getattr(image, 'os_hash_algo', None)
+    value = getattr(image, 'os_hash_value', None)
+    if algo and value:
+        return '%s:%s' % (algo, value)
+    if getattr(image, 'checksum', None):
+        return 'md5:%s' % image.checksum
+    return None
+
+
+class ConvertedImageCache(object):
+    """Size-bounded store of converted images keyed on their content."""
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, cache_dir, max_size, policy='lru'):
+        """:param cache_dir: directory holding the cached artifacts.
+        :param max_size: maximum size of the cache, in bytes.
+        :param policy: eviction policy, ``lru`` or ``lfu``.
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._entries, self._aliases = self._load_index()
+
+    @staticmethod
+    def make_key(content_hash, new_format, options=()):
+        data = json.dumps([content_hash, new_format, list(options)])
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    @property
+    def size(self):
+        return sum(entry['size'] for entry in self._entries.values())
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'entries': len(self._entries),
+                    'size': self.size,
+                    'max_size': self.max_size}
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, self.INDEX_FILE)) as f:
+                index = json.load(f)
+        except (IOError, ValueError):
+            return {}, {}
+        entries = {key: entry for key, entry in index.get('entries',
+                                                          {}).items()
+                   if os.path.exists(self._path(key))}
+        return entries, index.get('aliases', {})
+
+    def _save_index(self):
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        with open('%s.tmp' % path, 'w') as f:
+            json.dump({'entries': self._entries, 'aliases': self._aliases}, f)
+        os.replace('%s.tmp' % path, path)
+
+    def _touch(self, entry):
+        entry['last_access'] = time.time()
+        entry['hits'] += 1
+
+    def lookup(self, key):
+        """Return the path of the artifact stored under ``key``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not os.path.exists(self._path(key)):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._touch(entry)
+            self.hits += 1
+            self._save_index()
+            return self._path(key)
+
+    def image_key(self, image_id, new_format, options=()):
+        """Return the key of an image ID, without knowing its hash.
+
+        :returns: the key, or None if the hash of the image is not known.
+        """
+        content_hash = self._aliases.get(image_id)
+        if content_hash is None:
+            return None
+        return self.make_key(content_hash, new_format, options)
+
+    def published_image(self, key):
+        """Return the ID of the image the artifact was published as."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.get('new_image_id') if entry else None
+
+    def set_published_image(self, key, new_image_id):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry['new_image_id'] = new_image_id
+                self._save_index()
+
+    def _eviction_order(self):
+        if self.policy == 'lfu':
+            def sort_key(item):
+                return (item[1]['hits'], item[1]['last_access'])
+        else:
+            def sort_key(item):
+                return item[1]['last_access']
+        return [key for key, _entry in sorted(self._entries.items(),
+                                              key=sort_key)]
+
+    def _evict(self, needed):
+        for key in self._eviction_order():
+            if self.size + needed <= self.max_size:
+                break
+            del self._entries[key]
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
+            self.evictions += 1
+            LOG.debug("Evicted %s from the converted image cache", key)
+
+    def store(self, key, artifact_path, image_id=None, content_hash=None):
+        """Add a converted image to the cache.
+
+        The artifact is hard-linked into the cache when possible, so that
+        storing it costs no extra I/O.
+
+        :returns: the path of the cached artifact, or None if it is larger
+                  than the whole cache.
+        """
+        size = os.path.getsize(artifact_path)
+        if size > self.max_size:
+            return None
+        with self._lock:
+            self._evict(size)
+            cache_path = self._path(key)
+            tmp_path = '%s.tmp' % cache_path
+            try:
+                os.link(artifact_path, tmp_path)
+            except OSError:
+                shutil.copyfile(artifact_path, tmp_path)
+            os.replace(tmp_path, cache_path)
+            self._entries[key] = {'size': size,
+                                  'last_access': time.time(),
+                                  'hits': 0}
+            if image_id and content_hash:
+                self._aliases[image_id] = content_hash
+            self._save_index()
+        return cache_path
+
+    def add_alias(self, image_id, content_hash):
+        with self._lock:
+            if self._aliases.get(image_id) != content_hash:
+                self._aliases[image_id] = content_hash
+                self._save_index()
+
+
+def get_cache():
+    """Return the converted image cache, or None if it is disabled."""
+    global _CACHE
+    if not CONF.convertor_worker.cache_max_size:
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = ConvertedImageCache(
+                    CONF.convertor_worker.cache_dir,
+                    CONF.convertor_worker.cache_max_size * _MiB,
+                    CONF.convertor_worker.cache_eviction_policy)
+    return _CACHE
@@ -0,0 +1,59 @@
+"""Database-backed claiming of tasks by the workers.
+
+Besides the tasks announced over RPC, each worker periodically claims
+pending tasks straight from the database, and tasks whose lease expired
+because their worker stopped renewing it. Claims skip the rows locked by
+concurrent claims, so workers never wait on each other and a backlog is
+drained by all the workers at once. The leases of the running tasks are
+renewed on the same period.
+"""
+
+from oslo_config import cfg
+from oslo_log import log
+from oslo_service import loopingcall
+from oslo_service import service
+
+from convertor.common import context as convertor_context
+from convertor.worker.messaging import trigger
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+
+class TaskClaimer(service.ServiceBase):
+    """Periodically claim tasks for the endpoint of a worker service."""
+
+    def __init__(self, worker_service):
+        """:param worker_service: the service running the worker endpoint.
+        """
+        self.trigger = next(
+            endpoint for endpoint in worker_service.conductor_endpoints
+            if isinstance(endpoint, trigger.TriggerTask))
+        self.context = convertor_context.make_context(is_admin=True)
+        self._loop = loopingcall.FixedIntervalLoopingCall(self.claim)
+        self._started = False
+
+    def claim(self):
+        try:
+            self.trigger.renew_leases(self.context)
+            self.trigger.claim_tasks(self.context)
+        except Exception:
+            LOG.exception("Failed to claim tasks")
+
+    def start(self):
+        interval = CONF.convertor_worker.claim_interval
+        if interval:
+            self._loop.start(interval=interval)
+            self._started = True
+
+    def stop(self):
+        if self._started:
+            self._loop.stop()
+            self._loop.wait()
+            self._started = False
+
+    def wait(self):
+        """Wait for service to complete."""
+
+    def reset(self):
+        """Reset a service in case it received a SIGHUP."""
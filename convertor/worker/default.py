@@ -1,24 +1,52 @@
+import os
 from pathlib import Path
-import subprocess
 
+from glanceclient import exc as glance_exc
+from oslo_concurrency import processutils
 from oslo_config import cfg
 from oslo_log import log
+from oslo_utils import excutils
+from oslo_utils import timeutils
 
 from convertor.worker import base
+from convertor.worker import cache
+from convertor.worker import download
+from convertor.worker import pipeline
+from convertor.worker import profiles
+from convertor.worker import progress
+from convertor.worker import scheduler
+from convertor.worker import scratch
+from convertor.worker import sparse
+from convertor.worker import upload
+from convertor.worker import utils
 from convertor.common import clients
+from convertor.notifications import task as task_notifications
 from convertor import objects
+from convertor.objects import fields as wfields
 
 LOG = log.getLogger(__name__)
 CONF = cfg.CONF
 
+# Conversions running in this process, so that concurrent tasks for the
+# same image and format share a single download and conversion.
+_CONVERSIONS = utils.SingleFlight()
+
+# Timings of the notifications, by phase.
+_TIMED_PHASES = {progress.Phase.DOWNLOADING: 'download',
+                 progress.Phase.CONVERTING: 'convert',
+                 progress.Phase.UPLOADING: 'upload'}
+
 
 class DefaultWorker(base.BaseWorker):
     def __init__(self, context, worker_manager):
         super(DefaultWorker, self).__init__()
         self._worker_manager = worker_manager
         self._context = context
-        self.osc = clients.OpenStackClients()
+        self.osc = clients.get_clients()
         self.glance = self.osc.glance()
+        self._scratch_spaces = []
+        self.progress = None
+        self._queue_wait = None
 
     @property
     def context(self):
@@ -28,28 +56,257 @@ class DefaultWorker(base.BaseWorker):
     def worker_manager(self):
         return self._worker_manager
 
-    def download_image(self, image_id):
-        img = self.glance.images.get(image_id)
+    def reserve_scratch(self, image, new_format, options=()):
+        """Reserve the scratch space needed to convert ``image``.
+
+        The space is released when the task finishes, see :py:meth:`run`.
+        """
+        space = scratch.get_manager().reserve(
+            (image.id, new_format, options), scratch.required_space(image))
+        self._scratch_spaces.append(space)
+        return space
+
+    def release_scratch(self):
+        manager = scratch.get_manager()
+        while self._scratch_spaces:
+            manager.release(self._scratch_spaces.pop())
 
-        file_name = "%s.img" % img.name
-        file_path = Path("/tmp/convertor_imgs")
-        file_path.mkdir(parents=True, exist_ok=True)
-        file_path = file_path / file_name
-        full_file_path = file_path.resolve()
-        image_file = open(full_file_path, 'w+')
+    def _start_phase(self, phase, total=None):
+        """Enter a new phase and return the progress callback to use."""
+        if self.progress is None:
+            return None
+        self.progress.start_phase(phase, total)
+        if phase == progress.Phase.CONVERTING:
+            return self.progress.update
+        return self.progress.advance
 
-        for chunk in img.data():
-            image_file.write(chunk)
+    def download_image(self, image, space):
+        file_path = space.file("source.img")
 
-        return full_file_path
+        on_progress = self._start_phase(progress.Phase.DOWNLOADING,
+                                        image.size)
+        downloader = download.RangeDownloader(self.osc, image, file_path,
+                                              space, on_progress)
+        if downloader.supports_ranges():
+            downloader.download()
+        else:
+            download.download_sequential(self.glance, image, file_path,
+                                         space, on_progress)
 
-    def convert_image(self, image_file_path, new_format):
+        return file_path
+
+    def convert_image(self, image_file_path, new_format, extra_args=()):
         path_obj = Path(image_file_path)
         new_image_path = path_obj.parent / f"{path_obj.name}.{new_format}"
-        subprocess.check_output(["qemu-img", "convert", "-O", new_format, image_file_path, new_image_path])
+        extra_args = list(extra_args) + sparse.qemu_img_args()
+        on_progress = self._start_phase(progress.Phase.CONVERTING, 100)
+        scheduler.get_scheduler().execute(
+            utils.qemu_img_convert_cmd(image_file_path, new_image_path,
+                                       new_format, extra_args=extra_args,
+                                       progress=on_progress is not None),
+            on_progress=on_progress)
+        return new_image_path
+
+    def stream_convert_image(self, image, new_format, space, extra_args=()):
+        """Convert ``image`` while it is being downloaded.
+
+        The target is named like the one produced by
+        :py:meth:`convert_image` so both paths are interchangeable.
+        """
+        new_image_path = space.file(f"source.img.{new_format}")
+        converter = pipeline.StreamingConverter(self.osc)
+        # NOTE: the download happens while qemu-img runs, so the whole
+        # transfer is reported as the conversion.
+        on_progress = self._start_phase(progress.Phase.CONVERTING, 100)
+        return converter.convert(image, new_image_path, new_format,
+                                 extra_args, on_progress)
+
+    def upload_image(self, task, new_image_path):
+        """Publish a converted image to Glance and return its ID."""
+        source_image = self.glance.images.get(task.image_id)
+        uploader = upload.ImageUploader(self.osc)
+        on_progress = self._start_phase(progress.Phase.UPLOADING,
+                                        os.path.getsize(new_image_path))
+        return uploader.upload(task, source_image, new_image_path,
+                               on_progress)
+
+    def publish_image(self, task, new_image_path, cache_key=None):
+        """Return the ID of the Glance image of a converted image.
+
+        An image served from the converted image cache is not uploaded
+        again while the image it was first published as is still active.
+
+        :param cache_key: the key of the image in the cache, if it is there.
+        """
+        image_cache = cache.get_cache()
+        if image_cache and cache_key:
+            new_image_id = image_cache.published_image(cache_key)
+            if new_image_id and self._is_active(new_image_id):
+                LOG.info("Task %(task)s reuses the published image "
+                         "%(image)s", {'task': task.uuid,
+                                       'image': new_image_id})
+                return new_image_id
+        new_image_id = self.upload_image(task, new_image_path)
+        if image_cache and cache_key:
+            image_cache.set_published_image(cache_key, new_image_id)
+        return new_image_id
+
+    def _is_active(self, image_id):
+        try:
+            return self.glance.images.get(image_id).status == 'active'
+        except glance_exc.HTTPNotFound:
+            return False
+
+    def conversion_options(self, task):
+        """qemu-img options that change the output of a conversion."""
+        profile = profiles.for_task(task)
+        if profile is None:
+            return ()
+        return tuple(profile.output_args())
+
+    def conversion_args(self, task):
+        """All the qemu-img options a task is converted with."""
+        profile = profiles.for_task(task)
+        if profile is None:
+            return []
+        return profile.args()
+
+    def _convert(self, image, new_format, space, extra_args=()):
+        if (CONF.convertor_worker.pipeline_mode and
+                pipeline.StreamingConverter.supports(image)):
+            try:
+                return self.stream_convert_image(image, new_format, space,
+                                                 extra_args)
+            except processutils.ProcessExecutionError as e:
+                LOG.warning("Streaming conversion of image %(image)s "
+                            "failed, falling back to a staged "
+                            "download: %(error)s",
+                            {'image': image.id, 'error': e.stderr})
+
+        image_file_path = self.download_image(image, space)
+        return self.convert_image(image_file_path, new_format, extra_args)
+
+    def _execute(self, task):
+        """Convert the image of a task, unless it is in the cache.
+
+        :returns: the path of the converted image, and its key in the
+                  converted image cache, or None if it is not cached.
+        """
+        image_cache = cache.get_cache()
+        options = self.conversion_options(task)
+        if image_cache:
+            # Fast path: the image was already converted on this host, no
+            # need to ask Glance for anything.
+            key = image_cache.image_key(task.image_id, task.new_format,
+                                        options)
+            cached = key and image_cache.lookup(key)
+            if cached:
+                LOG.info("Task %(task)s served from the converted image "
+                         "cache", {'task': task.uuid})
+                return cached, key
+
+        image = self.glance.images.get(task.image_id)
+        content_hash = cache.image_hash(image)
+        key = None
+        if image_cache and content_hash:
+            key = image_cache.make_key(content_hash, task.new_format,
+                                       options)
+            cached = image_cache.lookup(key)
+            if cached:
+                # Same data already converted for another image ID.
+                image_cache.add_alias(image.id, content_hash)
+                return cached, key
+
+        space = self.reserve_scratch(image, task.new_format, options)
+        new_image_path = _CONVERSIONS.do(
+            (image.id, task.new_format, options),
+            self._convert, image, task.new_format, space,
+            self.conversion_args(task))
+
+        if key is not None and image_cache.store(
+                key, new_image_path, image_id=image.id,
+                content_hash=content_hash) is None:
+            key = None
+        return new_image_path, key
+
+    def measure_image(self, new_image_path):
+        """Return the sizes to record for a converted image."""
+        try:
+            virtual_size, allocated_size = sparse.measure(new_image_path)
+        except (processutils.ProcessExecutionError, ValueError) as e:
+            LOG.warning("Cannot measure image %(path)s: %(error)s",
+                        {'path': new_image_path, 'error': e})
+            return {}
+        return {'virtual_size': virtual_size,
+                'allocated_size': allocated_size}
+
+    def _set_status(self, task, status, **values):
+        """Set the status of a task and of the tasks coalesced into it.
+
+        :param values: other fields to set on the task and its followers.
+        """
+        task.status = status
+        for field, value in values.items():
+            setattr(task, field, value)
+        task.save()
+        # NOTE: the leader is saved first, see TasksController.post.
+        objects.Task.update_followers(self.context, task.uuid, status,
+                                      **values)
+
+    def _timings(self):
+        """Where the time of the task went so far, in seconds."""
+        timings = {'queue_wait': self._queue_wait}
+        for phase, seconds in self.progress.durations.items():
+            timings[_TIMED_PHASES[phase]] = seconds
+        return timings
+
+    def run(self, task):
+        """Run a task this worker has claimed."""
+        LOG.debug("Executing task %s", task.uuid)
+        # NOTE: claiming the task marked it in progress, not its followers.
+        objects.Task.update_followers(self.context, task.uuid,
+                                      objects.task.Status.INPROGRESS)
+
+        self._queue_wait = None
+        if task.created_at:
+            self._queue_wait = max(timeutils.delta_seconds(
+                task.created_at, timeutils.utcnow(with_timezone=True)), 0)
+        self.progress = progress.TaskProgress(task.uuid)
+        task_notifications.send_action(
+            self.context, task, wfields.NotificationPhase.START,
+            timings=self._timings())
+        try:
+            new_image_path, cache_key = self._execute(task)
+            values = self.measure_image(new_image_path)
+            if CONF.convertor_worker.upload_images:
+                values['new_image_id'] = self.publish_image(
+                    task, new_image_path, cache_key)
+        except Exception as e:
+            with excutils.save_and_reraise_exception():
+                self.progress.finish()
+                self._set_status(task, objects.task.Status.ERROR, eta=None)
+                task_notifications.send_action(
+                    self.context, task, wfields.NotificationPhase.ERROR,
+                    timings=self._timings(), fault=e)
+        finally:
+            self.release_scratch()
+
+        # NOTE: pending updates of a finished task would be skipped by the
+        # reporter anyway, dropping them saves a write.
+        self.progress.finish()
+        self._set_status(task, objects.task.Status.COMPLETED, phase=None,
+                         eta=None, **values)
+        task_notifications.send_action(
+            self.context, task, wfields.NotificationPhase.END,
+            timings=self._timings())
+        return new_image_path
 
     def execute(self, task_uuid):
-        LOG.debug("Executing task ", task_uuid)
-        task = objects.Task.get(self.context, task_uuid)
-        image_file_path = self.download_image(task.image_id)
-        self.convert_image(image_file_path, task.new_format)
+        task = objects.Task.claim_by_uuid(
+            self.context, task_uuid, utils.worker_id(),
+            CONF.convertor_worker.lease_duration)
+        if task is None:
+            LOG.debug("Task %s is finished or run by another worker",
+                      task_uuid)
+            return None
+        return self.run(task)
@@ -0,0 +1,257 @@
+"""Parallel, resumable and verified image download from Glance.
+
+The image is split into fixed-size byte ranges that are fetched over
+several connections at once and written with positioned writes into a
+sparse file preallocated to the image size. Completed ranges are recorded
+in a journal next to the file so that a failed task resumes where it
+stopped. The Glance checksums are computed while the data arrives, over
+the contiguous prefix of the file that is already complete. Chunks of
+zeros are not written, so they stay holes of the sparse file. The data is
+written by a :py:class:`~.BulkWriter`, which keeps it out of the page
+cache.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import futurist
+from oslo_config import cfg
+from oslo_log import log
+
+from convertor.common import exception
+from convertor.worker import utils
+from convertor.worker import writer
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+_KiB = 1024
+_MiB = 1024 * _KiB
+
+
+class ChecksumVerifier(object):
+    """Incrementally hash an image file as its ranges complete."""
+
+    def __init__(self, image):
+        self.image_id = image.id
+        self.expected = {}
+        self.hashers = {}
+        if getattr(image, 'checksum', None):
+            self.expected['md5'] = image.checksum
+        algo = getattr(image, 'os_hash_algo', None)
+        if algo and getattr(image, 'os_hash_value', None):
+            self.expected[algo] = image.os_hash_value
+        for algo in self.expected:
+            self.hashers[algo] = hashlib.new(algo)
+        self.offset = 0
+
+    def update(self, data):
+        for hasher in self.hashers.values():
+            hasher.update(data)
+        self.offset += len(data)
+
+    def advance(self, fd, end):
+        """Hash the file from the current offset up to ``end``."""
+        start = self.offset
+        while self.hashers and self.offset < end:
+            data = os.pread(fd, min(end - self.offset, 4 * _MiB),
+                            self.offset)
+            if not data:
+                break
+            self.update(data)
+        if CONF.convertor_worker.download_io_mode != writer.BUFFERED:
+            writer.drop_cache(fd, start, self.offset - start)
+
+    def verify(self):
+        """:raises: :py:class:`~.ImageChecksumMismatch`"""
+        for algo, expected in self.expected.items():
+            if self.hashers[algo].hexdigest() != expected:
+                raise exception.ImageChecksumMismatch(
+                    image=self.image_id, algorithm=algo)
+
+
+class RangeDownloader(object):
+    """Download a Glance image with parallel range requests."""
+
+    def __init__(self, osc, image, path, space=None, on_progress=None):
+        """:param osc: an OpenStackClients instance
+        :param image: the Glance image to download.
+        :param path: the file the image is written to.
+        :param space: the :py:class:`~.ScratchSpace` holding ``path``.
+        :param on_progress: called with the number of bytes received each
+                            time a chunk arrives.
+        """
+        self.osc = osc
+        self.image = image
+        self.path = str(path)
+        self.space = space
+        self.on_progress = on_progress
+        self.journal_path = '%s.ranges' % self.path
+        self.url = utils.glance_image_url(osc, image.id)
+        self.range_size = CONF.convertor_worker.download_range_size * _MiB
+        self.chunk_size = CONF.convertor_worker.download_chunk_size * _KiB
+        self._lock = threading.Lock()
+        self._completed = set()
+
+    def _ranges(self):
+        size = self.image.size
+        return [(index, start, min(start + self.range_size, size) - 1)
+                for index, start in enumerate(
+                    range(0, size, self.range_size))]
+
+    def supports_ranges(self):
+        """Whether the image backend honours HTTP range requests."""
+        if not self.image.size:
+            return False
+        resp = self.osc.session.get(self.url, headers={'Range': 'bytes=0-0'},
+                                    stream=True, raise_exc=False)
+        try:
+            return resp.status_code == 206
+        finally:
+            resp.close()
+
+    def _load_journal(self):
+        try:
+            with open(self.journal_path) as journal:
+                state = json.load(journal)
+        except (IOError, ValueError):
+            return set()
+        if (state.get('image_id') != self.image.id or
+                state.get('size') != self.image.size or
+                state.get('range_size') != self.range_size or
+                not os.path.exists(self.path)):
+            return set()
+        return set(state.get('completed', []))
+
+    def _save_journal(self):
+        state = {'image_id': self.image.id,
+                 'size': self.image.size,
+                 'range_size': self.range_size,
+                 'completed': sorted(self._completed)}
+        tmp_path = '%s.tmp' % self.journal_path
+        with open(tmp_path, 'w') as journal:
+            json.dump(state, journal)
+        os.replace(tmp_path, self.journal_path)
+
+    def _fetch_range(self, fd, direct_fd, index, start, end):
+        resp = self.osc.session.get(
+            self.url, headers={'Range': 'bytes=%d-%d' % (start, end)},
+            stream=True)
+        try:
+            with writer.BulkWriter(fd, start, direct_fd) as range_writer:
+                for chunk in resp.iter_content(chunk_size=self.chunk_size):
+                    range_writer.write(chunk)
+                    if self.on_progress is not None:
+                        self.on_progress(len(chunk))
+            offset = range_writer.position
+        finally:
+            resp.close()
+        if offset != end + 1:
+            raise IOError("Short read on range %d-%d of image %s" %
+                          (start, end, self.image.id))
+        with self._lock:
+            self._completed.add(index)
+            self._save_journal()
+
+    def _contiguous_end(self, ranges):
+        end = 0
+        for index, _start, range_end in ranges:
+            if index not in self._completed:
+                break
+            end = range_end + 1
+        return end
+
+    def download(self):
+        """Download the image, resuming a previous attempt if possible.
+
+        :returns: the path of the downloaded file.
+        :raises: :py:class:`~.ImageChecksumMismatch`
+        """
+        ranges = self._ranges()
+        self._completed = self._load_journal()
+        if self._completed:
+            LOG.info("Resuming download of image %(image)s, %(done)d of "
+                     "%(total)d ranges already completed",
+                     {'image': self.image.id, 'done': len(self._completed),
+                      'total': len(ranges)})
+
+        verifier = ChecksumVerifier(self.image)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if not self._completed:
+                # Zero chunks are skipped, so a stale file must not leave
+                # its data where they belong.
+                os.ftruncate(fd, 0)
+            # Truncating to the final size makes a sparse file, so ranges
+            # can land anywhere without allocating the gaps.
+            os.ftruncate(fd, self.image.size)
+            if self.space is not None:
+                self.space.preallocate(fd, self.image.size)
+            verifier.advance(fd, self._contiguous_end(ranges))
+            if self.on_progress is not None:
+                self.on_progress(sum(end - start + 1
+                                     for index, start, end in ranges
+                                     if index in self._completed))
+
+            pending = [r for r in ranges if r[0] not in self._completed]
+            direct_fd = writer.open_direct(self.path)
+            executor = futurist.GreenThreadPoolExecutor(
+                max_workers=CONF.convertor_worker.download_concurrency)
+            try:
+                futures = [executor.submit(self._fetch_range, fd, direct_fd,
+                                           *r)
+                           for r in pending]
+                for future in futures:
+                    future.result()
+                    verifier.advance(fd, self._contiguous_end(ranges))
+            finally:
+                executor.shutdown(wait=True)
+                if direct_fd is not None:
+                    os.close(direct_fd)
+
+            verifier.advance(fd, self.image.size)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        try:
+            verifier.verify()
+        except exception.ImageChecksumMismatch:
+            # Corrupted data must not be resumed from.
+            os.unlink(self.path)
+            raise
+        finally:
+            if os.path.exists(self.journal_path):
+                os.unlink(self.journal_path)
+        return self.path
+
+
+def download_sequential(glance, image, path, space=None, on_progress=None):
+    """Download an image over a single stream, verifying it on the fly.
+
+    Used when the image backend does not support range requests.
+    """
+    verifier = ChecksumVerifier(image)
+    fd = os.open(str(path), os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if space is not None:
+            space.preallocate(fd, image.size)
+        direct_fd = writer.open_direct(path)
+        try:
+            with writer.BulkWriter(fd, 0, direct_fd) as image_writer:
+                for chunk in glance.images.data(image.id):
+                    image_writer.write(chunk)
+                    verifier.update(chunk)
+                    if on_progress is not None:
+                        on_progress(len(chunk))
+        finally:
+            if direct_fd is not None:
+                os.close(direct_fd)
+        # Skipped zeros at the end do not extend the file by themselves.
+        os.ftruncate(fd, image_writer.position)
+    finally:
+        os.close(fd)
+    verifier.verify()
+    return path
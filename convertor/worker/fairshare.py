@@ -0,0 +1,100 @@
+"""Weighted fair queuing of the pending tasks across projects.
+
+The task table is the queue: pending tasks stay in the database until a
+worker claims them, so the queue survives restarts and is shared by all
+the workers. Under the ``fair`` scheduling policy a worker does not claim
+the oldest tasks but picks them with weighted fair queuing: each project
+gets a share of the running tasks proportional to its weight, whatever
+the number of tasks it has waiting, and a project at its concurrency limit
+gets no more until some of its tasks finish. Within a project the tasks of
+highest priority go first, then the oldest.
+
+Each project starts from the tasks it already runs, so a project which
+floods the service with tasks cannot delay the few tasks of another one by
+more than a scheduling round.
+"""
+
+import heapq
+
+from oslo_config import cfg
+
+from convertor import objects
+
+CONF = cfg.CONF
+
+
+def project_weight(project_id):
+    weight = CONF.convertor_worker.project_weights.get(project_id)
+    if weight is None:
+        return CONF.convertor_worker.default_project_weight
+    return max(float(weight), 0.001)
+
+
+def project_limit(project_id):
+    """The maximum number of running tasks of a project, or None."""
+    limit = CONF.convertor_worker.project_max_tasks.get(project_id)
+    if limit is None:
+        limit = CONF.convertor_worker.max_tasks_per_project
+    return int(limit) or None
+
+
+def select(candidates, running, limit):
+    """Pick the next tasks to run.
+
+    :param candidates: dicts holding the ``id``, ``project_id`` and
+                       ``priority`` of the claimable tasks, each project's
+                       in the order they should run.
+    :param running: a dict mapping project IDs to the number of tasks they
+                    run.
+    :param limit: maximum number of tasks to pick.
+    :returns: the IDs of the picked tasks.
+    """
+    queues = {}
+    for candidate in candidates:
+        queues.setdefault(candidate['project_id'], []).append(candidate)
+
+    # Every project is a flow whose virtual finish time advances by
+    # 1 / weight for each task it runs.
+    heap = []
+    for project_id, queue in queues.items():
+        weight = project_weight(project_id)
+        finish = running.get(project_id, 0) / weight
+        head = queue[0]
+        heapq.heappush(heap, (finish, -head['priority'], head['id'],
+                              project_id))
+
+    picked = []
+    positions = dict.fromkeys(queues, 0)
+    scheduled = dict(running)
+    while heap and len(picked) < limit:
+        finish, _priority, task_id, project_id = heapq.heappop(heap)
+        max_tasks = project_limit(project_id)
+        if (max_tasks is not None and
+                scheduled.get(project_id, 0) >= max_tasks):
+            continue
+        picked.append(task_id)
+        scheduled[project_id] = scheduled.get(project_id, 0) + 1
+        positions[project_id] += 1
+        queue = queues[project_id]
+        if positions[project_id] < len(queue):
+            head = queue[positions[project_id]]
+            heapq.heappush(heap, (finish + 1 / project_weight(project_id),
+                                  -head['priority'], head['id'],
+                                  project_id))
+    return picked
+
+
+def claim(context, worker, limit, lease_duration):
+    """Claim up to ``limit`` tasks in weighted fair order.
+
+    :returns: a list of the claimed :class:`~.Task` objects.
+    """
+    candidates = objects.Task.get_claim_candidates(context, limit)
+    if not candidates:
+        return []
+    task_ids = select(candidates,
+                      objects.Task.count_running(context), limit)
+    if not task_ids:
+        return []
+    return objects.Task.claim(context, worker, limit, lease_duration,
+                              task_ids=task_ids)
@@ -1,9 +1,15 @@
+import time
+
 import futurist
 
 from oslo_config import cfg
 from oslo_log import log
 
-from convertor.worker.task import default
+from convertor.common import metrics
+from convertor.worker import default
+from convertor.worker import fairshare
+from convertor.worker import utils
+from convertor import objects
 
 LOG = log.getLogger(__name__)
 CONF = cfg.CONF
@@ -14,17 +20,80 @@ class TriggerTask(object):
         self.worker_manager = worker_manager
         workers = CONF.convertor_worker.workers
         self.executor = futurist.GreenThreadPoolExecutor(max_workers=workers)
+        # Tasks submitted to the executor, queued or running.
+        self._tasks = set()
 
-    def do_launch_task(self, context, task_uuid):
+    def do_launch_task(self, context, task_uuid, task=None):
         try:
-            cmd = default.DefaultTaskHandler(context, self.worker_manager, task_uuid)
-            cmd.execute()
+            cmd = default.DefaultWorker(context, self.worker_manager)
+            if task is None:
+                cmd.execute(task_uuid)
+            else:
+                cmd.run(task)
         except Exception as e:
             LOG.exception(e)
+        finally:
+            self._tasks.discard(task_uuid)
+
+    def _submit(self, context, task_uuid, task=None):
+        self._tasks.add(task_uuid)
+        self.executor.submit(self.do_launch_task, context,
+                             task_uuid, task)
+
+    @staticmethod
+    def _observe_queue_time(method, sent_at):
+        # NOTE: the clocks of the API and worker hosts are assumed to be
+        # in sync.
+        if sent_at is not None:
+            metrics.RPC_QUEUE_SECONDS.labels(method).observe(
+                max(time.time() - sent_at, 0))
+
+    @staticmethod
+    def _fair():
+        return CONF.convertor_worker.scheduling_policy == 'fair'
 
-    def launch_action_plan(self, context, task_uuid):
+    def launch_task(self, context, task_uuid, sent_at=None):
         LOG.debug("Trigger Task %s", task_uuid)
+        self._observe_queue_time('launch_task', sent_at)
+        if self._fair():
+            # The announced task waits for its turn in the database.
+            self.claim_tasks(context)
+            return task_uuid
         # submit
-        self.executor.submit(self.do_launch_task, context,
-                             task_uuid)
+        self._submit(context, task_uuid)
         return task_uuid
+
+    def launch_tasks(self, context, task_uuids, sent_at=None):
+        LOG.debug("Trigger Tasks %s", ', '.join(task_uuids))
+        self._observe_queue_time('launch_tasks', sent_at)
+        if self._fair():
+            self.claim_tasks(context)
+            return task_uuids
+        for task_uuid in task_uuids:
+            self._submit(context, task_uuid)
+        return task_uuids
+
+    def claim_tasks(self, context):
+        """Claim as many tasks as this worker can start, and run them."""
+        idle = CONF.convertor_worker.workers - len(self._tasks)
+        if idle <= 0:
+            return []
+        limit = min(idle, CONF.convertor_worker.claim_batch_size)
+        if self._fair():
+            tasks = fairshare.claim(context, utils.worker_id(), limit,
+                                    CONF.convertor_worker.lease_duration)
+        else:
+            tasks = objects.Task.claim(context, utils.worker_id(), limit,
+                                       CONF.convertor_worker.lease_duration)
+        for task in tasks:
+            LOG.debug("Claimed Task %s", task.uuid)
+            self._submit(context, task.uuid, task)
+        return tasks
+
+    def renew_leases(self, context):
+        """Extend the leases of the tasks this worker runs."""
+        if not self._tasks:
+            return 0
+        return objects.Task.renew_leases(
+            context, utils.worker_id(), sorted(self._tasks),
+            CONF.convertor_worker.lease_duration)
@@ -0,0 +1,99 @@
+"""Streaming download-and-convert pipeline.
+
+Instead of staging the whole source image on disk before qemu-img starts,
+the image is exposed as a local NBD endpoint by nbdkit's curl plugin. The
+plugin fetches byte ranges from Glance on demand while qemu-img reads them,
+so the transfer and the conversion overlap and the source image never
+touches the scratch disk.
+"""
+
+import os
+import shlex
+import shutil
+import tempfile
+
+from oslo_config import cfg
+from oslo_log import log
+
+from convertor.worker import scheduler
+from convertor.worker import sparse
+from convertor.worker import utils
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+_TOKEN_ENV = 'CONVERTOR_AUTH_TOKEN'
+
+
+class StreamingConverter(object):
+    """Convert a Glance image through a local NBD endpoint."""
+
+    SUPPORTED_SOURCE_FORMATS = ('raw', 'qcow2')
+
+    def __init__(self, osc):
+        """:param osc: an OpenStackClients instance"""
+        self.osc = osc
+
+    @classmethod
+    def supports(cls, image):
+        """Whether ``image`` can be converted without staging it first."""
+        if getattr(image, 'container_format', 'bare') != 'bare':
+            return False
+        if getattr(image, 'disk_format', None) not in \
+                cls.SUPPORTED_SOURCE_FORMATS:
+            return False
+        return shutil.which(CONF.convertor_worker.nbdkit_path) is not None
+
+    def build_command(self, image, socket_path, target_path, new_format,
+                      extra_args=(), progress=False):
+        # NOTE: qemu-img only keeps ``-m`` requests in flight against the
+        # endpoint, which together with the readahead window bounds the
+        # amount of image data buffered in memory. It comes after the
+        # options of the profile so that it takes precedence.
+        extra_args = list(extra_args)
+        extra_args += ['-m', str(CONF.convertor_worker.pipeline_max_requests)]
+        extra_args += sparse.qemu_img_args()
+        convert_cmd = utils.qemu_img_convert_cmd(
+            'nbd+unix:///?socket=%s' % socket_path, target_path, new_format,
+            source_format=image.disk_format, extra_args=extra_args,
+            progress=progress)
+        # The token is read from the environment by the header script so
+        # that it never shows up in the process list.
+        header_script = 'printf "X-Auth-Token: %%s\\n" "$%s"' % _TOKEN_ENV
+        return [
+            CONF.convertor_worker.nbdkit_path,
+            '--exit-with-parent',
+            '--unix', str(socket_path),
+            '--filter=readahead',
+            '--run', ' '.join(shlex.quote(arg) for arg in convert_cmd),
+            'curl',
+            'url=%s' % utils.glance_image_url(self.osc, image.id),
+            'header-script=%s' % header_script,
+        ]
+
+    def convert(self, image, target_path, new_format, extra_args=(),
+                on_progress=None):
+        """Convert ``image`` into ``target_path`` while it is downloaded.
+
+        :param extra_args: additional qemu-img convert options.
+        :param on_progress: called with the completion percentage of the
+                            conversion.
+
+        :raises: :py:class:`~.ProcessExecutionError` if nbdkit or
+                 qemu-img fail, e.g. when Glance does not honour range
+                 requests for this image.
+        """
+        env = dict(os.environ)
+        env[_TOKEN_ENV] = self.osc.session.get_token()
+        socket_dir = tempfile.mkdtemp(dir=os.path.dirname(target_path))
+        try:
+            cmd = self.build_command(image,
+                                     os.path.join(socket_dir, 'nbd.sock'),
+                                     target_path, new_format, extra_args,
+                                     progress=on_progress is not None)
+            LOG.debug("Streaming image %s into qemu-img", image.id)
+            scheduler.get_scheduler().execute(cmd, env=env,
+                                              on_progress=on_progress)
+        finally:
+            shutil.rmtree(socket_dir, ignore_errors=True)
+        return target_path
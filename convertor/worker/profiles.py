@@ -0,0 +1,107 @@
+"""qemu-img performance profiles.
+
+A profile is a named set of qemu-img convert settings: parallel
+coroutines, out-of-order writes, cache modes and compression. The names
+tasks can select are listed in ``[convertor_worker]profiles`` and the
+settings of each profile are read from its ``[convertor_profile_<name>]``
+group, whose defaults come from the built-in preset of the same name, if
+any.
+"""
+
+from oslo_config import cfg
+
+from convertor.common import exception
+from convertor.conf import worker as worker_conf
+
+CONF = cfg.CONF
+
+COMPRESSIBLE_FORMATS = ('qcow2',)
+
+
+class Profile(object):
+    """The qemu-img settings of a named profile."""
+
+    def __init__(self, name):
+        self.name = name
+        self.conf = worker_conf.register_profile_opts(CONF, name)
+
+    def validate(self, new_format):
+        """Check the profile can produce images in ``new_format``.
+
+        :raises: :py:class:`~.InvalidProfile`
+        """
+        if self.conf.formats and new_format not in self.conf.formats:
+            raise exception.InvalidProfile(
+                profile=self.name,
+                reason="it only applies to %s" % ', '.join(self.conf.formats))
+        compressed = self.conf.compress or self.conf.compression_type
+        if compressed and new_format not in COMPRESSIBLE_FORMATS:
+            raise exception.InvalidProfile(
+                profile=self.name,
+                reason="%s images cannot be compressed" % new_format)
+        if self.conf.compress and self.conf.out_of_order:
+            raise exception.InvalidProfile(
+                profile=self.name,
+                reason="out-of-order writes cannot be compressed")
+
+    def performance_args(self):
+        """Options which only change how fast the conversion runs."""
+        args = []
+        if self.conf.coroutines:
+            args += ['-m', str(self.conf.coroutines)]
+        if self.conf.out_of_order:
+            args.append('-W')
+        if self.conf.source_cache:
+            args += ['-T', self.conf.source_cache]
+        if self.conf.target_cache:
+            args += ['-t', self.conf.target_cache]
+        return args
+
+    def output_args(self):
+        """Options which change the converted image."""
+        args = []
+        if self.conf.compress:
+            args.append('-c')
+        if self.conf.compression_type:
+            args += ['-o', 'compression_type=%s' % self.conf.compression_type]
+        return args
+
+    def args(self):
+        return self.performance_args() + self.output_args()
+
+
+def get_profile(name):
+    """Return the profile called ``name``.
+
+    :raises: :py:class:`~.InvalidProfile` if it is not enabled.
+    """
+    if name not in CONF.convertor_worker.profiles:
+        raise exception.InvalidProfile(profile=name,
+                                       reason="no such profile")
+    return Profile(name)
+
+
+def validate(name, new_format):
+    """Check a task can convert to ``new_format`` with profile ``name``.
+
+    :raises: :py:class:`~.InvalidProfile`
+    """
+    get_profile(name).validate(new_format)
+
+
+def for_task(task):
+    """Return the profile a task is converted with, or None.
+
+    Tasks which did not select a profile use the default profile, unless
+    it does not apply to their target format.
+    """
+    if task.profile:
+        profile = get_profile(task.profile)
+        profile.validate(task.new_format)
+        return profile
+    try:
+        profile = get_profile(CONF.convertor_worker.default_profile)
+        profile.validate(task.new_format)
+    except exception.InvalidProfile:
+        return None
+    return profile
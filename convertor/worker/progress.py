@@ -0,0 +1,167 @@
+"""Progress reporting of the running tasks.
+
+Each running task records the phase it is in (downloading, converting or
+uploading), its byte counters, the qemu-img completion percentage and the
+estimated end of the current phase. Updates are not written to the
+database as they happen: the reporter of the worker process only keeps the
+latest values of each task and writes all of them at once, in a single
+transaction, every ``[convertor_worker]progress_interval`` seconds. The
+database sees at most one write per task per interval, however fast the
+counters move and however many tasks run. The same values are sent as
+``task.progress`` notifications.
+
+The time spent in each phase is recorded too, for the notifications sent
+when the task ends.
+"""
+
+import datetime
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+from oslo_utils import timeutils
+
+from convertor.common import context as convertor_context
+from convertor.common import metrics
+from convertor.notifications import task as task_notifications
+from convertor import objects
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+_REPORTER = None
+_REPORTER_LOCK = threading.Lock()
+
+
+class Phase(object):
+    DOWNLOADING = 'DOWNLOADING'
+    CONVERTING = 'CONVERTING'
+    UPLOADING = 'UPLOADING'
+
+
+class ProgressReporter(object):
+    """Coalesce the progress of tasks and write it periodically."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.context = convertor_context.make_context(is_admin=True)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def report(self, task_uuid, **values):
+        """Record new progress values for a task, to be written later."""
+        with self._lock:
+            self._pending.setdefault(task_uuid, {}).update(values)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='progress-reporter',
+                                                daemon=True)
+                self._thread.start()
+
+    def discard(self, task_uuid):
+        """Forget the pending values of a finished task."""
+        with self._lock:
+            self._pending.pop(task_uuid, None)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            objects.Task.update_progress(self.context, pending)
+        except Exception:
+            LOG.exception("Failed to record the progress of %d tasks",
+                          len(pending))
+        for task_uuid, values in pending.items():
+            task_notifications.send_progress(self.context, task_uuid,
+                                             values)
+
+    def _run(self):
+        while not self._wakeup.wait(self.interval):
+            self.flush()
+
+
+class TaskProgress(object):
+    """Track the progress of the phases of a task."""
+
+    def __init__(self, task_uuid, reporter=None):
+        self.task_uuid = task_uuid
+        self.reporter = reporter or get_reporter()
+        self.phase = None
+        self.total = None
+        self.done = 0
+        self.durations = {}
+        self._started_at = None
+        self._lock = threading.Lock()
+
+    def _end_phase(self):
+        if self.phase is None:
+            return
+        elapsed = time.monotonic() - self._started_at
+        self.durations[self.phase] = (self.durations.get(self.phase, 0) +
+                                      elapsed)
+        metrics.TASK_PHASE_SECONDS.labels(self.phase).observe(elapsed)
+        self.phase = None
+
+    def start_phase(self, phase, total=None):
+        """Enter a new phase.
+
+        :param phase: one of the :py:class:`Phase` values.
+        :param total: the amount of work of the phase, e.g. the number of
+                      bytes to download, if known.
+        """
+        self._end_phase()
+        self.phase = phase
+        self.total = total
+        self.done = 0
+        self._started_at = time.monotonic()
+        self.reporter.report(self.task_uuid, phase=phase, eta=None)
+
+    def _eta(self):
+        if not self.total or not self.done:
+            return None
+        elapsed = time.monotonic() - self._started_at
+        remaining = elapsed * (self.total - self.done) / self.done
+        return timeutils.utcnow() + datetime.timedelta(seconds=remaining)
+
+    def _counter(self):
+        if self.phase == Phase.DOWNLOADING:
+            return 'bytes_downloaded'
+        if self.phase == Phase.UPLOADING:
+            return 'bytes_uploaded'
+        return 'conversion_progress'
+
+    def update(self, done):
+        """Set the amount of work done in the current phase."""
+        self.done = done
+        self.reporter.report(self.task_uuid, eta=self._eta(),
+                             **{self._counter(): int(done)})
+
+    def advance(self, amount):
+        """Add ``amount`` to the work done in the current phase."""
+        with self._lock:
+            self.update(self.done + amount)
+
+    def finish(self):
+        """Drop the updates not written yet, the task is over.
+
+        :returns: the seconds spent in each phase.
+        """
+        self._end_phase()
+        self.reporter.discard(self.task_uuid)
+        return self.durations
+
+
+def get_reporter():
+    """Return the progress reporter shared by the worker process."""
+    global _REPORTER
+    if _REPORTER is None:
+        with _REPORTER_LOCK:
+            if _REPORTER is None:
+                _REPORTER = ProgressReporter(
+                    CONF.convertor_worker.progress_interval)
+    return _REPORTER
@@ -1,3 +1,5 @@
+import time
+
 from convertor.common import exception
 from convertor.common import service
 from convertor.common import service_manager
@@ -15,7 +17,16 @@ class WorkerAPI(service.Service):
 
     def launch_task(self, context, task_uuid=None):
         self.conductor_client.cast(
-            context, 'launch_task', task_uuid=task_uuid)
+            context, 'launch_task', task_uuid=task_uuid, sent_at=time.time())
+
+    def launch_tasks(self, context, task_uuids):
+        """Launch several tasks with as few messages as possible."""
+        size = CONF.api.batch_cast_size
+        for start in range(0, len(task_uuids), size):
+            self.conductor_client.cast(
+                context, 'launch_tasks',
+                task_uuids=task_uuids[start:start + size],
+                sent_at=time.time())
 
 
 class WorkerAPIManager(service_manager.ServiceManager):
@@ -0,0 +1,182 @@
+"""Conversion scheduler with per-host admission control.
+
+qemu-img conversions are CPU and disk heavy, so they are not started as
+soon as a task arrives. Each conversion first asks the scheduler for a
+share of the host (CPU cores and disk bandwidth) and waits until it can be
+admitted, then runs on a dedicated pool so that the RPC executor stays
+free to accept and download new tasks. Scratch disk space is reserved
+beforehand, see :py:mod:`convertor.worker.scratch`.
+"""
+
+import os
+import re
+import subprocess
+import threading
+
+import futurist
+from oslo_concurrency import processutils
+from oslo_config import cfg
+from oslo_log import log
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+# qemu-img -p rewrites a "    (12.34/100%)" line with carriage returns.
+_PROGRESS_RE = re.compile(r'\((\d+(?:\.\d+)?)/100%\)')
+
+_SCHEDULER = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+class ConversionJob(object):
+    """A qemu-img command and the resources it needs to run."""
+
+    def __init__(self, cmd, env=None, on_progress=None):
+        """:param cmd: the command line to execute.
+        :param env: extra environment variables for the command.
+        :param on_progress: called with the completion percentage printed
+                            by ``qemu-img convert -p``.
+        """
+        self.cmd = list(cmd)
+        self.env = env
+        self.on_progress = on_progress
+        self.cpus = CONF.convertor_worker.cpus_per_conversion
+        self.io_bandwidth = CONF.convertor_worker.io_bandwidth_per_conversion
+
+
+class ConversionScheduler(object):
+    """Run conversions on a dedicated pool once the host can take them."""
+
+    def __init__(self, max_workers=None):
+        self.max_workers = (max_workers or
+                            CONF.convertor_worker.conversion_workers or
+                            processutils.get_worker_count())
+        self.executor = futurist.ThreadPoolExecutor(
+            max_workers=self.max_workers)
+        self._admission = threading.Condition()
+        self._running = 0
+        self._cpus_in_use = 0
+        self._io_in_flight = 0
+
+    @staticmethod
+    def _total_cpus():
+        return max((os.cpu_count() or 1) -
+                   CONF.convertor_worker.reserved_cpus, 1)
+
+    def free_cpus(self):
+        return self._total_cpus() - self._cpus_in_use
+
+    def free_io_bandwidth(self):
+        max_io = CONF.convertor_worker.max_io_bandwidth
+        if not max_io:
+            return None
+        return max_io - self._io_in_flight
+
+    def _can_admit(self, job):
+        # NOTE: a job is always admitted on an idle host, otherwise one
+        # that asks for more than the host has would wait forever.
+        if not self._running:
+            return True
+        if self._running >= self.max_workers:
+            return False
+        if job.cpus > self.free_cpus():
+            return False
+        free_io = self.free_io_bandwidth()
+        if free_io is not None and job.io_bandwidth > free_io:
+            return False
+        return True
+
+    def _acquire(self, job):
+        with self._admission:
+            while not self._can_admit(job):
+                LOG.debug("Waiting for resources to run %s", job.cmd)
+                self._admission.wait()
+            self._running += 1
+            self._cpus_in_use += job.cpus
+            self._io_in_flight += job.io_bandwidth
+
+    def _release(self, job):
+        with self._admission:
+            self._running -= 1
+            self._cpus_in_use -= job.cpus
+            self._io_in_flight -= job.io_bandwidth
+            self._admission.notify_all()
+
+    @staticmethod
+    def _run_with_progress(job):
+        # NOTE: processutils only returns the output once the command
+        # exits, so the progress lines are read from the pipe directly.
+        process = subprocess.Popen(job.cmd, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, env=job.env)
+        # NOTE: stderr is drained meanwhile, a command filling the pipe
+        # would otherwise block before closing stdout.
+        errors = []
+        stderr_reader = threading.Thread(
+            target=lambda: errors.append(process.stderr.read()))
+        stderr_reader.daemon = True
+        stderr_reader.start()
+        output = []
+        line = b''
+        while True:
+            data = os.read(process.stdout.fileno(), 4096)
+            if not data:
+                break
+            output.append(data)
+            *lines, line = re.split(b'[\r\n]', line + data)
+            for progress in lines:
+                match = _PROGRESS_RE.search(progress.decode('utf-8',
+                                                            'replace'))
+                if match:
+                    job.on_progress(float(match.group(1)))
+        stderr_reader.join()
+        stdout = b''.join(output).decode('utf-8', 'replace')
+        if process.wait():
+            raise processutils.ProcessExecutionError(
+                stdout=stdout, stderr=b''.join(errors).decode('utf-8',
+                                                              'replace'),
+                exit_code=process.returncode, cmd=' '.join(job.cmd))
+        return stdout
+
+    @classmethod
+    def _run(cls, job):
+        if job.on_progress is not None:
+            return cls._run_with_progress(job)
+        # NOTE: processutils waits on the child cooperatively when eventlet
+        # is in use, so a running qemu-img never blocks the hub.
+        stdout, _stderr = processutils.execute(
+            *job.cmd, env_variables=job.env)
+        return stdout
+
+    def submit(self, job):
+        """Wait until ``job`` is admitted and start it.
+
+        :returns: a future holding the output of the command.
+        """
+        self._acquire(job)
+        try:
+            future = self.executor.submit(self._run, job)
+        except Exception:
+            self._release(job)
+            raise
+        future.add_done_callback(lambda fut: self._release(job))
+        return future
+
+    def execute(self, cmd, env=None, on_progress=None):
+        """Run ``cmd`` once admitted and return its output.
+
+        :raises: :py:class:`~.ProcessExecutionError`
+        """
+        return self.submit(ConversionJob(cmd, env, on_progress)).result()
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+def get_scheduler():
+    """Return the conversion scheduler shared by the worker process."""
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        with _SCHEDULER_LOCK:
+            if _SCHEDULER is None:
+                _SCHEDULER = ConversionScheduler()
+    return _SCHEDULER
@@ -0,0 +1,307 @@
+"""Scratch space management.
+
+Images are staged and converted in scratch directories, possibly on
+different devices. Each conversion gets its own directory, placed on the
+scratch directory with the most available space, and reserves the space
+it needs up front, from the sizes published by Glance. Conversions that
+do not fit wait for space to be released. The directory of a conversion
+is removed as soon as the last task using it finishes or fails.
+
+Several workers of a host may share the scratch directories. Each takes a
+slot, see :py:func:`~convertor.common.utils.claim_slot`, and names the
+directories of its conversions after it: workers never share a directory,
+and a restarted worker, taking over the slot of the one it replaces,
+resumes its downloads. The directories left behind are collected
+periodically, except those of the workers still running.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+from oslo_service import loopingcall
+from oslo_service import service
+
+from convertor.common import exception
+from convertor.common import utils
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+_MiB = 1024 * 1024
+
+_MANAGER = None
+_MANAGER_LOCK = threading.Lock()
+
+_FALLOC_FL_KEEP_SIZE = 0x01
+_FALLOCATE = None
+
+
+def _get_fallocate():
+    """Return the fallocate(2) of the C library, or False without one."""
+    global _FALLOCATE
+    if _FALLOCATE is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fallocate = getattr(libc, 'fallocate64', None) or libc.fallocate
+        except (OSError, AttributeError):
+            _FALLOCATE = False
+        else:
+            fallocate.argtypes = [ctypes.c_int, ctypes.c_int,
+                                  ctypes.c_int64, ctypes.c_int64]
+            fallocate.restype = ctypes.c_int
+            _FALLOCATE = fallocate
+    return _FALLOCATE
+
+
+def required_space(image):
+    """Scratch space needed to stage ``image`` and convert it."""
+    size = image.size or 0
+    return size + (getattr(image, 'virtual_size', None) or size)
+
+
+class ScratchSpace(object):
+    """The directory of a conversion and the space reserved for it."""
+
+    def __init__(self, volume, key, size, owner):
+        self.volume = volume
+        self.key = key
+        self.size = size
+        self.path = volume.path / self.dirname(key, owner)
+        self.preallocated = 0
+        self.refs = 1
+
+    @staticmethod
+    def dirname(key, owner):
+        """:param owner: the slot of the worker owning the directory."""
+        data = json.dumps(key, default=list)
+        return '%s-%d' % (
+            hashlib.sha256(data.encode('utf-8')).hexdigest()[:32], owner)
+
+    @staticmethod
+    def owner(dirname):
+        """:returns: the slot of the worker owning a directory, or None."""
+        _, sep, owner = dirname.rpartition('-')
+        return int(owner) if sep and owner.isdigit() else None
+
+    @property
+    def outstanding(self):
+        """Reserved space the filesystem does not account for yet."""
+        return max(self.size - self.preallocated, 0)
+
+    def file(self, name):
+        return self.path / name
+
+    def preallocate(self, fd, length):
+        """Allocate ``length`` bytes to ``fd`` within the reservation.
+
+        Nothing is allocated where the filesystem cannot do it natively:
+        unlike fallocate(2), posix_fallocate() then writes zeros, which
+        would fill the holes of the staged image.
+        """
+        if not CONF.convertor_worker.scratch_preallocate or not length:
+            return
+        fallocate = _get_fallocate()
+        if not fallocate:
+            return
+        if fallocate(fd, _FALLOC_FL_KEEP_SIZE, 0, length):
+            error = ctypes.get_errno()
+            if error not in (errno.EINVAL, errno.EOPNOTSUPP, errno.ENOSYS):
+                raise OSError(error, os.strerror(error))
+            LOG.debug("Cannot preallocate in %(path)s: %(error)s",
+                      {'path': self.path, 'error': os.strerror(error)})
+            return
+        self.preallocated = min(self.preallocated + length, self.size)
+
+
+class ScratchVolume(object):
+    """A scratch directory and the conversions placed in it."""
+
+    def __init__(self, path, quota):
+        self.path = Path(path)
+        self.quota = quota
+        self.spaces = {}
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def reserved(self):
+        return sum(space.size for space in self.spaces.values())
+
+    def available(self):
+        usage = shutil.disk_usage(str(self.path))
+        reserved = CONF.convertor_worker.reserved_scratch_space * _MiB
+        available = (usage.free - reserved -
+                     sum(space.outstanding for space in self.spaces.values()))
+        if self.quota:
+            available = min(available, self.quota - self.reserved)
+        return available
+
+
+class ScratchManager(object):
+    """Place conversions on the scratch volumes and clean up after them."""
+
+    def __init__(self, paths, quota=0, slots_dir=None):
+        """:param paths: the scratch directories.
+        :param quota: maximum space reserved in each directory, in bytes,
+                      or 0 for no limit.
+        :param slots_dir: where the workers of the host sharing ``paths``
+                          take their slots.
+        """
+        self.volumes = [ScratchVolume(path, quota) for path in paths]
+        self.slots_dir = slots_dir or os.path.join(CONF.state_path,
+                                                   'worker-scratch')
+        # NOTE: the slot is held until the process exits.
+        self.owner, self._owner_lock = utils.claim_slot(self.slots_dir)
+        self._spaces = {}
+        self._released = threading.Condition()
+
+    def available(self):
+        """Largest amount of space a new conversion can reserve."""
+        with self._released:
+            return max(volume.available() for volume in self.volumes)
+
+    def _place(self, size):
+        volume = max(self.volumes,
+                     key=lambda v: (v.available(), -len(v.spaces)))
+        # NOTE: a conversion is always placed when nothing else is, even
+        # if it looks too large: the sizes are upper bounds, and waiting
+        # would never help.
+        if volume.available() >= size or not self._spaces:
+            return volume
+        return None
+
+    def reserve(self, key, size):
+        """Reserve scratch space for a conversion.
+
+        Tasks doing the same conversion at the same time share the same
+        space, which is released when all of them released it.
+
+        :param key: identifies the conversion.
+        :param size: space needed by the conversion, in bytes.
+        :returns: a :py:class:`ScratchSpace`
+        :raises: :py:class:`~.ScratchSpaceExhausted` if the space is not
+                 released in time.
+        """
+        timeout = CONF.convertor_worker.scratch_wait_timeout
+        deadline = time.monotonic() + timeout
+        with self._released:
+            while True:
+                space = self._spaces.get(key)
+                if space is not None:
+                    space.refs += 1
+                    return space
+                volume = self._place(size)
+                if volume is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise exception.ScratchSpaceExhausted(size=size)
+                LOG.debug("Waiting for %d bytes of scratch space", size)
+                self._released.wait(remaining)
+
+            space = ScratchSpace(volume, key, size, self.owner)
+            # NOTE: the directory may be left over by a previous attempt,
+            # whose download is then resumed.
+            space.path.mkdir(exist_ok=True)
+            self._spaces[key] = volume.spaces[key] = space
+            return space
+
+    def release(self, space):
+        """Release a space, removing its directory once unused."""
+        with self._released:
+            space.refs -= 1
+            if space.refs:
+                return
+            del self._spaces[space.key]
+            del space.volume.spaces[space.key]
+            shutil.rmtree(str(space.path), ignore_errors=True)
+            self._released.notify_all()
+
+    def collect_garbage(self, max_age):
+        """Remove the directories no conversion uses, older than max_age.
+
+        The directories of the other workers of the host which are still
+        running are kept, whatever their age.
+
+        :returns: the number of removed directories.
+        """
+        removed = 0
+        limit = time.time() - max_age
+        with self._released:
+            in_use = set(space.path for space in self._spaces.values())
+            live_owners = {}
+            for volume in self.volumes:
+                for entry in os.scandir(str(volume.path)):
+                    path = volume.path / entry.name
+                    if (not entry.is_dir(follow_symlinks=False) or
+                            path in in_use or
+                            entry.stat().st_mtime > limit):
+                        continue
+                    owner = ScratchSpace.owner(entry.name)
+                    if owner is not None and owner != self.owner:
+                        if owner not in live_owners:
+                            live_owners[owner] = utils.slot_held(
+                                self.slots_dir, owner)
+                        if live_owners[owner]:
+                            continue
+                    LOG.info("Removing stale scratch directory %s", path)
+                    shutil.rmtree(str(path), ignore_errors=True)
+                    removed += 1
+        return removed
+
+
+class ScratchCollector(service.ServiceBase):
+    """Periodically remove the scratch directories left behind."""
+
+    def __init__(self):
+        self._loop = loopingcall.FixedIntervalLoopingCall(self.collect)
+        self._started = False
+
+    def collect(self):
+        try:
+            get_manager().collect_garbage(
+                CONF.convertor_worker.scratch_stale_age)
+        except Exception:
+            LOG.exception("Failed to remove stale scratch directories")
+
+    def start(self):
+        interval = CONF.convertor_worker.scratch_gc_interval
+        if interval:
+            self._loop.start(interval=interval, initial_delay=interval)
+            self._started = True
+
+    def stop(self):
+        if self._started:
+            self._loop.stop()
+            self._loop.wait()
+            self._started = False
+
+    def wait(self):
+        """Wait for service to complete."""
+
+    def reset(self):
+        """Reset a service in case it received a SIGHUP."""
+
+
+def get_manager():
+    """Return the scratch space manager shared by the worker process."""
+    global _MANAGER
+    if _MANAGER is None:
+        with _MANAGER_LOCK:
+            if _MANAGER is None:
+                manager = ScratchManager(
+                    CONF.convertor_worker.scratch_dirs,
+                    CONF.convertor_worker.scratch_quota * _MiB)
+                manager.collect_garbage(
+                    CONF.convertor_worker.scratch_stale_age)
+                _MANAGER = manager
+    return _MANAGER
@@ -0,0 +1,56 @@
+"""Helpers to keep images sparse while they are staged and converted.
+
+Zero chunks received from Glance are not written to the staged image,
+which is preallocated as a sparse file, so they only exist as holes.
+qemu-img then finds the holes through the block status of the file and
+skips them without reading them, and writes no zero cluster in the output
+either. The sizes recorded on the tasks come from ``qemu-img map``, which
+tells the data extents of an image apart from its holes and zero extents.
+"""
+
+import functools
+import json
+
+from oslo_concurrency import processutils
+from oslo_config import cfg
+
+CONF = cfg.CONF
+
+
+@functools.lru_cache(maxsize=8)
+def _zero_block(size):
+    return bytes(size)
+
+
+def is_zero(data):
+    """Whether ``data`` only holds zero bytes."""
+    return data == _zero_block(len(data))
+
+
+def enabled():
+    return CONF.convertor_worker.sparse_size > 0
+
+
+def qemu_img_args():
+    """qemu-img convert options controlling the sparseness of the output."""
+    return ['-S', '%dk' % CONF.convertor_worker.sparse_size]
+
+
+def image_map(path):
+    """Return the extents of an image, as reported by ``qemu-img map``."""
+    stdout, _stderr = processutils.execute(
+        'qemu-img', 'map', '--output=json', str(path))
+    return json.loads(stdout)
+
+
+def measure(path):
+    """Return the virtual size and the allocated size of an image.
+
+    The allocated size only counts the extents holding data, leaving out
+    holes and extents known to read as zeros.
+    """
+    extents = image_map(path)
+    virtual_size = sum(extent['length'] for extent in extents)
+    allocated_size = sum(extent['length'] for extent in extents
+                         if extent.get('data') and not extent.get('zero'))
+    return virtual_size, allocated_size
@@ -0,0 +1,133 @@
+"""Publication of converted images to Glance.
+
+A new image is created for the converted artifact and its data is pushed
+with the interoperable import workflow: the data is staged with a single
+chunked request and then imported with the ``glance-direct`` method, which
+lets Glance run its import plugins on it. Glance deployments which do not
+offer ``glance-direct`` get the data through a classic upload instead.
+
+qemu-img needs a seekable target for every output format, so the artifact
+is staged on the scratch disk, but it is read from there exactly once,
+streamed to Glance chunk by chunk.
+"""
+
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+from oslo_utils import excutils
+
+from convertor.common import exception
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+_KiB = 1024
+
+# qemu-img format names whose Glance disk_format is spelled differently.
+_DISK_FORMATS = {'vpc': 'vhd'}
+
+
+def disk_format(new_format):
+    """Return the Glance disk_format of a qemu-img output format."""
+    return _DISK_FORMATS.get(new_format, new_format)
+
+
+def read_chunks(path, chunk_size, on_progress=None):
+    """Iterate over the content of a file, one chunk at a time.
+
+    :param on_progress: called with the size of each chunk once it has
+                        been consumed.
+    """
+    with open(path, 'rb') as artifact:
+        while True:
+            chunk = artifact.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+            if on_progress is not None:
+                on_progress(len(chunk))
+
+
+class ImageUploader(object):
+    """Create a Glance image holding a converted artifact."""
+
+    def __init__(self, osc):
+        """:param osc: an OpenStackClients instance"""
+        self.osc = osc
+        self.glance = osc.glance()
+        self.chunk_size = CONF.convertor_worker.upload_chunk_size * _KiB
+
+    def supports_import(self):
+        """Whether Glance offers the ``glance-direct`` import method."""
+        try:
+            info = self.glance.images.get_import_info()
+        except Exception as e:
+            LOG.debug("Cannot discover the Glance import methods: %s", e)
+            return False
+        methods = info.get('import-methods', {}).get('value', [])
+        return 'glance-direct' in methods
+
+    def create_image(self, task, source_image):
+        properties = {'convertor_source_image': source_image.id,
+                      'convertor_task': task.uuid}
+        return self.glance.images.create(
+            name='%s.%s' % (source_image.name or source_image.id,
+                            task.new_format),
+            disk_format=disk_format(task.new_format),
+            container_format=getattr(source_image, 'container_format',
+                                     None) or 'bare',
+            **properties)
+
+    def wait_for_import(self, image_id):
+        """Wait until Glance is done importing the staged data.
+
+        :raises: :py:class:`~.ImageUploadFailed`
+        """
+        deadline = time.monotonic() + CONF.convertor_worker.import_timeout
+        while True:
+            image = self.glance.images.get(image_id)
+            if image.status == 'active':
+                return image
+            if image.status not in ('uploading', 'importing', 'queued'):
+                raise exception.ImageUploadFailed(
+                    image=image_id, reason="image is %s" % image.status)
+            if time.monotonic() > deadline:
+                raise exception.ImageUploadFailed(
+                    image=image_id, reason="import timed out")
+            time.sleep(CONF.convertor_worker.import_poll_interval)
+
+    def upload(self, task, source_image, artifact_path, on_progress=None):
+        """Publish ``artifact_path`` as a new image.
+
+        :param task: the task the artifact was converted for.
+        :param source_image: the Glance image the artifact was converted
+                             from.
+        :param artifact_path: the converted image.
+        :param on_progress: called with the number of bytes sent each time
+                            a chunk is handed to Glance.
+        :returns: the ID of the new image.
+        :raises: :py:class:`~.ImageUploadFailed`
+        """
+        new_image = self.create_image(task, source_image)
+        LOG.info("Uploading task %(task)s to image %(image)s",
+                 {'task': task.uuid, 'image': new_image.id})
+        data = read_chunks(artifact_path, self.chunk_size, on_progress)
+        try:
+            if self.supports_import():
+                # NOTE: a generator has no length, so glanceclient sends it
+                # with chunked transfer encoding.
+                self.glance.images.stage(new_image.id, data)
+                self.glance.images.image_import(new_image.id,
+                                                method='glance-direct')
+                self.wait_for_import(new_image.id)
+            else:
+                self.glance.images.upload(new_image.id, data)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                try:
+                    self.glance.images.delete(new_image.id)
+                except Exception as e:
+                    LOG.warning("Failed to delete image %(image)s: %(error)s",
+                                {'image': new_image.id, 'error': e})
+        return new_image.id
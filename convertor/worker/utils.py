@@ -1,3 +1,88 @@
+import os
+import socket
+import threading
 
+from oslo_config import cfg
 
-def
+CONF = cfg.CONF
+
+
+def worker_id():
+    """Return the identifier tasks claimed by this process are leased to."""
+    return '%s:%d' % (CONF.host or socket.gethostname(), os.getpid())
+
+
+def glance_image_url(osc, image_id):
+    """Return the URL serving the data of a Glance image.
+
+    :param osc: an OpenStackClients instance
+    :param image_id: the ID of the image.
+    """
+    endpoint = osc.glance().http_client.get_endpoint()
+    return '%s/v2/images/%s/file' % (endpoint.rstrip('/'), image_id)
+
+
+def qemu_img_convert_cmd(source, target, new_format, source_format=None,
+                         extra_args=(), progress=False):
+    """Build a ``qemu-img convert`` command line.
+
+    :param source: path or URI of the image to read.
+    :param target: path of the image to write.
+    :param new_format: output format passed to ``-O``.
+    :param source_format: input format passed to ``-f``; probed by
+                          qemu-img when not set.
+    :param extra_args: additional options inserted before the paths.
+    :param progress: print the progress of the conversion (``-p``).
+    :returns: a list of arguments suitable for :py:mod:`subprocess`.
+    """
+    cmd = ["qemu-img", "convert"]
+    if progress:
+        cmd.append("-p")
+    if source_format:
+        cmd += ["-f", source_format]
+    cmd += ["-O", new_format]
+    cmd += list(extra_args)
+    cmd += [str(source), str(target)]
+    return cmd
+
+
+class SingleFlight(object):
+    """Run a function only once for concurrent callers sharing a key.
+
+    The first caller for a key runs the function; callers arriving while
+    it runs wait for it and get the same result (or exception).
+    """
+
+    class _Call(object):
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
@@ -0,0 +1,146 @@
+"""Bulk writer for the images downloaded from Glance.
+
+HTTP responses are read in chunks much smaller than what the disk likes to
+be written in. The writer copies the chunks into a large page-aligned
+buffer and writes it with a single positioned write once it is full, so a
+gigabyte costs a few hundred system calls instead of thousands. Chunks of
+zeros are not written, leaving holes in the sparse target file.
+
+Written data does not need to stay in the page cache, where a large
+download would evict the hot data of everything else running on the host.
+Depending on ``[convertor_worker]download_io_mode`` the writer either
+bypasses the page cache with O_DIRECT, or flushes what it wrote at regular
+intervals and drops it from the cache with posix_fadvise(DONTNEED).
+"""
+
+import mmap
+import os
+
+from oslo_config import cfg
+from oslo_log import log
+
+from convertor.worker import sparse
+
+LOG = log.getLogger(__name__)
+CONF = cfg.CONF
+
+_MiB = 1024 * 1024
+
+# O_DIRECT transfers must be aligned on the logical block size of the
+# device; 4 KiB covers all the devices in use.
+_DIRECT_ALIGNMENT = 4096
+
+BUFFERED = 'buffered'
+DROP_BEHIND = 'drop-behind'
+DIRECT = 'direct'
+
+
+def open_direct(path):
+    """Open ``path`` for writes bypassing the page cache, if possible.
+
+    :returns: a file descriptor, or None if the filesystem does not
+              support O_DIRECT.
+    """
+    if CONF.convertor_worker.download_io_mode != DIRECT:
+        return None
+    try:
+        return os.open(str(path), os.O_WRONLY | os.O_DIRECT)
+    except (AttributeError, OSError) as e:
+        LOG.info("Cannot open %(path)s with O_DIRECT, dropping written "
+                 "data from the page cache instead: %(error)s",
+                 {'path': path, 'error': e})
+        return None
+
+
+def drop_cache(fd, offset, length):
+    """Drop a range of a file from the page cache."""
+    if length > 0:
+        os.posix_fadvise(fd, offset, length, os.POSIX_FADV_DONTNEED)
+
+
+class BulkWriter(object):
+    """Coalesce sequential writes into large aligned ones."""
+
+    def __init__(self, fd, offset=0, direct_fd=None, skip_zeros=None):
+        """:param fd: file descriptor to write to.
+        :param offset: position of the first byte written.
+        :param direct_fd: the same file opened with O_DIRECT, used for the
+                          aligned writes; see :py:func:`open_direct`.
+        :param skip_zeros: do not write chunks of zeros. Defaults to
+                           whether sparse images are enabled.
+        """
+        self.fd = fd
+        self.direct_fd = direct_fd
+        self.position = offset
+        self.skip_zeros = (sparse.enabled() if skip_zeros is None
+                           else skip_zeros)
+        self.drop_behind = (direct_fd is None and
+                            CONF.convertor_worker.download_io_mode !=
+                            BUFFERED)
+        size = CONF.convertor_worker.download_buffer_size * _MiB
+        self._buffer = mmap.mmap(-1, size)
+        self._view = memoryview(self._buffer)
+        self._used = 0
+        # Start of the data written but maybe not yet dropped from the
+        # page cache.
+        self._undropped = offset
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def _start(self):
+        """File offset of the first byte in the buffer."""
+        return self.position - self._used
+
+    def write(self, data):
+        if self.skip_zeros and sparse.is_zero(data):
+            self.flush()
+            self.position += len(data)
+            return
+        data = memoryview(data)
+        while data:
+            count = min(len(data), len(self._buffer) - self._used)
+            self._view[self._used:self._used + count] = data[:count]
+            self._used += count
+            self.position += count
+            data = data[count:]
+            if self._used == len(self._buffer):
+                self.flush()
+
+    def _aligned(self, offset, length):
+        return not (offset % _DIRECT_ALIGNMENT or length % _DIRECT_ALIGNMENT)
+
+    def flush(self):
+        if not self._used:
+            return
+        start = self._start
+        data = self._view[:self._used]
+        if self.direct_fd is not None and self._aligned(start, self._used):
+            written = os.pwrite(self.direct_fd, data, start)
+        else:
+            written = os.pwrite(self.fd, data, start)
+        if written != self._used:
+            raise IOError("Short write at offset %d" % start)
+        self._used = 0
+        if (self.drop_behind and self.position - self._undropped >=
+                CONF.convertor_worker.download_drop_interval * _MiB):
+            self._drop_behind()
+
+    def _drop_behind(self):
+        # NOTE: dirty pages cannot be dropped, they are written back first.
+        os.fdatasync(self.fd)
+        drop_cache(self.fd, self._undropped, self.position - self._undropped)
+        self._undropped = self.position
+
+    def close(self):
+        if self._buffer.closed:
+            return
+        self.flush()
+        if self.drop_behind:
+            self._drop_behind()
+        self._view.release()
+        self._buffer.close()
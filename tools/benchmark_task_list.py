@@ -0,0 +1,141 @@
+"""Benchmark the task listing queries with and without the task indexes.
+
+Fills a scratch database with tasks, then runs the queries issued by
+``Connection.get_task_list`` for the API access patterns, first on the
+bare table and then once the indexes of the models are created. For each
+query it prints the query plan reported by the database and the median
+latency.
+
+Usage::
+
+    python tools/benchmark_task_list.py --rows 1000000 \\
+        --connection sqlite:////tmp/convertor-bench.sqlite
+"""
+
+import argparse
+import datetime
+import itertools
+import statistics
+import sys
+import time
+
+from oslo_utils import uuidutils
+import sqlalchemy as sa
+
+from convertor.common import context as convertor_context
+from convertor import conf
+from convertor.db.sqlalchemy import api as sqla_api
+from convertor.db.sqlalchemy import models
+
+CONF = conf.CONF
+
+STATUSES = ('CREATED', 'INPROGRESS', 'COMPLETED', 'ERROR')
+FORMATS = ('qcow2', 'raw', 'vmdk', 'vdi')
+
+SCENARIOS = (
+    ('first page', {}, 'id'),
+    ('status filter', {'status': 'INPROGRESS'}, 'id'),
+    ('bucket filter', {'bucket_id': 'bucket-42'}, 'id'),
+    ('bucket and status', {'bucket_id': 'bucket-42',
+                           'status': 'INPROGRESS'}, 'id'),
+    ('coalescing lookup', {'image_id': 'image-4242', 'new_format': 'qcow2',
+                           'status__in': ('CREATED', 'INPROGRESS'),
+                           'leader_uuid': None}, 'id'),
+    ('sort by created_at', {}, 'created_at'),
+)
+
+
+def populate(engine, rows, batch_size=10000):
+    table = models.Task.__table__
+    counter = itertools.count()
+    epoch = datetime.datetime(2021, 1, 1)
+    with engine.begin() as conn:
+        while True:
+            batch = [{'uuid': uuidutils.generate_uuid(),
+                      'image_id': 'image-%d' % (i % 10000),
+                      'bucket_id': 'bucket-%d' % (i % 500),
+                      'new_format': FORMATS[i % len(FORMATS)],
+                      'status': STATUSES[i % len(STATUSES)],
+                      'created_at': epoch + datetime.timedelta(seconds=i),
+                      'deleted': 0}
+                     for i in itertools.islice(counter, batch_size)
+                     if i < rows]
+            if not batch:
+                break
+            conn.execute(table.insert(), batch)
+
+
+def explain(engine, statement, parameters):
+    prefix = ('EXPLAIN QUERY PLAN ' if engine.dialect.name == 'sqlite'
+              else 'EXPLAIN ')
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + statement, parameters)
+        return [' '.join(str(col) for col in row) for row in rows]
+
+
+def run(engine, repeat, limit):
+    connection = sqla_api.Connection()
+    context = convertor_context.make_context(show_deleted=False)
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    sa.event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        for name, filters, sort_key in SCENARIOS:
+            timings = []
+            for _ in range(repeat):
+                del captured[:]
+                start = time.perf_counter()
+                connection.get_task_list(context, filters=dict(filters),
+                                         limit=limit, sort_key=sort_key)
+                timings.append(time.perf_counter() - start)
+            statement, parameters = captured[-1]
+            print('  %-20s %8.2f ms' % (name,
+                                        statistics.median(timings) * 1000))
+            for line in explain(engine, statement, parameters):
+                print('      %s' % line)
+    finally:
+        sa.event.remove(engine, 'before_cursor_execute', capture)
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connection',
+                        default='sqlite:////tmp/convertor-bench.sqlite')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--limit', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    CONF([], project='convertor')
+    CONF.set_override('connection', args.connection, group='database')
+    engine = sqla_api.get_engine()
+
+    table = models.Task.__table__
+    table.drop(engine, checkfirst=True)
+    indexes = set(table.indexes)
+    table.indexes.clear()
+    table.create(engine)
+    print('Inserting %d tasks...' % args.rows)
+    populate(engine, args.rows)
+
+    print('Without indexes:')
+    run(engine, args.repeat, args.limit)
+
+    for index in indexes:
+        index.create(engine)
+        table.indexes.add(index)
+    with engine.connect() as conn:
+        if engine.dialect.name in ('sqlite', 'postgresql'):
+            conn.exec_driver_sql('ANALYZE')
+        elif engine.dialect.name == 'mysql':
+            conn.exec_driver_sql('ANALYZE TABLE tasks')
+
+    print('With indexes:')
+    run(engine, args.repeat, args.limit)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark the rendering of task collections by the API.
+
+Fills a scratch database with tasks, then renders pages of them the two
+ways ``GET /v1/tasks`` could: through the tasks objects, rendering each with
+``Task.convert_with_links``, and from the rows of the listed columns, as
+``TaskCollection.convert_rows_with_links`` does. It
+checks both render the same JSON document and prints, for each page size,
+the median time per page and per task.
+
+Usage::
+
+    python tools/benchmark_task_serialization.py --rows 10000 \\
+        --connection sqlite:////tmp/convertor-bench.sqlite
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+from oslo_log import log
+import pecan
+from wsme.rest import json as wsme_json
+
+# NOTE: the controllers read the fields of the objects when imported,
+# this registers them.
+from convertor.objects import task as task_objects  # noqa: F401
+from convertor.api import app as api_app
+from convertor.api.controllers.v1 import task as task_api
+from convertor.api.controllers.v1 import types
+from convertor.api.controllers.v1 import utils as api_utils
+from convertor.common import context as convertor_context
+from convertor import conf
+from convertor.db.sqlalchemy import api as sqla_api
+from convertor.db.sqlalchemy import models
+from convertor import objects
+
+# NOTE: found next to this script.
+import benchmark_task_list
+
+CONF = conf.CONF
+
+
+def bind_request(url='http://localhost:9322/v1/tasks'):
+    """Bind a request to pecan, the links are built from its URL."""
+    # NOTE: pecan binds the requests to the state of the thread once an
+    # application exists.
+    api_app.setup_app()
+    pecan.core.state.request = pecan.core.Request.blank(url)
+
+
+def render_objects(context, limit, sort_key):
+    tasks = objects.Task.list(context, limit, sort_key=sort_key)
+    collection = task_api.TaskCollection()
+    collection.tasks = [task_api.Task.convert_with_links(task, expand=False)
+                        for task in tasks]
+    cursor = None
+    if tasks:
+        cursor = api_utils.encode_cursor(tasks[-1], sort_key)
+    collection.next = collection.get_next(
+        limit, cursor=cursor, sort_key=sort_key, sort_dir='asc')
+    return wsme_json.encode_result(collection, task_api.TaskCollection)
+
+
+def render_rows(context, limit, sort_key):
+    columns = list(task_api.BRIEF_FIELDS)
+    columns += [key for key in ('id', sort_key) if key not in columns]
+    rows = objects.Task.list_columns(context, columns, limit,
+                                     sort_key=sort_key)
+    body = task_api.TaskCollection.convert_rows_with_links(
+        rows, columns, limit, sort_key=sort_key, sort_dir='asc')
+    return wsme_json.encode_result(body, types.jsontype)
+
+
+def measure(render, context, limit, sort_key, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(context, limit, sort_key)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connection',
+                        default='sqlite:////tmp/convertor-bench.sqlite')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--limits', type=int, nargs='+',
+                        default=[10, 100, 1000])
+    parser.add_argument('--sort-key', default='id')
+    args = parser.parse_args(argv)
+
+    log.register_options(CONF)
+    CONF([], project='convertor')
+    CONF.set_override('connection', args.connection, group='database')
+    CONF.set_override('enable_authentication', False)
+    engine = sqla_api.get_engine()
+
+    table = models.Task.__table__
+    table.drop(engine, checkfirst=True)
+    table.create(engine)
+    print('Inserting %d tasks...' % args.rows)
+    benchmark_task_list.populate(engine, args.rows)
+
+    bind_request()
+    context = convertor_context.make_context(show_deleted=False)
+
+    print('%8s %24s %24s' % ('limit', 'objects (ms, us/task)',
+                             'rows (ms, us/task)'))
+    for limit in args.limits:
+        if (render_objects(context, limit, args.sort_key) !=
+                render_rows(context, limit, args.sort_key)):
+            sys.exit('The renderings of %d tasks differ' % limit)
+        results = []
+        for render in (render_objects, render_rows):
+            seconds = measure(render, context, limit, args.sort_key,
+                              args.repeat)
+            results.append('%10.2f %12.1f' % (seconds * 1000,
+                                              seconds * 1e6 / limit))
+        print('%8d %s %s' % (limit, results[0], results[1]))
+
+
+if __name__ == '__main__':
+    main()